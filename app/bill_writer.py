@@ -0,0 +1,181 @@
+"""Write-behind saving of finished bills.
+
+BillWriter.submit() makes a bill durable in a journal directory and returns.
+A writer thread then commits it with BillModel.create_bill and reports back
+through Qt signals, so the checkout never waits on SQLite.
+
+Guarantees:
+- submit() returns only after the bill's journal entry is on disk: written to a
+  temp file, fsynced, then renamed into place, so an entry is never partial.
+  A crash before that loses the bill, but submit() never returned, so the
+  cashier was never told it was saved.
+- An entry is deleted only after its bill is committed and that commit is on
+  disk. The writer commits with synchronous = FULL whatever the storage
+  profile, since under Balanced or Fast a commit can still be lost on power
+  failure. A crash between the commit and the delete replays the entry on the
+  next start. The replay finds the same bill_number already saved and just
+  drops the entry, so every submitted bill is saved exactly once.
+- Bills are committed one at a time in submit order, leftovers from the last
+  run first.
+- A bill the database refuses outright (an integrity error such as a deleted
+  product) is moved to the failed/ subdirectory and reported through
+  billFailed, never dropped. Errors that can pass, a locked database or a
+  full disk (OperationalError, OSError), are retried with backoff; any other
+  error fails the bill the same way as an integrity error.
+"""
+import itertools
+import json
+import os
+import queue
+import threading
+import time
+
+from PyQt6.QtCore import QObject, pyqtSignal
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.db import unit_of_work
+from app.models import BillModel
+from app.utils.helpers import fsync_dir
+from app.utils.logger import error_logger, transaction_logger
+
+JOURNAL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'pending_bills')
+RETRY_DELAYS = (0.5, 1, 2, 5, 10, 30)  # seconds between attempts, the last one repeats
+
+
+class BillJournal:
+    """One JSON file per bill not yet committed, named so that sorting the names gives submit order"""
+
+    def __init__(self, directory=JOURNAL_DIR):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, 'failed')
+        os.makedirs(self.failed_directory, exist_ok=True)
+        self._last_seq = 0
+
+    def append(self, bill_data, items):
+        seq = max(time.time_ns(), self._last_seq + 1)
+        self._last_seq = seq
+        name = f"{seq:020d}.json"
+        path = os.path.join(self.directory, name)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'bill_data': bill_data, 'items': items}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+        fsync_dir(self.directory)
+        return name
+
+    def pending(self):
+        """Entry names in submit order; temp files of an interrupted append are removed"""
+        names = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json.tmp'):
+                os.remove(os.path.join(self.directory, name))
+            elif name.endswith('.json'):
+                names.append(name)
+        return sorted(names)
+
+    def read(self, name):
+        with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+            return json.load(f)
+
+    def remove(self, name):
+        os.remove(os.path.join(self.directory, name))
+        fsync_dir(self.directory)
+
+    def move_to_failed(self, name):
+        os.replace(os.path.join(self.directory, name), os.path.join(self.failed_directory, name))
+        fsync_dir(self.directory)
+
+
+class BillWriter(QObject):
+    billSaved = pyqtSignal(str)        # bill number
+    billFailed = pyqtSignal(str, str)  # bill number, error
+
+    def __init__(self, parent=None, journal=None):
+        super().__init__(parent)
+        self.journal = journal or BillJournal()
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        """Starts the writer thread, queueing the bills left over from the last run first"""
+        for name in self.journal.pending():
+            self._queue.put(name)
+        self._thread = threading.Thread(target=self._run, name='bill-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, bill_data, items):
+        """Journals the bill and queues it; raises OSError if it could not be made durable"""
+        self._queue.put(self.journal.append(bill_data, [dict(item) for item in items]))
+
+    def pending_count(self):
+        return self._queue.unfinished_tasks
+
+    def wait_idle(self):
+        """Blocks until every queued bill is saved or failed"""
+        self._queue.join()
+
+    def stop(self, timeout=None):
+        """Lets the queued bills finish, then ends the thread. Whatever is still
+        queued after timeout stays in the journal for the next start."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while True:
+            name = self._queue.get()
+            try:
+                if name is None:
+                    return
+                self._save(name)
+            except Exception as e:
+                error_logger.error(f"Bill writer failed on {name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _save(self, name):
+        try:
+            entry = self.journal.read(name)
+            bill_data, items = entry['bill_data'], entry['items']
+            bill_number = bill_data['bill_number']
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self._fail(name, name, f"Unreadable journal entry: {e}")
+            return
+
+        for attempt in itertools.count():
+            try:
+                with unit_of_work(durable=True):
+                    BillModel.create_bill(bill_data, items)
+                break
+            except IntegrityError as e:
+                if self._already_saved(bill_data):
+                    break
+                self._fail(name, bill_number, str(e))
+                return
+            except (OperationalError, OSError) as e:
+                delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
+                error_logger.error(f"Saving bill {bill_number} failed, retrying in {delay}s: {e}")
+                time.sleep(delay)
+            except Exception as e:
+                # Malformed bill data or a bug; retrying would block every bill behind it
+                self._fail(name, bill_number, f"{type(e).__name__}: {e}")
+                return
+
+        self.journal.remove(name)
+        transaction_logger.info(f"Saved bill {bill_number}")
+        self.billSaved.emit(bill_number)
+
+    @staticmethod
+    def _already_saved(bill_data):
+        # Committed before a crash and now replayed, rather than a different bill
+        # that happened to draw the same number
+        bill = BillModel.get_bill_by_number(bill_data['bill_number'])
+        return (bill is not None and bill['date_time'] == bill_data['date_time']
+                and bill['grand_total'] == bill_data['grand_total'])
+
+    def _fail(self, name, bill_number, error):
+        error_logger.error(f"Bill {bill_number} could not be saved, kept in {self.journal.failed_directory}: {error}")
+        self.journal.move_to_failed(name)
+        self.billFailed.emit(bill_number, error)
@@ -0,0 +1,341 @@
+"""In-memory product catalog structures used at the billing counter."""
+from array import array
+from bisect import bisect_left, insort
+import sys
+
+from app.models import ProductModel, CustomerModel
+from app.records import ProductRecord, CustomerRecord
+
+
+def normalize(text):
+    """Lower-cases and collapses whitespace so lookups ignore case and stray spaces."""
+    return ' '.join(text.lower().split()) if text else ''
+
+
+class RowView:
+    """
+    Read-only view of one ColumnStore row. Values are read from the columns on
+    access, so a view always shows the current row; reading a deleted row raises
+    KeyError. Supports the dict-style access the UI uses, to_dict() copies it.
+    """
+    __slots__ = ('_store', 'id')
+
+    def __init__(self, store, row_id):
+        self._store = store
+        self.id = row_id
+
+    def __getitem__(self, field):
+        return self._store.value(self.id, field)
+
+    def get(self, field, default=None):
+        try:
+            return self[field]
+        except KeyError:
+            return default
+
+    def __contains__(self, field):
+        return field in self._store.fields
+
+    def keys(self):
+        return self._store.fields
+
+    def items(self):
+        return [(field, self[field]) for field in self._store.fields]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        return isinstance(other, RowView) and other._store is self._store and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self._store), self.id))
+
+    def __repr__(self):
+        return f"RowView({self.to_dict() if self.id in self._store else self.id})"
+
+
+class ColumnStore:
+    """
+    Rows kept column by column: integer fields in arrays, text in lists of
+    interned strings, so repeated units and categories are stored once and no
+    dict or object exists per row. Behaves as a read-only mapping of
+    id -> RowView in load order.
+    """
+
+    def __init__(self, fields, int_fields=('id',), records=()):
+        self.fields = tuple(fields)
+        self._int_fields = frozenset(int_fields)
+        self.load(records)
+
+    def load(self, records):
+        self._columns = {f: array('q') if f in self._int_fields else [] for f in self.fields}
+        self._positions = {}  # id -> row position
+        for record in records:
+            self._append(record)
+
+    def _append(self, record):
+        self._positions[record['id']] = len(self._positions)
+        for field, column in self._columns.items():
+            value = record[field]
+            column.append(sys.intern(value) if isinstance(value, str) else value)
+
+    def upsert(self, record):
+        position = self._positions.get(record['id'])
+        if position is None:
+            self._append(record)
+            return
+        for field, column in self._columns.items():
+            value = record[field]
+            column[position] = sys.intern(value) if isinstance(value, str) else value
+
+    def remove(self, row_id):
+        position = self._positions.pop(row_id, None)
+        if position is None:
+            return
+        for column in self._columns.values():
+            del column[position]
+        ids = self._columns['id']
+        for i in range(position, len(ids)):
+            self._positions[ids[i]] = i
+
+    def value(self, row_id, field):
+        return self._columns[field][self._positions[row_id]]
+
+    def column(self, field):
+        """The live column in row order; read it, don't modify it"""
+        return self._columns[field]
+
+    def rows(self, *fields):
+        """Tuples of the given fields for every row, without building views"""
+        return zip(*(self._columns[f] for f in fields))
+
+    def __getitem__(self, row_id):
+        if row_id not in self._positions:
+            raise KeyError(row_id)
+        return RowView(self, row_id)
+
+    def get(self, row_id, default=None):
+        return RowView(self, row_id) if row_id in self._positions else default
+
+    def __contains__(self, row_id):
+        return row_id in self._positions
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __iter__(self):
+        return iter(self._columns['id'])
+
+    def keys(self):
+        return list(self._columns['id'])
+
+    def values(self):
+        return [RowView(self, row_id) for row_id in self._columns['id']]
+
+
+class SharedTable(ColumnStore):
+    """
+    ColumnStore mirroring a whole table, shared by every window and kept current
+    with the model's change log. Windows holding derived structures subscribe
+    with two callbacks taking a list of ids, either may be None: `removing` runs
+    before changed and deleted rows are touched, while their old values can still
+    be read, `added` runs after the changed rows are stored.
+    """
+
+    def __init__(self, model, load_all, fields, int_fields):
+        self._model = model
+        self._load_all = load_all
+        self._listeners = []
+        self.version = None
+        super().__init__(fields, int_fields)
+
+    def reload(self):
+        # Version first, so a change made during the load is picked up by the next refresh
+        self.version = self._model.get_change_version()
+        self.load(self._load_all())
+
+    def refresh(self):
+        """Applies the rows changed since the last load or refresh"""
+        changed, deleted, self.version = self._model.get_changes_since(self.version)
+        if not changed and not deleted:
+            return
+        changed_ids = [r['id'] for r in changed]
+        touched = [row_id for row_id in deleted + changed_ids if row_id in self]
+        for removing, added in list(self._listeners):
+            if removing:
+                removing(touched)
+        for row_id in deleted:
+            self.remove(row_id)
+        for record in changed:
+            self.upsert(record)
+        for removing, added in list(self._listeners):
+            if added:
+                added(changed_ids)
+
+    def subscribe(self, removing, added):
+        self._listeners.append((removing, added))
+
+    def unsubscribe(self, removing, added):
+        if (removing, added) in self._listeners:
+            self._listeners.remove((removing, added))
+
+
+_shared = {}
+
+
+def shared_products():
+    """The product table store shared by all windows, loaded on first use"""
+    if 'products' not in _shared:
+        store = SharedTable(ProductModel, ProductModel.get_all_products, ProductRecord._fields,
+                            ('id', 'price_per_unit'))
+        store.reload()
+        _shared['products'] = store
+    return _shared['products']
+
+
+def shared_customers():
+    """The customer table store shared by all windows, loaded on first use"""
+    if 'customers' not in _shared:
+        store = SharedTable(CustomerModel, CustomerModel.get_all_customers, CustomerRecord._fields, ('id',))
+        store.reload()
+        _shared['customers'] = store
+    return _shared['customers']
+
+
+class ProductIndex:
+    """
+    Lookup structure over products, either a ColumnStore (results are views of
+    it) or plain product dicts/records.
+
+    Barcode/code and exact name lookups are dict hits. Partial matches walk a
+    sorted list of (normalized name or code, product id) keys with bisect, so only
+    the keys sharing the typed prefix are visited. update() and remove() patch the
+    index in place when products change; with a shared store, remove() must run
+    before the store row changes and update() after.
+    """
+
+    def __init__(self, products=()):
+        self.build(products)
+
+    @classmethod
+    def from_model(cls):
+        return cls(ProductModel.get_all_products())
+
+    def build(self, products):
+        self._owns_catalog = not isinstance(products, ColumnStore)
+        if self._owns_catalog:
+            products = ColumnStore(ProductRecord._fields, ('id', 'price_per_unit'), products)
+        self._catalog = products
+        self._by_code = {}   # code -> product ids, ascending
+        self._by_name = {}   # normalized name -> product ids, ascending
+        self._keys = []
+        for product_id, name, code in products.rows('id', 'name', 'code'):
+            self._insert(product_id, name, code, keep_sorted=False)
+        self._keys.sort()
+
+    @property
+    def products(self):
+        return self._catalog.values()
+
+    @staticmethod
+    def _search_keys(product_id, name, code):
+        keys = [(name, product_id)]
+        if code:
+            keys.append((normalize(code), product_id))
+        return keys
+
+    def _insert(self, product_id, name, code, keep_sorted=True):
+        # Lowest id wins on duplicates, same as the old linear scan over the table
+        name = normalize(name)
+        if code:
+            insort(self._by_code.setdefault(code, []), product_id)
+        insort(self._by_name.setdefault(name, []), product_id)
+        for key in self._search_keys(product_id, name, code):
+            if keep_sorted:
+                insort(self._keys, key)
+            else:
+                self._keys.append(key)
+
+    def update(self, product):
+        """Adds a product or replaces the one with the same id"""
+        if self._owns_catalog:
+            self.remove(product['id'])
+            self._catalog.upsert(product)
+        self._insert(product['id'], product['name'], product['code'])
+
+    def remove(self, product_id):
+        product = self._catalog.get(product_id)
+        if product is None:
+            return
+        name, code = normalize(product['name']), product['code']
+        for mapping, key in ((self._by_code, code), (self._by_name, name)):
+            ids = mapping.get(key)
+            if ids and product_id in ids:
+                ids.remove(product_id)
+                if not ids:
+                    del mapping[key]
+        for key in self._search_keys(product_id, name, code):
+            i = bisect_left(self._keys, key)
+            if i < len(self._keys) and self._keys[i] == key:
+                del self._keys[i]
+        if self._owns_catalog:
+            self._catalog.remove(product_id)
+
+    def __len__(self):
+        return len(self._catalog)
+
+    def get(self, product_id):
+        return self._catalog.get(product_id)
+
+    def by_code(self, code):
+        ids = self._by_code.get(code)
+        return self._catalog.get(ids[0]) if ids else None
+
+    def by_name(self, name):
+        ids = self._by_name.get(normalize(name))
+        return self._catalog.get(ids[0]) if ids else None
+
+    def lookup(self, text):
+        """Exact match on code (barcode scans) first, then on name."""
+        return self.by_code(text.strip()) or self.by_name(text)
+
+    def prefix(self, text, limit=None):
+        """Products whose name or code starts with text, ordered by that key."""
+        key = normalize(text)
+        if not key:
+            return []
+        results = []
+        seen = set()
+        i = bisect_left(self._keys, (key,))
+        while i < len(self._keys) and self._keys[i][0].startswith(key):
+            product_id = self._keys[i][1]
+            if product_id not in seen:
+                seen.add(product_id)
+                results.append(self._catalog.get(product_id))
+                if limit and len(results) >= limit:
+                    break
+            i += 1
+        return results
+
+    def contains(self, text, limit=None):
+        """Products whose name or code contains text anywhere (linear scan)."""
+        key = normalize(text)
+        if not key:
+            return []
+        results = []
+        for product_id, name, code in self._catalog.rows('id', 'name', 'code'):
+            if key in normalize(name) or key in normalize(code):
+                results.append(self._catalog.get(product_id))
+                if limit and len(results) >= limit:
+                    break
+        return results
+
+    def find(self, text):
+        """Best single match for what was typed or scanned: exact code or name,
+        then the first prefix match, then a substring match."""
+        product = self.lookup(text)
+        if product:
+            return product
+        matches = self.prefix(text, limit=1) or self.contains(text, limit=1)
+        return matches[0] if matches else None
@@ -1,20 +1,201 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import create_engine, event, text, Column, Integer, String, Float, ForeignKey, DateTime, Text
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
+from contextlib import contextmanager
 import os
+import threading
 from datetime import datetime
 
 Base = declarative_base()
 DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'thangam.db')
-engine = create_engine(f'sqlite:///{DB_PATH}', echo=False)
+
+# Storage profiles applied to every new SQLite connection.
+# 'Safe' keeps the classic rollback journal with full fsync, 'Balanced' uses WAL so
+# reports can read while the billing counter writes, 'Fast' trades durability of the
+# last few commits on power loss for the lowest commit latency.
+STORAGE_PROFILES = {
+    'Safe': {
+        'journal_mode': 'DELETE',
+        'synchronous': 'FULL',
+        'cache_size': -2000,            # KiB when negative
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'busy_timeout': 5000,           # ms
+        'foreign_keys': 'ON',
+    },
+    'Balanced': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,
+        'foreign_keys': 'ON',
+    },
+    'Fast': {
+        'journal_mode': 'WAL',
+        'synchronous': 'OFF',
+        'cache_size': -64000,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+        'busy_timeout': 10000,
+        'foreign_keys': 'ON',
+    },
+}
+DEFAULT_STORAGE_PROFILE = 'Balanced'
+
+_storage_profile = DEFAULT_STORAGE_PROFILE
+
+def _apply_pragmas(dbapi_connection, connection_record):
+    # Stop pysqlite from managing transactions itself; it skips BEGIN before DDL,
+    # which would make multi-statement migrations non-atomic. _begin emits it instead.
+    dbapi_connection.isolation_level = None
+    profile = STORAGE_PROFILES[_storage_profile]
+    cursor = dbapi_connection.cursor()
+    try:
+        # busy_timeout first so the journal_mode switch can wait for other connections
+        cursor.execute(f"PRAGMA busy_timeout = {int(profile['busy_timeout'])}")
+        cursor.execute(f"PRAGMA journal_mode = {profile['journal_mode']}")
+        cursor.execute(f"PRAGMA synchronous = {profile['synchronous']}")
+        cursor.execute(f"PRAGMA cache_size = {int(profile['cache_size'])}")
+        cursor.execute(f"PRAGMA mmap_size = {int(profile['mmap_size'])}")
+        cursor.execute(f"PRAGMA temp_store = {profile['temp_store']}")
+        cursor.execute(f"PRAGMA foreign_keys = {profile['foreign_keys']}")
+    finally:
+        cursor.close()
+
+def _begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
+def _create_engine(path):
+    new_engine = create_engine(f'sqlite:///{path}', echo=False)
+    event.listen(new_engine, "connect", _apply_pragmas)
+    event.listen(new_engine, "begin", _begin)
+    return new_engine
+
+engine = _create_engine(DB_PATH)
 Session = sessionmaker(bind=engine)
 
+# Called with no arguments after use_database() switches files, so module-level
+# caches of what the old database contained can be dropped.
+_database_change_hooks = []
+
+def on_database_change(hook):
+    _database_change_hooks.append(hook)
+    return hook
+
+def use_database(path):
+    """Points the engine and every Session at another database file, for tests
+    and benchmarks. Call init_db() afterwards to create or upgrade it."""
+    global engine, DB_PATH
+    engine.dispose()
+    DB_PATH = path
+    engine = _create_engine(path)
+    Session.configure(bind=engine)
+    for hook in _database_change_hooks:
+        hook()
+
+def get_storage_profile():
+    return _storage_profile
+
+def apply_storage_profile(name):
+    """Switch the storage profile. Pooled connections are dropped so every new
+    connection picks up the new pragmas."""
+    global _storage_profile
+    if name not in STORAGE_PROFILES:
+        name = DEFAULT_STORAGE_PROFILE
+    if name != _storage_profile:
+        _storage_profile = name
+        engine.dispose()
+    return name
+
 def get_db():
     return Session()
 
+_local = threading.local()
+
+def _set_synchronous(connection, level):
+    # SQLite refuses this inside a transaction, so it goes to the driver
+    # connection directly rather than through an autobegun one
+    connection.connection.dbapi_connection.execute(f"PRAGMA synchronous = {level}")
+
+@contextmanager
+def unit_of_work(durable=False):
+    """Runs every DAO call inside the block in one session and one transaction.
+
+        with unit_of_work():
+            for bill in bills:
+                BillModel.mark_bill_as_paid(bill['id'])
+
+    Commits when the block exits, rolls everything back if it raises.
+    Nested unit_of_work blocks join the outer one.
+
+    durable=True makes the commit reach the disk before the block exits, whatever
+    the storage profile: the transaction runs on its own connection with
+    synchronous = FULL, set back to the profile's level afterwards.
+    """
+    if getattr(_local, 'session', None) is not None:
+        yield _local.session
+        return
+    connection = None
+    if durable:
+        connection = engine.connect()
+        _set_synchronous(connection, 'FULL')
+    session = Session(bind=connection) if durable else Session()
+    _local.session = session
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        _local.session = None
+        session.close()
+        if connection is not None:
+            try:
+                _set_synchronous(connection, STORAGE_PROFILES[_storage_profile]['synchronous'])
+            finally:
+                connection.close()
+
+@contextmanager
+def session_scope(savepoint=False):
+    """Session for a single DAO call; joins the active unit_of_work if there is one.
+    DAO methods that turn failures into a False/None result pass savepoint=True,
+    so inside a unit of work their failure only rolls back their own changes."""
+    session = getattr(_local, 'session', None)
+    if session is not None:
+        if savepoint:
+            with session.begin_nested():
+                yield session
+        else:
+            yield session
+        return
+    session = Session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
 def init_db():
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+    import app.orm_models  # noqa: F401 - registers the tables on Base
     Base.metadata.create_all(engine)
 
+    from app.migrations import run_migrations
+    run_migrations(engine)
+
+    # The profile is a regular setting, read directly here since SettingsModel
+    # lives above this module.
+    with engine.connect() as conn:
+        profile = conn.execute(
+            text("SELECT value FROM settings WHERE key = 'storage_profile'")
+        ).scalar()
+    apply_storage_profile(profile or DEFAULT_STORAGE_PROFILE)
+
 # Define Models directly here to avoid circular imports if we were to separate them, 
 # but typically they go in models.py. However, since models.py currently holds the *logic* 
 # (DAO pattern), we will define the ORM classes here or in a new file. 
@@ -0,0 +1,56 @@
+"""ESC/POS receipts built in memory and sent in one write.
+
+Every python-escpos call such as printer.text() is its own write to the
+device, which is a separate USB, serial or TCP transfer. EscPosBuffer instead
+collects the text and commands of a whole receipt into one bytearray. The
+caller hands it to the printer's _raw() once.
+"""
+ESC = b'\x1b'
+GS = b'\x1d'
+
+INIT = ESC + b'@'                  # reset to the printer's defaults
+CODEPAGE_CP437 = ESC + b't\x00'    # the code page text is encoded in
+ALIGN = {'left': ESC + b'a\x00', 'center': ESC + b'a\x01', 'right': ESC + b'a\x02'}
+BOLD = {False: ESC + b'E\x00', True: ESC + b'E\x01'}
+SIZE = {False: GS + b'!\x00', True: GS + b'!\x11'}  # double width and height
+FULL_CUT = GS + b'V\x00'
+PARTIAL_CUT = GS + b'V\x01'
+DRAWER_KICK = {2: ESC + b'p\x00\x32\x32', 5: ESC + b'p\x01\x32\x32'}  # 100 ms pulse on pin 2 or 5
+CUT_FEED = 6  # lines fed before a cut so the last line clears the blade, as python-escpos does
+
+
+class EscPosBuffer:
+    """One receipt's ESC/POS bytes. Text is encoded as code page 437, and a
+    character outside it prints as '?'."""
+
+    def __init__(self):
+        self.data = bytearray(INIT + CODEPAGE_CP437)
+
+    def text(self, text):
+        self.data += text.encode('cp437', errors='replace')
+
+    def line(self, text=''):
+        self.text(text + '\n')
+
+    def align(self, where):
+        """'left', 'center' or 'right', for the lines that follow"""
+        self.data += ALIGN[where]
+
+    def bold(self, on=True):
+        self.data += BOLD[on]
+
+    def double_size(self, on=True):
+        self.data += SIZE[on]
+
+    def feed(self, lines=1):
+        self.data += ESC + b'd' + bytes([lines])
+
+    def cut(self, partial=False):
+        self.feed(CUT_FEED)
+        self.data += PARTIAL_CUT if partial else FULL_CUT
+
+    def kick_drawer(self, pin=2):
+        self.data += DRAWER_KICK[pin]
+
+    def getvalue(self):
+        return bytes(self.data)
@@ -0,0 +1,247 @@
+"""Versioned schema migrations.
+
+`Base.metadata.create_all` only creates missing tables, so anything added to an
+existing table (indexes, columns) has to go through here. Each migration is a
+function taking a Core connection; they run in order inside their own transaction
+and must be idempotent, because a fresh database already gets the current schema
+from create_all and then runs every migration on top of it.
+"""
+from functools import lru_cache
+
+from sqlalchemy import text
+
+from app.utils.helpers import to_paise
+from app.utils.logger import app_logger, error_logger
+
+
+def _has_column(conn, table, column):
+    return any(row[1] == column for row in conn.execute(text(f"PRAGMA table_info({table})")))
+
+
+def _create_bill_indexes(conn):
+    # Reports filter on date_time, debt screens filter on customer and (method, status)
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bills_date_time ON bills (date_time)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bills_customer_id ON bills (customer_id)"))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bills_payment_method_status ON bills (payment_method, status)"
+    ))
+
+
+def _create_item_and_product_indexes(conn):
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bill_items_bill_id ON bill_items (bill_id)"))
+    # Barcode lookup; customers.phone is already covered by its unique constraint
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_products_code ON products (code)"))
+
+
+def _add_bill_timestamp(conn):
+    if not _has_column(conn, 'bills', 'date_ts'):
+        conn.execute(text("ALTER TABLE bills ADD COLUMN date_ts INTEGER"))
+    conn.execute(text(
+        "UPDATE bills SET date_ts = CAST(strftime('%s', date_time) AS INTEGER) WHERE date_ts IS NULL"
+    ))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_bills_date_ts ON bills (date_ts)"))
+    # Range queries moved to date_ts, the string index only slowed down inserts
+    conn.execute(text("DROP INDEX IF EXISTS ix_bills_date_time"))
+
+
+@lru_cache(maxsize=65536)
+def _sql_to_paise(value):
+    # Prices and totals repeat a lot, and whole rupees need no decimal rounding
+    if value is None:
+        return None
+    if isinstance(value, int) or (isinstance(value, float) and value.is_integer()):
+        return int(value) * 100
+    return to_paise(value)
+
+
+# Table definitions as of migration 4, with money columns as INTEGER paise
+_PAISE_TABLES = {
+    'products': (
+        """CREATE TABLE products_new (
+            id INTEGER NOT NULL, name VARCHAR NOT NULL, code VARCHAR,
+            base_unit VARCHAR NOT NULL, price_per_unit INTEGER NOT NULL, category VARCHAR,
+            PRIMARY KEY (id))""",
+        "id, name, code, base_unit, to_paise(price_per_unit), category",
+        ["CREATE INDEX ix_products_code ON products (code)"],
+    ),
+    'bills': (
+        """CREATE TABLE bills_new (
+            id INTEGER NOT NULL, bill_number VARCHAR NOT NULL, customer_id INTEGER,
+            date_time VARCHAR NOT NULL, date_ts INTEGER, subtotal INTEGER NOT NULL,
+            tax_percent FLOAT, tax_amount INTEGER, discount_amount INTEGER,
+            grand_total INTEGER NOT NULL, payment_method VARCHAR, status VARCHAR,
+            PRIMARY KEY (id), UNIQUE (bill_number),
+            FOREIGN KEY(customer_id) REFERENCES customers (id))""",
+        "id, bill_number, customer_id, date_time, date_ts, to_paise(subtotal), tax_percent, "
+        "to_paise(tax_amount), to_paise(discount_amount), to_paise(grand_total), payment_method, status",
+        ["CREATE INDEX ix_bills_customer_id ON bills (customer_id)",
+         "CREATE INDEX ix_bills_payment_method_status ON bills (payment_method, status)",
+         "CREATE INDEX ix_bills_date_ts ON bills (date_ts)"],
+    ),
+    'bill_items': (
+        """CREATE TABLE bill_items_new (
+            id INTEGER NOT NULL, bill_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+            product_name VARCHAR NOT NULL, quantity FLOAT NOT NULL, unit VARCHAR NOT NULL,
+            price INTEGER NOT NULL, total INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(bill_id) REFERENCES bills (id),
+            FOREIGN KEY(product_id) REFERENCES products (id))""",
+        "id, bill_id, product_id, product_name, quantity, unit, to_paise(price), to_paise(total)",
+        ["CREATE INDEX ix_bill_items_bill_id ON bill_items (bill_id)"],
+    ),
+}
+
+
+def _convert_money_to_paise(conn):
+    # SQLite cannot change a column type in place, so each table is rebuilt.
+    # Rounding goes through the same to_paise used by the application.
+    conn.connection.driver_connection.create_function('to_paise', 1, _sql_to_paise, deterministic=True)
+    money_columns = {'products': 'price_per_unit', 'bills': 'grand_total', 'bill_items': 'total'}
+    for table, (create_sql, select_list, index_sql) in _PAISE_TABLES.items():
+        column_types = {row[1]: row[2].upper() for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column_types.get(money_columns[table]) == 'INTEGER':
+            continue
+        conn.execute(text(create_sql))
+        conn.execute(text(f"INSERT INTO {table}_new SELECT {select_list} FROM {table}"))
+        conn.execute(text(f"DROP TABLE {table}"))
+        conn.execute(text(f"ALTER TABLE {table}_new RENAME TO {table}"))
+        for statement in index_sql:
+            conn.execute(text(statement))
+
+
+def _fts_supported(conn):
+    try:
+        conn.execute(text("CREATE VIRTUAL TABLE temp._fts_probe USING fts5(x, tokenize='trigram')"))
+        conn.execute(text("DROP TABLE temp._fts_probe"))
+        return True
+    except Exception:
+        return False
+
+
+def _create_search_index(conn, table, columns):
+    """External-content FTS5 table kept in sync with `table` by triggers.
+    The trigram tokenizer matches any substring of 3+ characters, so it returns
+    the same rows as the LIKE '%q%' search it replaces."""
+    fts = f"{table}_fts"
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{cols}, content='{table}', content_rowid='id', tokenize='trigram')"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+    ))
+    conn.execute(text(
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {table} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+        f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+    ))
+    conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def _create_full_text_search(conn):
+    if not _fts_supported(conn):
+        # Searches keep using LIKE when SQLite is built without FTS5 trigram support
+        app_logger.info("SQLite FTS5 trigram tokenizer not available, skipping search index")
+        return
+    _create_search_index(conn, 'products', ['name', 'code'])
+    _create_search_index(conn, 'customers', ['name', 'phone'])
+
+
+def _add_change_tracking(conn):
+    """row_changes holds, per tracked row, the value of a single change counter at
+    its last insert, update or delete, with deletes flagged, so callers can fetch
+    just what changed since the version they last saw. It is a separate table
+    because a trigger updating the row it fires on would run before the FTS sync
+    triggers and corrupt the search index. Triggers keep it correct for writes
+    from any connection or code path."""
+    conn.execute(text("CREATE TABLE IF NOT EXISTS change_version (version INTEGER NOT NULL)"))
+    if conn.execute(text("SELECT COUNT(*) FROM change_version")).scalar() == 0:
+        conn.execute(text("INSERT INTO change_version (version) VALUES (0)"))
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS row_changes ("
+        "table_name VARCHAR NOT NULL, row_id INTEGER NOT NULL, version INTEGER NOT NULL, "
+        "deleted INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (table_name, row_id))"
+    ))
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_row_changes_table_version ON row_changes (table_name, version)"
+    ))
+
+    bump = "UPDATE change_version SET version = version + 1;"
+    for table in ('products', 'customers'):
+        for event, row, deleted in (('INSERT', 'new', 0), ('UPDATE', 'new', 0), ('DELETE', 'old', 1)):
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_changes_{event[0].lower()} AFTER {event} ON {table} "
+                f"BEGIN {bump} INSERT OR REPLACE INTO row_changes (table_name, row_id, version, deleted) "
+                f"SELECT '{table}', {row}.id, version, {deleted} FROM change_version; END"
+            ))
+
+
+def _create_sales_total_index(conn):
+    # Covers SUM(grand_total) over a date range, so report totals never touch the table.
+    # ix_bills_date_ts stays: report pages are ordered by (date_ts, id).
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_bills_date_ts_grand_total ON bills (date_ts, grand_total)"
+    ))
+
+
+# (version, description, function) - append only, never renumber
+MIGRATIONS = [
+    (1, "Indexes for bill date, customer and payment status", _create_bill_indexes),
+    (2, "Indexes for bill items and product codes", _create_item_and_product_indexes),
+    (3, "Indexed integer timestamp for bills", _add_bill_timestamp),
+    (4, "Money columns as integer paise", _convert_money_to_paise),
+    (5, "Full-text search for products and customers", _create_full_text_search),
+    (6, "Change tracking for products and customers", _add_change_tracking),
+    (7, "Covering index for sales totals by date", _create_sales_total_index),
+]
+
+
+def get_schema_version(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def run_migrations(engine):
+    """Applies every migration newer than the stored schema version.
+    Returns the resulting version."""
+    with engine.begin() as conn:
+        current = get_schema_version(conn)
+
+    pending = [m for m in MIGRATIONS if m[0] > current]
+    if not pending:
+        return current
+
+    with engine.connect() as conn:
+        # Table rebuilds need foreign keys off, and SQLite ignores the pragma
+        # inside a transaction, so it is set on the raw connection up front.
+        conn.connection.driver_connection.execute("PRAGMA foreign_keys = OFF")
+        try:
+            for version, description, migrate in pending:
+                with conn.begin():
+                    migrate(conn)
+                    conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': version})
+                app_logger.info(f"Applied migration {version}: {description}")
+                current = version
+
+            # Older databases may hold bill lines for deleted products; report, don't fail
+            with conn.begin():
+                violations = conn.execute(text("PRAGMA foreign_key_check")).all()
+            if violations:
+                error_logger.error(f"Foreign key violations after migration: {len(violations)} row(s)")
+
+            # Refresh planner statistics so the new indexes are picked up right away
+            with conn.begin():
+                conn.execute(text("ANALYZE"))
+        finally:
+            # Drop this connection instead of pooling it, so the next one gets the profile pragmas again
+            conn.invalidate()
+    return current
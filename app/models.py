@@ -1,44 +1,156 @@
-from app.db import get_db
+from app.db import Session, on_database_change, session_scope
 from app.orm_models import Product, Customer, Bill, BillItem, Setting
-from sqlalchemy import or_
+from app.records import ProductRecord, CustomerRecord, BillRecord, BillItemRecord, ReportRecord
+from app.utils.helpers import to_timestamp, DATE_TIME_FORMAT, SECONDS_PER_DAY
+from sqlalchemy import Integer, column, event, func, insert, or_, select, text, tuple_
 from datetime import datetime
+import threading
+
+# fts table name -> whether migration 5 could create it
+_search_indexes = {}
+
+@on_database_change
+def _forget_search_indexes():
+    _search_indexes.clear()
+
+def _has_search_index(session, fts_table):
+    if fts_table not in _search_indexes:
+        _search_indexes[fts_table] = session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': fts_table}
+        ).first() is not None
+    return _search_indexes[fts_table]
+
+def _fts_phrase(query):
+    # Quoted as a single phrase so the trigram index does a plain substring match
+    return '"' + query.replace('"', '""') + '"'
+
+def _recency_weight(days, decay_days):
+    """SQL expression weighting each bill by how recent it is: 1 for a bill made
+    now, 1/2 at decay_days old, 1/3 at twice that. Returns (expression, since_ts)."""
+    now_ts = to_timestamp(datetime.now().strftime(DATE_TIME_FORMAT))
+    weight = 1.0 / (1.0 + (now_ts - Bill.date_ts) / float(decay_days * SECONDS_PER_DAY))
+    return weight, now_ts - days * SECONDS_PER_DAY
+
+def _columns(model, record_cls):
+    return tuple(getattr(model, field) for field in record_cls._fields)
+
+# Reads select just the record columns and build records from the rows,
+# instead of loading ORM objects and copying them with to_dict
+_PRODUCT_COLUMNS = _columns(Product, ProductRecord)
+_CUSTOMER_COLUMNS = _columns(Customer, CustomerRecord)
+
+def _records(session, record_cls, statement, params=None):
+    # Core execution on the session's connection, skipping the ORM result layer
+    return list(map(record_cls._make, session.connection().execute(statement, params)))
+
+def _sql_columns(table, record_cls):
+    return ", ".join(f"{table}.{field}" for field in record_cls._fields)
+
+def _change_version(session):
+    return session.execute(text("SELECT version FROM change_version")).scalar() or 0
+
+def _changes_since(session, model, columns, record_cls, version):
+    # Read in one transaction, so the rows and deletions match the returned version
+    current = _change_version(session)
+    params = {'table': model.__tablename__, 'version': version}
+    changed_ids = text(
+        "SELECT row_id FROM row_changes WHERE table_name = :table AND version > :version AND deleted = 0"
+    ).columns(column('row_id', Integer))
+    changed = select(*columns).filter(model.id.in_(changed_ids)).order_by(model.id)
+    deleted = session.execute(text(
+        "SELECT row_id FROM row_changes WHERE table_name = :table AND version > :version AND deleted = 1"
+    ), params).scalars().all()
+    return _records(session, record_cls, changed, params), list(deleted), current
+
+# Columns of Bill.to_dict, with the customer fields taken from a join instead of
+# a lazy load per bill
+_BILL_COLUMNS = (
+    Bill.id, Bill.bill_number, Bill.customer_id, Bill.date_time, Bill.date_ts,
+    Bill.subtotal, Bill.tax_percent, Bill.tax_amount, Bill.discount_amount,
+    Bill.grand_total, Bill.payment_method, Bill.status,
+    Customer.name.label('customer_name'), Customer.phone.label('customer_phone'),
+)
+_ITEM_COLUMNS = _columns(BillItem, BillItemRecord)
+# Bill ids per items query, the same batching selectinload uses
+_ITEMS_BATCH = 500
+
+def _bill_select():
+    return select(*_BILL_COLUMNS).outerjoin(Customer, Bill.customer_id == Customer.id)
+
+def _bill_records(session, statement, with_items=False):
+    """Runs a _bill_select; with_items fills each bill's 'items' using one query per 500 bills"""
+    rows = session.connection().execute(statement).all()
+    if not with_items:
+        return [BillRecord._make((*row, None)) for row in rows]
+    items = {row.id: [] for row in rows}
+    ids = list(items)
+    for i in range(0, len(ids), _ITEMS_BATCH):
+        statement = select(*_ITEM_COLUMNS).filter(
+            BillItem.bill_id.in_(ids[i:i + _ITEMS_BATCH])
+        ).order_by(BillItem.id)
+        for item in _records(session, BillItemRecord, statement):
+            items[item.bill_id].append(item)
+    return [BillRecord._make((*row, items[row.id])) for row in rows]
 
 class ProductModel:
     @staticmethod
     def add_product(name, code, base_unit, price, category="General"):
-        session = get_db()
-        try:
+        with session_scope() as session:
             product = Product(name=name, code=code, base_unit=base_unit, price_per_unit=price, category=category)
             session.add(product)
-            session.commit()
+            session.flush()
             return product.id
-        finally:
-            session.close()
 
     @staticmethod
     def get_all_products():
-        session = get_db()
-        try:
-            products = session.query(Product).all()
-            return [p.to_dict() for p in products]
-        finally:
-            session.close()
+        with session_scope() as session:
+            return _records(session, ProductRecord, select(*_PRODUCT_COLUMNS))
 
     @staticmethod
-    def search_products(query):
-        session = get_db()
-        try:
-            products = session.query(Product).filter(
-                or_(Product.name.like(f'%{query}%'), Product.code.like(f'%{query}%'))
-            ).all()
-            return [p.to_dict() for p in products]
-        finally:
-            session.close()
+    def get_change_version():
+        """Current change version; read it before loading the full list"""
+        with session_scope() as session:
+            return _change_version(session)
+
+    @staticmethod
+    def get_changes_since(version):
+        """Returns (changed product records, deleted product ids, new version) since `version`"""
+        with session_scope() as session:
+            return _changes_since(session, Product, _PRODUCT_COLUMNS, ProductRecord, version)
+
+    @staticmethod
+    def search_products(query, limit=None):
+        with session_scope() as session:
+            # The trigram index needs at least 3 characters, shorter queries use LIKE
+            if len(query) >= 3 and _has_search_index(session, 'products_fts'):
+                statement = text(
+                    f"SELECT {_sql_columns('products', ProductRecord)} "
+                    "FROM products_fts JOIN products ON products.id = products_fts.rowid "
+                    "WHERE products_fts MATCH :match "
+                    "ORDER BY (products.name LIKE :prefix) DESC, (products.code LIKE :prefix) DESC, products_fts.rank"
+                    + (" LIMIT :limit" if limit else "")
+                )
+                params = {'match': _fts_phrase(query), 'prefix': f'{query}%', 'limit': limit}
+            else:
+                statement = select(*_PRODUCT_COLUMNS).filter(
+                    or_(Product.name.like(f'%{query}%'), Product.code.like(f'%{query}%'))
+                ).limit(limit)
+                params = None
+            return _records(session, ProductRecord, statement, params)
+
+    @staticmethod
+    def get_popularity(days=180, decay_days=30):
+        """product id -> sales score over the last `days`, each bill counting less the older it is"""
+        weight, since_ts = _recency_weight(days, decay_days)
+        with session_scope() as session:
+            rows = session.query(BillItem.product_id, func.sum(weight)).join(
+                Bill, BillItem.bill_id == Bill.id
+            ).filter(Bill.date_ts >= since_ts).group_by(BillItem.product_id).all()
+            return dict(rows)
 
     @staticmethod
     def update_product(product_id, name, code, base_unit, price, category):
-        session = get_db()
-        try:
+        with session_scope() as session:
             product = session.query(Product).get(product_id)
             if product:
                 product.name = name
@@ -46,166 +158,212 @@ class ProductModel:
                 product.base_unit = base_unit
                 product.price_per_unit = price
                 product.category = category
-                session.commit()
-        finally:
-            session.close()
 
     @staticmethod
     def delete_product(product_id):
-        session = get_db()
         try:
-            product = session.query(Product).get(product_id)
-            if product:
+            with session_scope(savepoint=True) as session:
+                product = session.query(Product).get(product_id)
+                if not product:
+                    return False
                 session.delete(product)
-                session.commit()
-        finally:
-            session.close()
+                session.flush()
+                return True
+        except Exception:
+            # Foreign keys are enforced, so products already on a bill cannot be removed
+            return False
 
 class CustomerModel:
     @staticmethod
     def add_customer(name, phone, address):
-        session = get_db()
         try:
-            customer = Customer(name=name, phone=phone, address=address)
-            session.add(customer)
-            session.commit()
-            return customer.id
+            with session_scope(savepoint=True) as session:
+                customer = Customer(name=name, phone=phone, address=address)
+                session.add(customer)
+                session.flush()
+                return customer.id
         except Exception:
-            session.rollback()
             return None
-        finally:
-            session.close()
 
     @staticmethod
     def get_all_customers():
-        session = get_db()
-        try:
-            customers = session.query(Customer).all()
-            return [c.to_dict() for c in customers]
-        finally:
-            session.close()
+        with session_scope() as session:
+            return _records(session, CustomerRecord, select(*_CUSTOMER_COLUMNS))
 
     @staticmethod
-    def search_customer(query):
-        session = get_db()
-        try:
-            customers = session.query(Customer).filter(
-                or_(Customer.name.like(f'%{query}%'), Customer.phone.like(f'%{query}%'))
-            ).all()
-            return [c.to_dict() for c in customers]
-        finally:
-            session.close()
+    def get_change_version():
+        """Current change version; read it before loading the full list"""
+        with session_scope() as session:
+            return _change_version(session)
+
+    @staticmethod
+    def get_changes_since(version):
+        """Returns (changed customer records, deleted customer ids, new version) since `version`"""
+        with session_scope() as session:
+            return _changes_since(session, Customer, _CUSTOMER_COLUMNS, CustomerRecord, version)
+
+    @staticmethod
+    def search_customer(query, limit=None):
+        with session_scope() as session:
+            if len(query) >= 3 and _has_search_index(session, 'customers_fts'):
+                statement = text(
+                    f"SELECT {_sql_columns('customers', CustomerRecord)} "
+                    "FROM customers_fts JOIN customers ON customers.id = customers_fts.rowid "
+                    "WHERE customers_fts MATCH :match "
+                    "ORDER BY (customers.name LIKE :prefix) DESC, (customers.phone LIKE :prefix) DESC, customers_fts.rank"
+                    + (" LIMIT :limit" if limit else "")
+                )
+                params = {'match': _fts_phrase(query), 'prefix': f'{query}%', 'limit': limit}
+            else:
+                statement = select(*_CUSTOMER_COLUMNS).filter(
+                    or_(Customer.name.like(f'%{query}%'), Customer.phone.like(f'%{query}%'))
+                ).limit(limit)
+                params = None
+            return _records(session, CustomerRecord, statement, params)
+
+    @staticmethod
+    def get_popularity(days=180, decay_days=30):
+        """customer id -> visit score over the last `days`, weighted like ProductModel.get_popularity"""
+        weight, since_ts = _recency_weight(days, decay_days)
+        with session_scope() as session:
+            rows = session.query(Bill.customer_id, func.sum(weight)).filter(
+                Bill.customer_id.isnot(None),
+                Bill.date_ts >= since_ts
+            ).group_by(Bill.customer_id).all()
+            return dict(rows)
 
     @staticmethod
     def update_customer(customer_id, name, phone, address):
-        session = get_db()
         try:
-            customer = session.query(Customer).get(customer_id)
-            if customer:
+            with session_scope(savepoint=True) as session:
+                customer = session.query(Customer).get(customer_id)
+                if not customer:
+                    return False
                 customer.name = name
                 customer.phone = phone
                 customer.address = address
-                session.commit()
+                session.flush()
                 return True
-            return False
         except Exception:
-            session.rollback()
             return False
-        finally:
-            session.close()
 
     @staticmethod
     def delete_customer(customer_id):
-        session = get_db()
         try:
-            customer = session.query(Customer).get(customer_id)
-            if customer:
+            with session_scope(savepoint=True) as session:
+                customer = session.query(Customer).get(customer_id)
+                if not customer:
+                    return False
                 session.delete(customer)
-                session.commit()
+                session.flush()
                 return True
-            return False
         except Exception:
-            session.rollback()
             return False
-        finally:
-            session.close()
 
 class BillModel:
     @staticmethod
     def create_bill(bill_data, items):
-        session = get_db()
-        try:
-            bill = Bill(
+        # Core inserts on the session's connection: one statement for the bill and
+        # one executemany for all of its lines, no ORM objects to track per line
+        with session_scope() as session:
+            connection = session.connection()
+            bill_id = connection.execute(insert(Bill).values(
                 bill_number=bill_data['bill_number'],
                 customer_id=bill_data.get('customer_id'),
                 date_time=bill_data['date_time'],
+                date_ts=to_timestamp(bill_data['date_time']),
                 subtotal=bill_data['subtotal'],
                 tax_percent=bill_data.get('tax_percent', 0),
                 tax_amount=bill_data.get('tax_amount', 0),
                 discount_amount=bill_data.get('discount_amount', 0),
                 grand_total=bill_data['grand_total'],
                 payment_method=bill_data['payment_method']
+            )).inserted_primary_key[0]
+
+            if items:
+                connection.execute(insert(BillItem), [{
+                    'bill_id': bill_id,
+                    'product_id': item['product_id'],
+                    'product_name': item['product_name'],
+                    'quantity': item['quantity'],
+                    'unit': item['unit'],
+                    'price': item['price'],
+                    'total': item['total'],
+                } for item in items])
+            return bill_id
+
+    @staticmethod
+    def get_recent_bills(limit=10, with_items=False):
+        with session_scope() as session:
+            statement = _bill_select().order_by(Bill.id.desc()).limit(limit)
+            return _bill_records(session, statement, with_items)
+
+    @staticmethod
+    def get_bill_by_number(bill_number, with_items=False):
+        with session_scope() as session:
+            statement = _bill_select().filter(Bill.bill_number == bill_number)
+            bills = _bill_records(session, statement, with_items)
+            return bills[0] if bills else None
+
+    @staticmethod
+    def get_bills_in_range(start_ts, end_ts, with_items=False):
+        """Get bills with start_ts <= date_ts < end_ts, oldest first"""
+        with session_scope() as session:
+            statement = _bill_select().filter(
+                Bill.date_ts >= start_ts,
+                Bill.date_ts < end_ts
+            ).order_by(Bill.date_ts, Bill.id)
+            return _bill_records(session, statement, with_items)
+
+    @staticmethod
+    def get_report_page(start_ts, end_ts, after=None, limit=500):
+        """
+        One page of the sales report for start_ts <= date_ts < end_ts, oldest first.
+        `after` is the (date_ts, id) of the last row of the previous page; the next
+        page starts right after it through the date_ts index, however deep it is.
+        """
+        with session_scope() as session:
+            statement = select(
+                Bill.id, Bill.date_ts, Bill.date_time, Bill.bill_number,
+                Customer.name.label('customer_name'), Bill.payment_method, Bill.grand_total
+            ).outerjoin(Customer, Bill.customer_id == Customer.id).filter(
+                Bill.date_ts >= start_ts,
+                Bill.date_ts < end_ts
             )
-            session.add(bill)
-            session.flush() # Get ID
-
-            for item in items:
-                bill_item = BillItem(
-                    bill_id=bill.id,
-                    product_id=item['product_id'],
-                    product_name=item['product_name'],
-                    quantity=item['quantity'],
-                    unit=item['unit'],
-                    price=item['price'],
-                    total=item['total']
-                )
-                session.add(bill_item)
-            
-            session.commit()
-            return bill.id
-        except Exception as e:
-            session.rollback()
-            raise e
-        finally:
-            session.close()
+            if after is not None:
+                statement = statement.filter(tuple_(Bill.date_ts, Bill.id) > tuple_(*after))
+            return _records(session, ReportRecord, statement.order_by(Bill.date_ts, Bill.id).limit(limit))
 
     @staticmethod
-    def get_recent_bills(limit=10):
-        session = get_db()
-        try:
-            bills = session.query(Bill).order_by(Bill.id.desc()).limit(limit).all()
-            return [b.to_dict() for b in bills]
-        finally:
-            session.close()
+    def get_sales_summary(start_ts, end_ts):
+        """Bill count and total sales (paise) for start_ts <= date_ts < end_ts"""
+        with session_scope() as session:
+            count, total = session.query(func.count(Bill.id), func.sum(Bill.grand_total)).filter(
+                Bill.date_ts >= start_ts,
+                Bill.date_ts < end_ts
+            ).one()
+            return {'bill_count': count, 'total_sales': total or 0}
 
     @staticmethod
     def delete_all_bills():
-        session = get_db()
-        try:
+        with session_scope() as session:
             session.query(BillItem).delete()
             session.query(Bill).delete()
-            session.commit()
-        finally:
-            session.close()
 
     @staticmethod
-    def get_debt_bills():
+    def get_debt_bills(with_items=False):
         """Get all unpaid debt bills with customer info"""
-        session = get_db()
-        try:
-            bills = session.query(Bill).filter(
+        with session_scope() as session:
+            statement = _bill_select().filter(
                 Bill.payment_method == 'Debt',
                 Bill.status != 'PAID'
-            ).order_by(Bill.id.desc()).all()
-            return [b.to_dict() for b in bills]
-        finally:
-            session.close()
+            ).order_by(Bill.id.desc())
+            return _bill_records(session, statement, with_items)
 
     @staticmethod
     def get_debt_by_customer():
         """Get total debt grouped by customer"""
-        session = get_db()
-        try:
+        with session_scope() as session:
             from sqlalchemy import func
             results = session.query(
                 Customer.id,
@@ -217,7 +375,7 @@ class BillModel:
                 Bill.payment_method == 'Debt',
                 Bill.status != 'PAID'
             ).group_by(Customer.id, Customer.name, Customer.phone).all()
-            
+
             return [{
                 'customer_id': r.id,
                 'customer_name': r.name,
@@ -225,60 +383,91 @@ class BillModel:
                 'total_debt': r.total_debt,
                 'bill_count': r.bill_count
             } for r in results]
-        finally:
-            session.close()
 
     @staticmethod
     def mark_bill_as_paid(bill_id):
         """Mark a debt bill as paid"""
-        session = get_db()
         try:
-            bill = session.query(Bill).get(bill_id)
-            if bill:
+            with session_scope(savepoint=True) as session:
+                bill = session.query(Bill).get(bill_id)
+                if not bill:
+                    return False
                 bill.status = 'PAID'
-                session.commit()
+                session.flush()
                 return True
-            return False
         except Exception:
-            session.rollback()
             return False
-        finally:
-            session.close()
 
     @staticmethod
-    def get_customer_debt_bills(customer_id):
+    def get_customer_debt_bills(customer_id, with_items=False):
         """Get all debt bills for a specific customer"""
-        session = get_db()
-        try:
-            bills = session.query(Bill).filter(
+        with session_scope() as session:
+            statement = _bill_select().filter(
                 Bill.customer_id == customer_id,
                 Bill.payment_method == 'Debt',
                 Bill.status != 'PAID'
-            ).order_by(Bill.id.desc()).all()
-            return [b.to_dict() for b in bills]
-        finally:
-            session.close()
+            ).order_by(Bill.id.desc())
+            return _bill_records(session, statement, with_items)
 
 class SettingsModel:
+    # key -> value for the whole settings table, loaded in one query on first use
+    _cache = None
+    # Bumped by every invalidation, so a load that started before a write
+    # does not put the old values back in the cache when it finishes
+    _generation = 0
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def _settings(cls):
+        cache = cls._cache
+        if cache is None:
+            with cls._cache_lock:
+                generation = cls._generation
+            with session_scope() as session:
+                cache = dict(session.query(Setting.key, Setting.value).all())
+            with cls._cache_lock:
+                if cls._generation == generation:
+                    cls._cache = cache
+        return cache
+
+    @classmethod
+    def invalidate_cache(cls):
+        with cls._cache_lock:
+            cls._generation += 1
+            cls._cache = None
+
     @staticmethod
     def get_setting(key, default=None):
-        session = get_db()
-        try:
-            setting = session.query(Setting).filter_by(key=key).first()
-            return setting.value if setting else default
-        finally:
-            session.close()
+        settings = SettingsModel._settings()
+        return settings[key] if key in settings else default
+
+    @staticmethod
+    def get_many(defaults):
+        """Read several settings at once: {key: default} -> {key: value}"""
+        settings = SettingsModel._settings()
+        return {key: settings[key] if key in settings else default for key, default in defaults.items()}
 
     @staticmethod
     def set_setting(key, value):
-        session = get_db()
-        try:
-            setting = session.query(Setting).filter_by(key=key).first()
-            if setting:
-                setting.value = value
-            else:
-                setting = Setting(key=key, value=value)
-                session.add(setting)
-            session.commit()
-        finally:
-            session.close()
+        SettingsModel.set_many({key: value})
+
+    @staticmethod
+    def set_many(values):
+        """Write several settings in one transaction: {key: value}"""
+        with session_scope() as session:
+            existing = {s.key: s for s in session.query(Setting).filter(Setting.key.in_(list(values)))}
+            for key, value in values.items():
+                if key in existing:
+                    existing[key].value = value
+                else:
+                    session.add(Setting(key=key, value=value))
+            session.info['settings_written'] = True
+        SettingsModel.invalidate_cache()
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _drop_settings_cache(session):
+    # Inside a unit of work the cache may have been reloaded with uncommitted
+    # values, so drop it again once that transaction really ends.
+    if session.info.pop('settings_written', False):
+        SettingsModel.invalidate_cache()
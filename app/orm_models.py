@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from app.db import Base
 from datetime import datetime
@@ -8,9 +8,9 @@ class Product(Base):
     
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    code = Column(String)
+    code = Column(String, index=True)
     base_unit = Column(String, nullable=False)
-    price_per_unit = Column(Float, nullable=False)
+    price_per_unit = Column(Integer, nullable=False) # paise
     category = Column(String)
 
     def to_dict(self):
@@ -44,16 +44,23 @@ class Bill(Base):
     
     id = Column(Integer, primary_key=True)
     bill_number = Column(String, unique=True, nullable=False)
-    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True)
+    customer_id = Column(Integer, ForeignKey('customers.id'), nullable=True, index=True)
     date_time = Column(String, nullable=False) # Keeping as string to match existing format
-    subtotal = Column(Float, nullable=False)
+    date_ts = Column(Integer, index=True) # Seconds from to_timestamp(date_time), used for range queries
+    # Money columns hold integer paise
+    subtotal = Column(Integer, nullable=False)
     tax_percent = Column(Float, default=0)
-    tax_amount = Column(Float, default=0)
-    discount_amount = Column(Float, default=0)
-    grand_total = Column(Float, nullable=False)
+    tax_amount = Column(Integer, default=0)
+    discount_amount = Column(Integer, default=0)
+    grand_total = Column(Integer, nullable=False)
     payment_method = Column(String)
     status = Column(String, default='PAID')
     
+    __table_args__ = (
+        Index('ix_bills_payment_method_status', 'payment_method', 'status'),
+        Index('ix_bills_date_ts_grand_total', 'date_ts', 'grand_total'),
+    )
+    
     customer = relationship("Customer")
     items = relationship("BillItem", back_populates="bill", cascade="all, delete-orphan")
 
@@ -63,6 +70,7 @@ class Bill(Base):
             'bill_number': self.bill_number,
             'customer_id': self.customer_id,
             'date_time': self.date_time,
+            'date_ts': self.date_ts,
             'subtotal': self.subtotal,
             'tax_percent': self.tax_percent,
             'tax_amount': self.tax_amount,
@@ -78,13 +86,13 @@ class BillItem(Base):
     __tablename__ = 'bill_items'
     
     id = Column(Integer, primary_key=True)
-    bill_id = Column(Integer, ForeignKey('bills.id'), nullable=False)
+    bill_id = Column(Integer, ForeignKey('bills.id'), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
     product_name = Column(String, nullable=False)
     quantity = Column(Float, nullable=False)
     unit = Column(String, nullable=False)
-    price = Column(Float, nullable=False)
-    total = Column(Float, nullable=False)
+    price = Column(Integer, nullable=False) # paise
+    total = Column(Integer, nullable=False) # paise
     
     bill = relationship("Bill", back_populates="items")
     product = relationship("Product")
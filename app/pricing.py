@@ -0,0 +1,96 @@
+"""Bill arithmetic: line totals, discount, tax and rounding.
+
+Plain Python with no Qt, so it can be driven from scripts as easily as from the
+cart. Every amount is integer paise and every rounding is half up, as in
+app.utils.helpers. The order is fixed:
+
+    subtotal = sum of line totals (quantity x price)
+    discount = percent of subtotal plus a flat amount, at most the subtotal
+    tax      = tax percent of (subtotal - discount)
+    grand    = subtotal - discount + tax, rounded to the nearest round_to paise
+
+The subtotal is a running sum, so changing one line costs the same on a
+200-line bill as on a 2-line one. A quantity, discount or tax percent that is
+not a finite number raises ValueError and leaves the engine as it was.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+import math
+
+from app.utils.helpers import line_total, percent_of
+
+# Choices for rounding the grand total, in paise
+ROUNDING_STEPS = {'None': 1, '0.50': 50, '1.00': 100}
+
+
+def round_to_step(amount, step):
+    """amount rounded half up to a multiple of step paise"""
+    if step <= 1:
+        return amount
+    return int((Decimal(amount) / step).quantize(Decimal('1'), rounding=ROUND_HALF_UP)) * step
+
+
+class PricingEngine:
+    def __init__(self, tax_percent=0, round_to=1):
+        self.tax_percent = tax_percent
+        self.round_to = round_to
+        self.discount_percent = 0
+        self.discount_flat = 0
+        self._line_totals = []
+        self.subtotal = 0
+
+    @property
+    def tax_percent(self):
+        return self._tax_percent
+
+    @tax_percent.setter
+    def tax_percent(self, percent):
+        if not math.isfinite(percent):
+            raise ValueError(f"Invalid tax percent: {percent!r}")
+        self._tax_percent = percent
+
+    def add_line(self, quantity, price):
+        """Adds a line, returns its total"""
+        total = line_total(quantity, price)
+        self._line_totals.append(total)
+        self.subtotal += total
+        return total
+
+    def set_line(self, index, quantity, price):
+        """Reprices line index, returns its new total"""
+        total = line_total(quantity, price)
+        self.subtotal += total - self._line_totals[index]
+        self._line_totals[index] = total
+        return total
+
+    def remove_line(self, index):
+        self.subtotal -= self._line_totals.pop(index)
+
+    def clear(self):
+        self._line_totals = []
+        self.subtotal = 0
+
+    def line_count(self):
+        return len(self._line_totals)
+
+    def set_discount(self, percent=0, flat=0):
+        """percent of the subtotal plus flat paise; negatives count as none"""
+        if not math.isfinite(percent):
+            raise ValueError(f"Invalid discount percent: {percent!r}")
+        self.discount_percent = min(max(percent, 0), 100)
+        self.discount_flat = max(flat, 0)
+
+    def totals(self):
+        """Bill amounts, with the keys BillModel.create_bill takes"""
+        subtotal = self.subtotal
+        discount_amount = min(percent_of(subtotal, self.discount_percent) + self.discount_flat, subtotal)
+        taxable = subtotal - discount_amount
+        tax_amount = percent_of(taxable, self.tax_percent)
+        grand_total = round_to_step(taxable + tax_amount, self.round_to)
+        return {
+            'subtotal': subtotal,
+            'discount_amount': discount_amount,
+            'tax_percent': self.tax_percent,
+            'tax_amount': tax_amount,
+            'round_off': grand_total - taxable - tax_amount,
+            'grand_total': grand_total,
+        }
@@ -0,0 +1,385 @@
+"""Background printing of receipts.
+
+The UI only calls PrintSpooler.enqueue(), which stores the job and returns. A
+spooler thread prints the jobs one at a time, in enqueue order, through
+PrinterManager.print_receipt and reports every state change through jobChanged.
+
+A job goes queued -> printing -> done. A failed print puts the job back to
+queued and the whole spooler into backoff: the printer is reconnected before
+the next attempt, the wait doubles with every failure in a row (RETRY_BASE up
+to RETRY_MAX), and once a print succeeds again the rest of the queue drains
+straight away in order. retry_now() skips the wait, for when the printer was
+just switched on or its settings changed. A job that failed MAX_ATTEMPTS times
+is marked failed and kept until retry_failed() or cancel().
+
+While no job waits, the spooler runs PrinterManager.check_connection() when
+it is due, so the printer connection is opened before the first receipt and a
+dead one is replaced before the next.
+
+Jobs are written to the queue journal before enqueue() returns and removed
+once printed, so a crash or restart loses no receipt; a job caught mid-print
+is printed again.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from app.utils.logger import error_logger
+from app.utils.helpers import fsync_dir, to_paise
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data')
+JOURNAL_FILE = os.path.join(DATA_DIR, 'print_queue.log')
+QUEUE_FILE = os.path.join(DATA_DIR, 'print_queue.json')  # whole-file queue of earlier versions
+
+QUEUED = 'queued'
+PRINTING = 'printing'
+DONE = 'done'
+FAILED = 'failed'
+
+RETRY_BASE = 2     # seconds before the first retry
+RETRY_MAX = 60     # longest wait between retries
+MAX_ATTEMPTS = 20  # about a quarter of an hour of failures before a job is set aside
+
+COMPACT_MIN = 1000  # journal records before compaction is considered
+COMPACT_RATIO = 4   # compact once records outnumber live jobs this many times
+
+
+class JobStore:
+    """
+    Jobs not yet printed, in enqueue order, kept in an append-only journal
+    (data/print_queue.log). Every change appends one line, "<crc32> <json>", so
+    the cost of a change does not grow with the backlog.
+
+    Lines reach the OS as they are written, which is enough to survive the app
+    crashing; sync() makes them survive a power cut and is called by the spooler
+    thread, so one fsync covers every change since the last one. The spooler
+    calls sync() outside its own lock, so the journal file has a lock of its
+    own and compact() cannot swap the file in the middle of a sync(). On load a
+    torn last line is cut off and any other line failing its checksum is skipped.
+    When dead lines outnumber live jobs the journal is rewritten with just the
+    live jobs.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, legacy_path=QUEUE_FILE):
+        self.path = path
+        self.jobs = {}  # job id -> job dict
+        self._records = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._dirty = False
+        self._file_lock = threading.Lock()  # _file, _dirty and _records
+        self._load()
+        self._file = open(self.path, 'ab')
+        self._import_legacy(legacy_path)
+        if self._records > COMPACT_MIN and self._records > COMPACT_RATIO * len(self.jobs):
+            self.compact()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        skipped = 0
+        while offset < len(data):
+            end = data.find(b'\n', offset)
+            if end == -1:
+                break  # torn write at the end
+            line = data[offset:end]
+            record = self._decode(line)
+            if record is None:
+                if end + 1 == len(data):
+                    break  # a bad last line is a torn write too
+                skipped += 1
+            else:
+                self._apply(record)
+                self._records += 1
+            offset = end + 1
+        if offset < len(data):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+            error_logger.error(f"Print queue journal: cut off {len(data) - offset} bytes of an incomplete write")
+        if skipped:
+            error_logger.error(f"Print queue journal: skipped {skipped} damaged record(s)")
+
+    @staticmethod
+    def _decode(line):
+        checksum, _, payload = line.partition(b' ')
+        try:
+            if int(checksum, 16) != zlib.crc32(payload):
+                return None
+            return json.loads(payload)
+        except ValueError:
+            return None
+
+    def _apply(self, record):
+        op = record['op']
+        if op == 'add':
+            self.jobs[record['job']['id']] = record['job']
+        elif op == 'set':
+            job = self.jobs.get(record['id'])
+            if job is not None:
+                job.update(record['fields'])
+        elif op == 'remove':
+            self.jobs.pop(record['id'], None)
+
+    def _import_legacy(self, legacy_path):
+        # The whole-file queue written by earlier versions, including bare
+        # {'bill_data', 'items'} entries from before the spooler
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            os.replace(legacy_path, legacy_path + '.corrupt')
+            error_logger.error(f"Old print queue unreadable, moved to {legacy_path}.corrupt: {e}")
+            return
+        for entry in entries:
+            if 'id' in entry:
+                job = entry
+            else:
+                _legacy_amounts_to_paise(entry['bill_data'], LEGACY_BILL_AMOUNTS)
+                for item in entry['items']:
+                    _legacy_amounts_to_paise(item, LEGACY_ITEM_AMOUNTS)
+                job = new_job(entry['bill_data'], entry['items'])
+            if job['state'] == PRINTING:
+                job['state'] = QUEUED
+            self.add(job)
+        self.sync()
+        os.remove(legacy_path)
+
+    def _append(self, record):
+        payload = json.dumps(record, separators=(',', ':')).encode('utf-8')
+        with self._file_lock:
+            self._file.write(b'%08x %s\n' % (zlib.crc32(payload), payload))
+            self._file.flush()
+            self._records += 1
+            self._dirty = True
+
+    def add(self, job):
+        self.jobs[job['id']] = job
+        self._append({'op': 'add', 'job': job})
+
+    def update(self, job):
+        self._append({'op': 'set', 'id': job['id'], 'fields': {
+            'state': job['state'], 'attempts': job['attempts'], 'error': job['error'],
+        }})
+
+    def remove(self, job_id):
+        if self.jobs.pop(job_id, None) is None:
+            return
+        self._append({'op': 'remove', 'id': job_id})
+        if self._records > COMPACT_MIN and self._records > COMPACT_RATIO * len(self.jobs):
+            self.compact()
+
+    def sync(self):
+        """fsyncs the changes written since the last sync"""
+        with self._file_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            # A descriptor of its own, so the fsync need not hold the lock and
+            # appends go on meanwhile. If compact() replaces the file first,
+            # this syncs the old one, whose jobs compact() already synced.
+            fd = os.dup(self._file.fileno())
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def compact(self):
+        """Rewrites the journal with one record per live job"""
+        tmp_path = self.path + '.tmp'
+        with self._file_lock:
+            with open(tmp_path, 'wb') as f:
+                for job in self.jobs.values():
+                    payload = json.dumps({'op': 'add', 'job': job}, separators=(',', ':')).encode('utf-8')
+                    f.write(b'%08x %s\n' % (zlib.crc32(payload), payload))
+                f.flush()
+                os.fsync(f.fileno())
+            self._file.close()
+            os.replace(tmp_path, self.path)
+            fsync_dir(os.path.dirname(self.path))
+            self._file = open(self.path, 'ab')
+            self._records = len(self.jobs)
+            self._dirty = False
+
+    def close(self):
+        self.sync()
+        with self._file_lock:
+            self._file.close()
+
+
+# Money fields of a receipt. Bare queue entries from before amounts were paise
+# hold them as float rupees; later bare entries and every job hold int paise.
+LEGACY_BILL_AMOUNTS = ('subtotal', 'discount_amount', 'tax_amount', 'grand_total')
+LEGACY_ITEM_AMOUNTS = ('price', 'total')
+
+
+def _legacy_amounts_to_paise(record, fields):
+    for field in fields:
+        if isinstance(record.get(field), float):
+            record[field] = to_paise(record[field])
+
+
+def new_job(bill_data, items):
+    return {
+        'id': uuid.uuid4().hex,
+        'bill_number': bill_data['bill_number'],
+        'bill_data': bill_data,
+        'items': [dict(item) for item in items],
+        'state': QUEUED,
+        'attempts': 0,
+        'error': None,
+        'created_at': time.time(),
+    }
+
+
+class PrintSpooler(QObject):
+    jobChanged = pyqtSignal(str, str)  # job id, new state
+
+    def __init__(self, printer_manager, parent=None, store=None):
+        super().__init__(parent)
+        self.printer_manager = printer_manager
+        self.store = store or JobStore()
+        self._wake = threading.Condition()
+        self._stopping = False
+        self._failures = 0        # failed prints in a row, sets the backoff
+        self._retry_at = 0        # time.monotonic() before which nothing is printed
+        self._reconnect = False   # drop the printer connection before the next print
+        self._thread = None
+
+    def start(self):
+        """Starts the spooler thread; jobs left from the last run print first"""
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='print-spooler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stops after the print in progress, if any; queued jobs stay stored"""
+        if self._thread is not None:
+            with self._wake:
+                self._stopping = True
+                self._wake.notify()
+            self._thread.join(timeout)
+            self._thread = None
+        with self._wake:
+            self.store.sync()
+
+    def enqueue(self, bill_data, items):
+        """Stores a print job for the receipt and returns its id"""
+        job = new_job(bill_data, items)
+        with self._wake:
+            self.store.add(job)
+            self._wake.notify()
+        self.jobChanged.emit(job['id'], QUEUED)
+        return job['id']
+
+    def retry_now(self):
+        """Reconnects and prints the waiting jobs now instead of after the backoff"""
+        with self._wake:
+            self._retry_at = 0
+            self._reconnect = True
+            self._wake.notify()
+
+    def retry_failed(self):
+        """Puts jobs marked failed back in the queue"""
+        with self._wake:
+            retried = [job for job in self.store.jobs.values() if job['state'] == FAILED]
+            for job in retried:
+                job['state'] = QUEUED
+                job['attempts'] = 0
+                self.store.update(job)
+        for job in retried:
+            self.jobChanged.emit(job['id'], QUEUED)
+        self.retry_now()
+
+    def cancel(self, job_id):
+        """Drops a job that is not being printed; returns whether it was dropped"""
+        with self._wake:
+            job = self.store.jobs.get(job_id)
+            if job is None or job['state'] == PRINTING:
+                return False
+            self.store.remove(job_id)
+        return True
+
+    def jobs(self):
+        with self._wake:
+            return [dict(job) for job in self.store.jobs.values()]
+
+    def status(self):
+        """(jobs waiting to print, jobs failed, seconds until the next retry or 0)"""
+        with self._wake:
+            states = [job['state'] for job in self.store.jobs.values()]
+            wait = max(0.0, self._retry_at - time.monotonic())
+        failed = states.count(FAILED)
+        return len(states) - failed, failed, wait
+
+    def _next_job(self):
+        # Oldest job still to print
+        for job in self.store.jobs.values():
+            if job['state'] == QUEUED:
+                return job
+        return None
+
+    def _run(self):
+        while True:
+            self.store.sync()
+            with self._wake:
+                while True:
+                    if self._stopping:
+                        return
+                    job = self._next_job()
+                    if job is None:
+                        # Idle: check the printer connection when it is due, outside the lock
+                        wait = self.printer_manager.seconds_until_check()
+                        if wait <= 0 or self._reconnect:
+                            break
+                        self._wake.wait(wait)
+                        continue
+                    delay = self._retry_at - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._wake.wait(delay)
+                if job is not None:
+                    # Not saved: a job cut off mid-print is still queued on disk and prints again
+                    job['state'] = PRINTING
+                reconnect, self._reconnect = self._reconnect, False
+            if reconnect:
+                self.printer_manager.disconnect()
+            if job is None:
+                self.printer_manager.check_connection()
+                continue
+            # One fsync for everything enqueued while the spooler was busy or idle
+            self.store.sync()
+            self.jobChanged.emit(job['id'], PRINTING)
+            self._print(job)
+
+    def _print(self, job):
+        try:
+            self.printer_manager.print_receipt(job['bill_data'], job['items'])
+        except Exception as e:
+            with self._wake:
+                self._failures += 1
+                delay = min(RETRY_BASE * 2 ** (self._failures - 1), RETRY_MAX)
+                self._retry_at = time.monotonic() + delay
+                self._reconnect = True
+                job['attempts'] += 1
+                job['error'] = str(e)
+                job['state'] = FAILED if job['attempts'] >= MAX_ATTEMPTS else QUEUED
+                self.store.update(job)
+            error_logger.error(f"Printing bill {job['bill_number']} failed (attempt {job['attempts']}), "
+                               f"retrying in {delay}s: {e}")
+            self.jobChanged.emit(job['id'], job['state'])
+            return
+
+        with self._wake:
+            self._failures = 0
+            self._retry_at = 0
+            self.store.remove(job['id'])
+        self.jobChanged.emit(job['id'], DONE)
@@ -1,8 +1,10 @@
 import os
-import json
 import smtplib
+import socket
 import subprocess
 import tempfile
+import threading
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
@@ -13,7 +15,9 @@ from reportlab.lib.units import mm
 
 from app.utils.logger import error_logger, transaction_logger
 from app.utils.exceptions import PrinterError
+from app.utils.helpers import format_amount
 from app.models import SettingsModel
+from app.receipt import render_receipt, to_escpos
 
 
 def get_windows_printers():
@@ -83,192 +87,291 @@ def get_usb_printers():
     return printers
 
 
-class PrinterManager:
-    def __init__(self):
+CONNECT_TIMEOUT = 5       # seconds to open a network printer or finish a write to it
+STATUS_TIMEOUT = 2        # seconds to wait for the reply to a status request
+CHECK_INTERVAL = 30       # seconds between liveness checks of an idle connection
+VERIFY_AFTER = 5          # a connection idle this long is checked again before a write
+RECONNECT_BASE = 1        # seconds before the first reconnect attempt
+RECONNECT_MAX = 60        # longest wait between reconnect attempts
+STATUS_REQUEST = b'\x10\x04\x01'  # DLE EOT 1: transmit printer status
+STATUS_OFFLINE = 0x08     # bit of the status reply set while the printer is offline
+
+
+class PrinterConnection:
+    """
+    The open connection to the configured USB, Serial or Network printer, kept
+    across receipts. A write that fails closes it and the next send opens a new
+    one. check() asks the printer for its status (DLE EOT 1) and reconnects if
+    the connection turns out dead; the print spooler calls it while idle, every
+    CHECK_INTERVAL seconds, or with backoff from RECONNECT_BASE to RECONNECT_MAX
+    while the printer cannot be reached. send() does the same check first on a
+    connection idle for VERIFY_AFTER seconds, because a write to a printer that
+    restarted since can succeed locally and never print. Printers that never
+    answer a status request are taken as alive as long as the request can be
+    written. The first unanswered request marks the printer as one that does
+    not answer, and later checks of it, on this or any later connection, do not
+    wait STATUS_TIMEOUT for a reply; for a network printer they only look
+    whether it has closed the connection.
+
+    build() makes an unopened printer from the settings, or None when receipts
+    do not go through a connection (Windows printing). Connect times, reconnects
+    and failures are counted in stats.
+    """
+
+    def __init__(self, build):
+        self._build = build
         self.printer = None
-        self.queue_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'print_queue.json')
-        self._load_queue()
+        self._lock = threading.RLock()  # the spooler thread prints, close() may come from the UI
+        self._failures = 0       # failed connects in a row, sets the backoff
+        self._next_check = 0     # time.monotonic() of the next liveness check
+        self._last_used = 0      # time.monotonic() of the last write or check that went through
+        self._answers_status = {}  # printer target -> whether it answers status requests
+        self.stats = {
+            'connects': 0,
+            'reconnects': 0,
+            'connect_failures': 0,
+            'write_failures': 0,
+            'checks': 0,
+            'check_failures': 0,
+            'last_connect_ms': None,
+            'total_connect_ms': 0.0,
+            'online': None,
+            'last_error': None,
+        }
 
-    def _load_queue(self):
-        if os.path.exists(self.queue_file):
+    def connect(self):
+        """Opens a new connection from the current settings, closing the old one"""
+        with self._lock:
+            self.close()
+            start = time.perf_counter()
             try:
-                with open(self.queue_file, 'r') as f:
-                    self.queue = json.load(f)
-            except:
-                self.queue = []
-        else:
-            self.queue = []
+                printer = self._build()
+                if printer is not None:
+                    printer.open()
+            except Exception as e:
+                self._failures += 1
+                delay = min(RECONNECT_BASE * 2 ** (self._failures - 1), RECONNECT_MAX)
+                self._next_check = time.monotonic() + delay
+                self.stats['connect_failures'] += 1
+                self.stats['last_error'] = str(e)
+                raise PrinterError(f"Could not connect to the printer: {e}")
 
-    def _save_queue(self):
-        with open(self.queue_file, 'w') as f:
-            json.dump(self.queue, f)
+            self._failures = 0
+            self._last_used = time.monotonic()
+            self._next_check = self._last_used + CHECK_INTERVAL
+            self.printer = printer
+            if printer is not None:
+                elapsed = (time.perf_counter() - start) * 1000
+                if self.stats['connects']:
+                    self.stats['reconnects'] += 1
+                self.stats['connects'] += 1
+                self.stats['last_connect_ms'] = elapsed
+                self.stats['total_connect_ms'] += elapsed
+                transaction_logger.info(f"Printer connected in {elapsed:.0f} ms")
+            return printer
 
-    def connect_printer(self):
-        """Attempts to connect to the configured printer."""
-        printer_type = SettingsModel.get_setting('printer_type', 'Windows Printer')
+    def close(self):
+        with self._lock:
+            printer, self.printer = self.printer, None
+            if printer is not None:
+                try:
+                    printer.close()
+                except Exception as e:
+                    error_logger.error(f"Closing the printer connection failed: {e}")
+
+    def send(self, data):
+        """Writes data to the printer, connecting first if needed"""
+        with self._lock:
+            if self.printer is not None and time.monotonic() - self._last_used > VERIFY_AFTER:
+                self._verify()
+            printer = self.printer or self.connect()
+            if printer is None:
+                raise PrinterError("No USB, Serial or Network printer configured")
+            try:
+                printer._raw(data)
+            except Exception as e:
+                self.stats['write_failures'] += 1
+                self.stats['last_error'] = str(e)
+                self.close()
+                raise PrinterError(f"Writing to the printer failed: {e}")
+            self._last_used = time.monotonic()
+            self._next_check = self._last_used + CHECK_INTERVAL
+
+    def seconds_until_check(self):
+        return max(0.0, self._next_check - time.monotonic())
+
+    def check(self):
+        """Checks the open connection, or opens one; returns whether the printer is reachable"""
+        with self._lock:
+            if self.printer is not None and self._verify():
+                return True
+            try:
+                return self.connect() is not None
+            except PrinterError as e:
+                error_logger.error(f"{e}, next attempt in {self.seconds_until_check():.0f}s")
+                return False
+
+    def _verify(self):
+        # Closes the connection if it is dead, returns whether it is alive
+        self.stats['checks'] += 1
         try:
-            if printer_type == 'USB (Direct)':
-                vid = int(SettingsModel.get_setting('printer_usb_vid', '0'), 16)
-                pid = int(SettingsModel.get_setting('printer_usb_pid', '0'), 16)
-                if vid and pid:
-                    self.printer = Usb(vid, pid)
-                else:
-                    self.printer = Dummy()
-            elif printer_type == 'Serial':
-                port = SettingsModel.get_setting('printer_serial_port', 'COM1')
-                self.printer = Serial(port)
-            elif printer_type == 'Network':
-                ip = SettingsModel.get_setting('printer_ip', '192.168.1.100')
-                self.printer = Network(ip)
-            elif printer_type == 'Windows Printer':
-                self.printer = None  # Will use Windows printing
-            else:
-                self.printer = Dummy()
+            self._query_status()
         except Exception as e:
-            error_logger.error(f"Failed to connect to printer: {e}")
-            self.printer = Dummy()
+            self.stats['check_failures'] += 1
+            self.stats['last_error'] = str(e)
+            error_logger.error(f"Printer connection lost, reconnecting: {e}")
+            self.close()
+            return False
+        self._last_used = time.monotonic()
+        self._next_check = self._last_used + CHECK_INTERVAL
+        return True
+
+    def _query_status(self):
+        # A write error or a closed connection raises. No reply in time only
+        # counts as dead from a printer that has answered before.
+        printer = self.printer
+        if isinstance(printer, Dummy):
+            return
+        target = self._target(printer)
+        answers = self._answers_status.get(target)  # None until its first status request
+        printer._raw(STATUS_REQUEST)
+        if answers is False:
+            status = self._poll_status(printer)
+        elif isinstance(printer, Network):
+            printer.device.settimeout(STATUS_TIMEOUT)
+            try:
+                status = printer._read()
+            except socket.timeout:
+                status = None
+            finally:
+                printer.device.settimeout(CONNECT_TIMEOUT)
+            if status == b'':
+                raise ConnectionError("Connection closed by the printer")
+        else:
+            try:
+                status = printer._read()
+            except Exception:
+                status = None
+        if not status:
+            if answers:
+                # Learned again on the next connection, in case it now never answers
+                del self._answers_status[target]
+                raise TimeoutError("Printer stopped answering status requests")
+            if answers is None:
+                self._answers_status[target] = False
+                transaction_logger.info("Printer does not answer status requests, not waiting for them again")
+            return
+        self._answers_status[target] = True
+        online = not status[0] & STATUS_OFFLINE
+        if not online and self.stats['online'] is not False:
+            error_logger.error("Printer reports it is offline (cover open or out of paper?)")
+        self.stats['online'] = online
+
+    @staticmethod
+    def _poll_status(printer):
+        # Reads what has already arrived, without waiting: a reply means the
+        # printer answers after all, end of stream means it closed the connection
+        if not isinstance(printer, Network):
+            return None
+        printer.device.settimeout(0)
+        try:
+            status = printer.device.recv(16)
+        except BlockingIOError:
+            return None
+        finally:
+            printer.device.settimeout(CONNECT_TIMEOUT)
+        if status == b'':
+            raise ConnectionError("Connection closed by the printer")
+        return status
+
+    @staticmethod
+    def _target(printer):
+        # The device a printer object connects to, the same across reconnects
+        if isinstance(printer, Network):
+            return ('Network', printer.host, printer.port)
+        if isinstance(printer, Usb):
+            return ('USB', printer.usb_args.get('idVendor'), printer.usb_args.get('idProduct'))
+        if isinstance(printer, Serial):
+            return ('Serial', printer.devfile)
+        return (type(printer).__name__,)
+
+
+class PrinterManager:
+    """Talks to the configured printer. Failed prints raise PrinterError;
+    retrying them is up to the caller (see app.print_spooler)."""
+    def __init__(self):
+        self.connection = PrinterConnection(self.build_printer)
+
+    @staticmethod
+    def build_printer():
+        """An unopened printer for the configured type, None for Windows printing.
+        Raises PrinterError when the settings do not name a printer."""
+        printer_type = SettingsModel.get_setting('printer_type', 'Windows Printer')
+        if printer_type == 'USB (Direct)':
+            try:
+                vid = int(SettingsModel.get_setting('printer_usb_vid', '') or '0', 16)
+                pid = int(SettingsModel.get_setting('printer_usb_pid', '') or '0', 16)
+            except ValueError:
+                raise PrinterError("Invalid USB printer vendor or product ID")
+            if not (vid and pid):
+                raise PrinterError("USB printer vendor and product ID are not set")
+            return Usb(vid, pid)
+        elif printer_type == 'Serial':
+            port = SettingsModel.get_setting('printer_serial_port', 'COM1')
+            return Serial(port)
+        elif printer_type == 'Network':
+            # "host" or "host:port", port 9100 by default
+            address = SettingsModel.get_setting('printer_ip', '192.168.1.100').strip()
+            host, _, port = address.partition(':')
+            try:
+                port = int(port) if port else 9100
+            except ValueError:
+                raise PrinterError(f"Invalid network printer address: {address}")
+            return Network(host, port=port, timeout=CONNECT_TIMEOUT)
+        elif printer_type == 'Windows Printer':
+            return None  # Will use Windows printing
+        elif printer_type == 'Dummy':
+            return Dummy()  # prints nowhere
+        raise PrinterError(f"Unknown printer type: {printer_type}")
+
+    def disconnect(self):
+        """Closes the printer connection; the next print or check opens it from the current settings"""
+        self.connection.close()
+
+    def check_connection(self):
+        self.connection.check()
+
+    def seconds_until_check(self):
+        return self.connection.seconds_until_check()
 
     def print_receipt(self, bill_data, items):
         """Prints the receipt."""
-        printer_type = SettingsModel.get_setting('printer_type', 'Windows Printer')
-        
-        # Use Windows printing for Windows Printer type
-        if printer_type == 'Windows Printer':
-            return self.print_receipt_windows(bill_data, items)
-        
-        try:
-            if not self.printer:
-                self.connect_printer()
+        settings = SettingsModel.get_many({
+            'printer_type': 'Windows Printer',
+            'cash_drawer_kick': 'false',
+        })
+        # Laid out by app.receipt, the same lines the preview shows, and sent in one write
+        layout, lines = render_receipt(bill_data, items)
+        raw_bytes = to_escpos(lines, layout, kick_drawer=settings['cash_drawer_kick'] == 'true')
 
-            store_name = SettingsModel.get_setting('store_name', 'Thangam Stores')
-            store_address = SettingsModel.get_setting('store_address', '123 Main St, City')
-            footer_text = SettingsModel.get_setting('receipt_footer', 'Thank you for shopping!')
-
-            self.printer.text(f"{store_name}\n")
-            self.printer.text(f"{store_address}\n")
-            self.printer.text(f"Date: {bill_data['date_time']}\n")
-            self.printer.text(f"Bill No: {bill_data['bill_number']}\n")
-            self.printer.text(f"Customer: {bill_data.get('customer_name', 'Walk-in')}\n")
-            if bill_data.get('customer_phone'):
-                self.printer.text(f"Phone: {bill_data['customer_phone']}\n")
-            self.printer.text("-" * 32 + "\n")
-            self.printer.text(f"{'Item':<16} {'Qty':<5} {'Price':<8}\n")
-            self.printer.text("-" * 32 + "\n")
+        # Use Windows printing for Windows Printer type
+        if settings['printer_type'] == 'Windows Printer':
+            return self.print_receipt_windows(bill_data, raw_bytes)
 
-            for item in items:
-                name = item['product_name'][:16]
-                qty = f"{item['quantity']}{item['unit']}"
-                price = f"{item['total']:.2f}"
-                self.printer.text(f"{name:<16} {qty:<5} {price:<8}\n")
-
-            self.printer.text("-" * 32 + "\n")
-            self.printer.text(f"Subtotal: {bill_data['subtotal']:.2f}\n")
-            if bill_data.get('tax_amount'):
-                self.printer.text(f"Tax: {bill_data['tax_amount']:.2f}\n")
-            if bill_data.get('discount_amount'):
-                self.printer.text(f"Discount: -{bill_data['discount_amount']:.2f}\n")
-            self.printer.text(f"Total: {bill_data['grand_total']:.2f}\n")
-            self.printer.text("-" * 32 + "\n")
-            self.printer.text(f"{footer_text}\n")
-            self.printer.cut()
-            
+        try:
+            self.connection.send(raw_bytes)
             transaction_logger.info(f"Printed bill {bill_data['bill_number']}")
 
         except Exception as e:
             error_logger.error(f"Print failed: {e}")
-            self.queue.append({'bill_data': bill_data, 'items': items})
-            self._save_queue()
-            raise PrinterError("Printing failed. Added to queue.")
+            raise PrinterError(f"Printing failed: {e}")
 
-    def print_receipt_windows(self, bill_data, items):
-        """Print receipt using Windows printer with ESC/POS auto-cut"""
+    def print_receipt_windows(self, bill_data, raw_bytes):
+        """Sends the receipt's ESC/POS bytes to the Windows printer as a RAW job"""
         printer_name = SettingsModel.get_setting('windows_printer_name', '')
         if not printer_name:
             raise PrinterError("No Windows printer configured")
-        
-        store_name = SettingsModel.get_setting('store_name', 'Thangam Stores')
-        store_address = SettingsModel.get_setting('store_address', '')
-        store_phone = SettingsModel.get_setting('store_phone', '')
-        footer_text = SettingsModel.get_setting('receipt_footer', 'Thank you for shopping!')
-        
-        # Get paper width setting
-        WIDTH = int(SettingsModel.get_setting('chars_per_line', '48'))
-        line_spacing = SettingsModel.get_setting('line_spacing', 'Normal')
-        
-        # Calculate column widths based on paper width
-        if WIDTH >= 48:
-            item_col, qty_col, amt_col = 24, 8, 14
-        elif WIDTH >= 42:
-            item_col, qty_col, amt_col = 20, 8, 12
-        else:
-            item_col, qty_col, amt_col = 14, 6, 10
-        
-        spacing = "" if line_spacing == "Compact" else "\n" if line_spacing == "Relaxed" else ""
-        
-        # Build receipt text
-        lines = []
-        lines.append("=" * WIDTH)
-        lines.append(f"{store_name[:WIDTH]:^{WIDTH}}")
-        if store_address:
-            if len(store_address) > WIDTH:
-                lines.append(store_address[:WIDTH])
-            else:
-                lines.append(f"{store_address:^{WIDTH}}")
-        if store_phone:
-            lines.append(f"{'Ph: ' + store_phone:^{WIDTH}}")
-        lines.append("=" * WIDTH)
-        if spacing:
-            lines.append(spacing)
-        lines.append(f"Bill No: {bill_data['bill_number']}")
-        lines.append(f"Date: {bill_data['date_time']}")
-        lines.append(f"Customer: {bill_data.get('customer_name', 'Walk-in')[:WIDTH-10]}")
-        if bill_data.get('customer_phone'):
-            lines.append(f"Phone: {bill_data['customer_phone']}")
-        if spacing:
-            lines.append(spacing)
-        lines.append("-" * WIDTH)
-        lines.append(f"{'ITEM':<{item_col}} {'QTY':^{qty_col}} {'AMT':>{amt_col}}")
-        lines.append("-" * WIDTH)
-        
-        for item in items:
-            name = item['product_name'][:item_col]
-            qty = f"{item['quantity']}{item['unit']}"[:qty_col]
-            amt = f"{item['total']:.2f}"[:amt_col]
-            lines.append(f"{name:<{item_col}} {qty:^{qty_col}} {amt:>{amt_col}}")
-        
-        lines.append("-" * WIDTH)
-        if spacing:
-            lines.append(spacing)
-        
-        label_col = WIDTH - amt_col - 2
-        lines.append(f"{'Subtotal':<{label_col}} Rs.{bill_data['subtotal']:>{amt_col-3}.2f}")
-        if bill_data.get('tax_amount') and bill_data['tax_amount'] > 0:
-            lines.append(f"{'Tax':<{label_col}} Rs.{bill_data['tax_amount']:>{amt_col-3}.2f}")
-        if bill_data.get('discount_amount') and bill_data['discount_amount'] > 0:
-            lines.append(f"{'Discount':<{label_col}} -{bill_data['discount_amount']:>{amt_col-2}.2f}")
-        if spacing:
-            lines.append(spacing)
-        lines.append("=" * WIDTH)
-        lines.append(f"{'TOTAL':<{label_col}} Rs.{bill_data['grand_total']:>{amt_col-3}.2f}")
-        lines.append("=" * WIDTH)
-        if spacing:
-            lines.append(spacing)
-        lines.append(f"{'Pay: ' + bill_data.get('payment_method', 'Cash'):^{WIDTH}}")
-        if spacing:
-            lines.append(spacing)
-        lines.append(f"{footer_text[:WIDTH]:^{WIDTH}}")
-        lines.append(f"{'*** THANK YOU ***':^{WIDTH}}")
-        lines.append("")
-        lines.append("")
-        lines.append("")
-        
-        receipt_text = "\n".join(lines)
-        
-        # ESC/POS commands: Initialize printer + Full cut
-        # \x1b@ = Initialize printer, \x1dV\x00 = Full cut
-        cut_bytes = b"\n\n\n\x1b@\x1dV\x00"
-        raw_bytes = receipt_text.encode('cp437', errors='replace') + cut_bytes
-        
+
         try:
             printed = False
             
@@ -407,11 +510,11 @@ public class RawPrinter {{
             for item in items:
                 c.drawString(20*mm, y, item['product_name'])
                 c.drawString(100*mm, y, f"{item['quantity']} {item['unit']}")
-                c.drawString(150*mm, y, f"{item['total']:.2f}")
+                c.drawString(150*mm, y, format_amount(item['total']))
                 y -= 10*mm
 
             y -= 10*mm
-            c.drawString(120*mm, y, f"Total: {bill_data['grand_total']:.2f}")
+            c.drawString(120*mm, y, f"Total: {format_amount(bill_data['grand_total'])}")
             
             c.save()
             return True
@@ -435,7 +538,7 @@ public class RawPrinter {{
             msg['To'] = recipient_email
             msg['Subject'] = f"Receipt from Thangam Stores - {bill_data['bill_number']}"
 
-            body = f"Thank you for shopping!\n\nBill No: {bill_data['bill_number']}\nTotal: {bill_data['grand_total']:.2f}"
+            body = f"Thank you for shopping!\n\nBill No: {bill_data['bill_number']}\nTotal: {format_amount(bill_data['grand_total'])}"
             msg.attach(MIMEText(body, 'plain'))
 
             server = smtplib.SMTP(smtp_server, int(smtp_port))
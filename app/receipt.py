@@ -0,0 +1,227 @@
+"""Receipt layout shared by printing, the preview and the PDF export.
+
+A ReceiptLayout is compiled once for a settings snapshot (paper width, store
+header, footer, line spacing): column widths, row formats and the header and
+footer lines are worked out there and the layout is cached by the snapshot.
+layout.render() turns a bill into a list of Line tuples, and the backends draw
+those lines without looking at settings again:
+
+    layout.to_text(lines)         plain text, for the preview
+    to_escpos(lines, layout)      ESC/POS bytes, for every receipt printer
+    to_pdf(lines, layout, path)   a PDF the width of the receipt paper
+
+render_receipt() also keeps the last few rendered bills, so the preview and the
+print of one bill share a single render.
+"""
+from collections import OrderedDict, namedtuple
+from functools import lru_cache
+import threading
+
+from reportlab.lib.units import mm
+from reportlab.pdfgen import canvas
+
+from app.escpos_buffer import EscPosBuffer
+from app.models import SettingsModel
+from app.utils.helpers import format_amount
+
+# Line kinds; the cells of each kind are in the comment
+TEXT = 'text'      # (text,), placed by align
+ITEM = 'item'      # (name, quantity, amount)
+AMOUNT = 'amount'  # (label, amount)
+RULE = 'rule'      # (character,)
+BLANK = 'blank'    # ()
+
+Line = namedtuple('Line', 'kind cells align bold')
+
+LAYOUT_SETTINGS = {
+    'store_name': 'Thangam Stores',
+    'store_address': '',
+    'store_phone': '',
+    'receipt_footer': 'Thank you for shopping!',
+    'chars_per_line': '48',
+    'line_spacing': 'Normal',
+}
+
+RENDER_CACHE_SIZE = 8
+
+# PDF page widths by characters per line, and the line heights on them
+PDF_PAGE_WIDTHS = ((48, 80 * mm), (42, 76 * mm), (0, 58 * mm))
+PDF_LINE_HEIGHT = 4 * mm
+PDF_MARGIN = 5 * mm
+
+
+def text(value, align='left', bold=False):
+    return Line(TEXT, (value,), align, bold)
+
+
+def rule(char='-'):
+    return Line(RULE, (char,), 'left', False)
+
+
+class ReceiptLayout:
+    def __init__(self, settings):
+        self.width = width = int(settings['chars_per_line'])
+        if width >= 48:
+            self.qty_col, self.amt_col = 8, 14
+        elif width >= 42:
+            self.qty_col, self.amt_col = 8, 12
+        else:
+            self.qty_col, self.amt_col = 6, 10
+        self.item_col = max(width - self.qty_col - self.amt_col - 2, 8)
+        self.item_format = (f"{{:<{self.item_col}.{self.item_col}}} {{:^{self.qty_col}.{self.qty_col}}} "
+                            f"{{:>{self.amt_col}.{self.amt_col}}}")
+        self.amount_format = f"{{:<{width - self.amt_col - 1}}} {{:>{self.amt_col}}}"
+        self.relaxed = settings['line_spacing'] == 'Relaxed'
+
+        header = [rule('='), text(settings['store_name'][:width], 'center', True)]
+        address = settings['store_address']
+        if len(address) > width:
+            header += [text(address[:width]), text(address[width:width * 2], 'center')]
+        elif address:
+            header.append(text(address, 'center'))
+        if settings['store_phone']:
+            header.append(text('Ph: ' + settings['store_phone'], 'center'))
+        header.append(rule('='))
+        self.header = tuple(header)
+        self.footer = (text(settings['receipt_footer'][:width], 'center'), text('*** THANK YOU ***', 'center'))
+
+    def render(self, bill_data, items):
+        """The lines of the receipt for a bill; amounts are paise as saved"""
+        spacer = [Line(BLANK, (), 'left', False)] if self.relaxed else []
+        lines = list(self.header) + spacer
+        lines.append(text(f"Bill No: {bill_data['bill_number']}"))
+        lines.append(text(f"Date: {bill_data['date_time']}"))
+        lines.append(text(f"Customer: {bill_data.get('customer_name', 'Walk-in')[:self.width - 10]}"))
+        if bill_data.get('customer_phone'):
+            lines.append(text(f"Phone: {bill_data['customer_phone']}"))
+        lines += spacer
+        lines += [rule(), Line(ITEM, ('ITEM', 'QTY', 'AMT'), 'left', True), rule()]
+
+        for item in items:
+            lines.append(Line(ITEM, (item['product_name'], f"{item['quantity']}{item['unit']}",
+                                     format_amount(item['total'])), 'left', False))
+
+        subtotal = bill_data['subtotal']
+        discount = bill_data.get('discount_amount') or 0
+        tax = bill_data.get('tax_amount') or 0
+        grand_total = bill_data['grand_total']
+        round_off = grand_total - (subtotal - discount + tax)
+
+        lines.append(rule())
+        lines += spacer
+        lines.append(Line(AMOUNT, ('Subtotal', f"Rs.{format_amount(subtotal)}"), 'left', False))
+        if discount > 0:
+            lines.append(Line(AMOUNT, ('Discount', f"-Rs.{format_amount(discount)}"), 'left', False))
+        if tax > 0:
+            label = f"Tax ({bill_data['tax_percent']:g}%)" if bill_data.get('tax_percent') else 'Tax'
+            lines.append(Line(AMOUNT, (label, f"Rs.{format_amount(tax)}"), 'left', False))
+        if round_off:
+            lines.append(Line(AMOUNT, ('Round Off', format_amount(round_off)), 'left', False))
+        lines += spacer
+        lines += [rule('='), Line(AMOUNT, ('TOTAL', f"Rs.{format_amount(grand_total)}"), 'left', True), rule('=')]
+        lines += spacer
+        lines.append(text(f"Pay: {bill_data.get('payment_method', 'Cash')}", 'center'))
+        lines += spacer
+        lines += self.footer
+        return lines
+
+    def format_line(self, line):
+        """One line as fixed-width text"""
+        if line.kind == ITEM:
+            return self.item_format.format(*line.cells)
+        if line.kind == AMOUNT:
+            return self.amount_format.format(*line.cells)
+        if line.kind == RULE:
+            return line.cells[0] * self.width
+        if line.kind == BLANK:
+            return ''
+        value = line.cells[0]
+        if line.align == 'center':
+            return f"{value[:self.width]:^{self.width}}"
+        if line.align == 'right':
+            return f"{value[:self.width]:>{self.width}}"
+        return value
+
+    def to_text(self, lines):
+        return '\n'.join(self.format_line(line) for line in lines)
+
+
+@lru_cache(maxsize=8)
+def _compile(snapshot):
+    return ReceiptLayout(dict(snapshot))
+
+
+def receipt_layout():
+    """The layout for the current settings, compiled the first time they are seen"""
+    return _compile(tuple(sorted(SettingsModel.get_many(LAYOUT_SETTINGS).items())))
+
+
+_rendered = OrderedDict()  # (bill number, layout) -> lines, most recent last
+_rendered_lock = threading.Lock()  # rendered from the UI and the print spooler thread
+
+
+def render_receipt(bill_data, items):
+    """(layout, lines) for a finished bill under the current settings. Bills do
+    not change once numbered, so a bill already rendered with this layout is
+    not rendered again."""
+    layout = receipt_layout()
+    key = (bill_data['bill_number'], layout)
+    with _rendered_lock:
+        lines = _rendered.get(key)
+        if lines is not None:
+            _rendered.move_to_end(key)
+            return layout, lines
+    lines = layout.render(bill_data, items)
+    with _rendered_lock:
+        _rendered[key] = lines
+        while len(_rendered) > RENDER_CACHE_SIZE:
+            _rendered.popitem(last=False)
+    return layout, lines
+
+
+def to_escpos(lines, layout, kick_drawer=False):
+    """The receipt as one ESC/POS byte string, cut at the end"""
+    receipt = EscPosBuffer()
+    for line in lines:
+        if line.bold:
+            receipt.bold()
+            receipt.line(layout.format_line(line))
+            receipt.bold(False)
+        else:
+            receipt.line(layout.format_line(line))
+    receipt.cut()
+    if kick_drawer:
+        receipt.kick_drawer()
+    return receipt.getvalue()
+
+
+def to_pdf(lines, layout, filename):
+    """Writes the receipt as a PDF page the width of the receipt paper"""
+    page_width = next(w for chars, w in PDF_PAGE_WIDTHS if layout.width >= chars)
+    page_height = (len(lines) + 2) * PDF_LINE_HEIGHT + 2 * PDF_MARGIN
+    left, right, center = PDF_MARGIN, page_width - PDF_MARGIN, page_width / 2
+
+    c = canvas.Canvas(filename, pagesize=(page_width, page_height))
+    y = page_height - PDF_MARGIN - PDF_LINE_HEIGHT
+    for line in lines:
+        c.setFont("Helvetica-Bold" if line.bold else "Helvetica", 9 if line.bold else 8)
+        if line.kind == RULE:
+            c.setLineWidth(1 if line.cells[0] == '=' else 0.5)
+            c.line(left, y + PDF_LINE_HEIGHT / 2, right, y + PDF_LINE_HEIGHT / 2)
+        elif line.kind == ITEM:
+            name, quantity, amount = line.cells
+            c.drawString(left, y, name[:layout.item_col])
+            c.drawCentredString(center, y, quantity)
+            c.drawRightString(right, y, amount)
+        elif line.kind == AMOUNT:
+            c.drawString(left, y, line.cells[0])
+            c.drawRightString(right, y, line.cells[1])
+        elif line.kind == TEXT:
+            if line.align == 'center':
+                c.drawCentredString(center, y, line.cells[0])
+            elif line.align == 'right':
+                c.drawRightString(right, y, line.cells[0])
+            else:
+                c.drawString(left, y, line.cells[0])
+        y -= PDF_LINE_HEIGHT
+    c.save()
@@ -0,0 +1,58 @@
+"""Read-only records returned by the DAO read paths.
+
+They are named tuples built straight from result rows, so a listing skips the
+ORM identity map and change tracking and stores no per-row dict. They still
+answer record['name'], record.get('name'), 'name' in record and keys() like the
+dicts the UI was written against. Use to_dict() for a mutable copy. There is no
+items(): BillRecord has a field of that name, the bill's lines.
+"""
+from collections import namedtuple
+
+
+class RecordMixin:
+    __slots__ = ()
+    _index = {}  # field -> position, set per record class
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._index[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else tuple.__getitem__(self, i)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return tuple(self)
+
+    def to_dict(self):
+        return dict(zip(self._fields, self))
+
+
+def record(name, fields, defaults=None):
+    base = namedtuple(name, fields, defaults=defaults)
+    return type(name, (RecordMixin, base), {
+        '__slots__': (),
+        '_index': {field: i for i, field in enumerate(base._fields)},
+    })
+
+
+ProductRecord = record('ProductRecord', ['id', 'name', 'code', 'base_unit', 'price_per_unit', 'category'])
+CustomerRecord = record('CustomerRecord', ['id', 'name', 'phone', 'address'])
+BillRecord = record('BillRecord', [
+    'id', 'bill_number', 'customer_id', 'date_time', 'date_ts', 'subtotal', 'tax_percent',
+    'tax_amount', 'discount_amount', 'grand_total', 'payment_method', 'status',
+    'customer_name', 'customer_phone', 'items',
+], defaults=[None])  # items is only loaded on request
+BillItemRecord = record('BillItemRecord', [
+    'id', 'bill_id', 'product_id', 'product_name', 'quantity', 'unit', 'price', 'total',
+])
+ReportRecord = record('ReportRecord', [
+    'id', 'date_ts', 'date_time', 'bill_number', 'customer_name', 'payment_method', 'grand_total',
+])
@@ -0,0 +1,175 @@
+"""Typo-tolerant product search.
+
+Every distinct word in the product names is split into padded trigrams
+("sugar" -> "$su", "sug", "uga", "gar", "ar$"). For each query word, only the
+vocabulary words sharing enough trigrams with it get an edit-distance check.
+Short words can lose every trigram to a single typo ("rcie" vs "rice"), so
+they are also indexed by their one-character deletions, which catch any single
+edit. A product matches when every query word matches one of its words. Cost
+grows with vocabulary size, not with the number of products.
+"""
+from collections import Counter, defaultdict
+
+from app.catalog import normalize
+
+MAX_CANDIDATES = 200
+SHORT_WORD = 6  # words up to this length are also indexed by their deletions
+
+
+def trigrams(word):
+    padded = f"${word}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))} | {word}
+
+
+def allowed_edits(word):
+    """Typos tolerated for a query word: none for very short words."""
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 5:
+        return 1
+    return 2
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (adjacent swaps count as one edit).
+    Returns limit + 1 as soon as the distance is known to exceed limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2 = None
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if prev2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+            row_min = min(row_min, d)
+        if row_min > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[-1], limit + 1)
+
+
+def word_distance(query_word, word, limit):
+    """Distance to a product word, also accepting it as a (typo'd) prefix,
+    so a half-typed 'suagr' still finds 'sugarcane'."""
+    best = edit_distance(query_word, word, limit)
+    if best and len(word) > len(query_word):
+        best = min(best, edit_distance(query_word, word[:len(query_word)], limit))
+    return best
+
+
+class FuzzyIndex:
+    """Trigram index over product name words, updated in place as products change.
+
+    Pass catalog (a ColumnStore or any id -> product mapping) to have search
+    results looked up there instead of the index keeping every product.
+    """
+
+    def __init__(self, products=(), catalog=None):
+        self._postings = defaultdict(set)       # trigram -> vocabulary words
+        self._deletes = defaultdict(set)        # short word minus one char -> words
+        self._word_products = defaultdict(set)  # word -> product ids
+        self._words = {}                        # product id -> normalized name words
+        self._owns_products = catalog is None
+        self._products = {} if catalog is None else catalog
+        for p in products:
+            self.add(p)
+
+    def __len__(self):
+        return len(self._words)
+
+    def add(self, product):
+        if product['id'] in self._words:
+            self.remove(product['id'])
+        words = normalize(product['name']).split()
+        if self._owns_products:
+            self._products[product['id']] = product
+        self._words[product['id']] = words
+        for word in words:
+            if word not in self._word_products:
+                for gram in trigrams(word):
+                    self._postings[gram].add(word)
+                if len(word) <= SHORT_WORD:
+                    for variant in deletions(word):
+                        self._deletes[variant].add(word)
+            self._word_products[word].add(product['id'])
+
+    def remove(self, product_id):
+        if self._owns_products:
+            self._products.pop(product_id, None)
+        for word in self._words.pop(product_id, ()):
+            ids = self._word_products.get(word)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if ids:
+                continue
+            del self._word_products[word]
+            for gram in trigrams(word):
+                words = self._postings.get(gram)
+                if words is not None:
+                    words.discard(word)
+                    if not words:
+                        del self._postings[gram]
+            if len(word) <= SHORT_WORD:
+                for variant in deletions(word):
+                    words = self._deletes.get(variant)
+                    if words is not None:
+                        words.discard(word)
+                        if not words:
+                            del self._deletes[variant]
+
+    update = add
+
+    def _match_word(self, query_word):
+        """product id -> smallest distance from query_word to one of its words"""
+        limit_edits = allowed_edits(query_word)
+        grams = trigrams(query_word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        # An edit destroys at most 3 trigrams (4 for an adjacent swap); one more is
+        # lost when the query is only a prefix of the word (no closing "x$" trigram)
+        needed = max(1, len(grams) - 1 - 4 * limit_edits)
+        candidates = {w for w, n in shared.most_common(MAX_CANDIDATES) if n >= needed}
+        if limit_edits == 1:
+            for variant in deletions(query_word):
+                candidates.update(self._deletes.get(variant, ()))
+
+        best = {}
+        for word in candidates:
+            distance = word_distance(query_word, word, limit_edits)
+            if distance > limit_edits:
+                continue
+            for product_id in self._word_products[word]:
+                if distance < best.get(product_id, limit_edits + 1):
+                    best[product_id] = distance
+        return best
+
+    def search(self, query, limit=10):
+        """Products whose name matches every query word within its allowed
+        typos, best first."""
+        query_words = normalize(query).split()
+        if not query_words:
+            return []
+
+        totals = None
+        for query_word in query_words:
+            matches = self._match_word(query_word)
+            if totals is None:
+                totals = matches
+            else:
+                totals = {pid: totals[pid] + d for pid, d in matches.items() if pid in totals}
+            if not totals:
+                return []
+
+        ranked = sorted(totals, key=lambda pid: (totals[pid], len(self._words[pid]), pid))
+        return [self._products[pid] for pid in ranked[:limit]]
@@ -0,0 +1,141 @@
+"""Cart of the bill being rung up.
+
+Lines are the dicts BillModel.create_bill saves. Their totals and the bill
+totals come from a PricingEngine, and an edit only repaints the row it touched.
+"""
+from decimal import Decimal
+import math
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+
+from app.pricing import PricingEngine
+from app.utils.helpers import to_paise, format_amount, format_currency
+
+
+def add_quantities(a, b):
+    # Through Decimal so repeated 0.1 kg scans add up to 0.3, not 0.30000000000000004
+    return float(Decimal(str(a)) + Decimal(str(b)))
+
+
+class CartModel(QAbstractTableModel):
+    """
+    With merge_lines, scanning a product already in the cart adds to that line's
+    quantity instead of adding a line, as long as its price and unit were not
+    edited since.
+    """
+    HEADERS = ["Product", "Qty", "Unit", "Price", "Total"]
+    FIELDS = ['product_name', 'quantity', 'unit', 'price', 'total']
+    EDITABLE = {'quantity', 'unit', 'price'}
+
+    totalsChanged = pyqtSignal()
+
+    def __init__(self, parent=None, merge_lines=True, pricing=None):
+        super().__init__(parent)
+        self.merge_lines = merge_lines
+        self.pricing = pricing or PricingEngine()
+        self._lines = []
+        self._merge_rows = {}  # product id -> row its next scan merges into
+
+    def lines(self):
+        """The cart lines in order, as passed to create_bill and the receipt"""
+        return self._lines
+
+    def add_product(self, product, quantity):
+        """Adds quantity of product, returns the row it went to. Raises
+        ValueError, with the cart unchanged, unless quantity is finite and
+        above zero."""
+        if not math.isfinite(quantity) or quantity <= 0:
+            raise ValueError(f"Invalid quantity: {quantity!r}")
+        row = self._merge_rows.get(product['id']) if self.merge_lines else None
+        if row is not None:
+            line = self._lines[row]
+            if line['price'] == product['price_per_unit'] and line['unit'] == product['base_unit']:
+                line['quantity'] = add_quantities(line['quantity'], quantity)
+                self._update_total(row)
+                return row
+
+        row = len(self._lines)
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._lines.append({
+            'product_id': product['id'],
+            'product_name': product['name'],
+            'quantity': quantity,
+            'unit': product['base_unit'],
+            'price': product['price_per_unit'],
+            'total': self.pricing.add_line(quantity, product['price_per_unit']),
+        })
+        self._merge_rows[product['id']] = row
+        self.endInsertRows()
+        self.totalsChanged.emit()
+        return row
+
+    def clear(self):
+        self.beginResetModel()
+        self._lines = []
+        self._merge_rows = {}
+        self.pricing.clear()
+        self.endResetModel()
+        self.totalsChanged.emit()
+
+    def totals(self):
+        return self.pricing.totals()
+
+    def _update_total(self, row):
+        line = self._lines[row]
+        line['total'] = self.pricing.set_line(row, line['quantity'], line['price'])
+        self.dataChanged.emit(self.index(row, 1), self.index(row, len(self.FIELDS) - 1))
+        self.totalsChanged.emit()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._lines)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.FIELDS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole) or not index.isValid():
+            return None
+        field = self.FIELDS[index.column()]
+        value = self._lines[index.row()][field]
+        if field == 'price':
+            return format_amount(value)
+        if field == 'total':
+            return format_currency(value)
+        return str(value) if field == 'quantity' else value
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and self.FIELDS[index.column()] in self.EDITABLE:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole):
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        field = self.FIELDS[index.column()]
+        if field not in self.EDITABLE:
+            return False
+        line = self._lines[index.row()]
+        # Parse and check before touching the line, so invalid input leaves it as it was
+        try:
+            if field == 'quantity':
+                new_value = float(value)
+                if not math.isfinite(new_value) or new_value <= 0:
+                    return False
+            elif field == 'price':
+                # to_paise strips the currency symbol if present
+                new_value = to_paise(value)
+                if new_value < 0:
+                    return False
+            else:
+                new_value = value
+            line[field] = new_value
+            self._update_total(index.row())
+        except ValueError:
+            return False # Ignore invalid input
+        return True
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
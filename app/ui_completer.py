@@ -0,0 +1,147 @@
+"""Completion model for the product and customer search boxes.
+
+Entries are kept in a sorted list of (search key, entry) pairs, where the keys are
+every word of the name plus the code/phone. A keystroke bisects to the keys
+starting with the typed text and keeps only the best `max_results` entries by
+popularity, so the popup never holds more than that many rows.
+"""
+from bisect import bisect_left, insort
+import heapq
+
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex
+from PyQt6.QtWidgets import QCompleter
+
+from app.catalog import normalize
+
+MAX_RESULTS = 20
+# Results for one- and two-letter prefixes span most of the catalog, so they are cached
+CACHED_PREFIX_LENGTH = 2
+
+
+def search_keys(*fields):
+    """Every word suffix of the fields, so 'Basmati Rice' is found by 'bas' and 'rice'"""
+    keys = set()
+    for field in fields:
+        words = normalize(field).split()
+        for i in range(len(words)):
+            keys.add(' '.join(words[i:]))
+    return keys
+
+
+class RankedCompletionModel(QAbstractListModel):
+    def __init__(self, parent=None, max_results=MAX_RESULTS):
+        super().__init__(parent)
+        self.max_results = max_results
+        self._texts = {}    # entry id -> display text
+        self._scores = {}   # entry id -> popularity
+        self._entry_keys = {}  # entry id -> search keys
+        self._keys = []     # sorted (search key, entry id)
+        self._cache = {}
+        self._query = None
+        self._rows = []
+
+    def set_items(self, items):
+        """items: iterable of (entry id, display text, search keys, score)"""
+        self._texts = {}
+        self._scores = {}
+        self._entry_keys = {}
+        keys = []
+        for entry_id, text, entry_keys, score in items:
+            self._store(entry_id, text, entry_keys, score)
+            keys.extend((key, entry_id) for key in entry_keys)
+        keys.sort()
+        self._keys = keys
+        self._cache = {}
+        self._refresh()
+
+    def update_items(self, items):
+        """Adds or replaces entries, same tuples as set_items"""
+        for entry_id, text, entry_keys, score in items:
+            self._drop(entry_id)
+            self._store(entry_id, text, entry_keys, score)
+            for key in entry_keys:
+                insort(self._keys, (key, entry_id))
+        self._cache = {}
+        self._refresh()
+
+    def remove_items(self, entry_ids):
+        for entry_id in entry_ids:
+            self._drop(entry_id)
+        self._cache = {}
+        self._refresh()
+
+    def _store(self, entry_id, text, entry_keys, score):
+        self._texts[entry_id] = text
+        self._scores[entry_id] = score or 0
+        self._entry_keys[entry_id] = entry_keys
+
+    def _drop(self, entry_id):
+        if entry_id not in self._texts:
+            return
+        del self._texts[entry_id]
+        del self._scores[entry_id]
+        for key in self._entry_keys.pop(entry_id):
+            i = bisect_left(self._keys, (key, entry_id))
+            if i < len(self._keys) and self._keys[i] == (key, entry_id):
+                del self._keys[i]
+
+    def _rank_key(self, entry_id):
+        return (-self._scores[entry_id], self._texts[entry_id])
+
+    def matches(self, query):
+        """Top entry ids whose name words or code start with query, most popular first"""
+        key = normalize(query)
+        if key in self._cache:
+            return self._cache[key]
+        if key:
+            i = bisect_left(self._keys, (key,))
+            found = set()
+            while i < len(self._keys) and self._keys[i][0].startswith(key):
+                found.add(self._keys[i][1])
+                i += 1
+        else:
+            found = self._texts
+        rows = heapq.nsmallest(self.max_results, found, key=self._rank_key)
+        if len(key) <= CACHED_PREFIX_LENGTH:
+            self._cache[key] = rows
+        return rows
+
+    def set_query(self, query):
+        if query != self._query:
+            self._query = query
+            self._refresh()
+
+    def _refresh(self):
+        self.beginResetModel()
+        self._rows = self.matches(self._query) if self._query is not None else []
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return self._texts[self._rows[index.row()]]
+        if role == Qt.ItemDataRole.UserRole:
+            return self._rows[index.row()]
+        return None
+
+
+class RankedCompleter(QCompleter):
+    """QCompleter that leaves filtering and ordering to a RankedCompletionModel.
+
+    The completer passes every typed prefix through splitPath, which is where the
+    model is narrowed; the popup then shows the model's rows as they are.
+    """
+
+    def __init__(self, parent=None, max_results=MAX_RESULTS):
+        super().__init__(parent)
+        self.setModel(RankedCompletionModel(self, max_results))
+        self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.setMaxVisibleItems(max_results)
+
+    def splitPath(self, path):
+        self.model().set_query(path)
+        return [path]
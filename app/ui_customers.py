@@ -4,6 +4,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from app.models import CustomerModel
+from app.catalog import shared_customers
 from app.ui_error_handler import show_error, show_info
 
 class CustomerDialog(QDialog):
@@ -110,12 +111,25 @@ class ManageCustomersDialog(QDialog):
         self.setLayout(layout)
 
     def load_customers(self):
-        self.customers = CustomerModel.get_all_customers()
-        self.update_table(self.customers)
+        # Shared with the main window; catch up on changes made elsewhere first
+        self.customers = shared_customers()
+        self.customers.refresh()
+        self.customers.subscribe(None, self.on_customers_changed)
+        self.finished.connect(lambda: self.customers.unsubscribe(None, self.on_customers_changed))
+        self.search_customers()
+
+    def on_customers_changed(self, customer_ids):
+        self.search_customers()
+
+    def refresh_customers(self):
+        """Apply only the customers changed since the last load, keeping the search text"""
+        self.customers.refresh()
 
     def search_customers(self):
         query = self.search_bar.text().lower()
-        filtered = [c for c in self.customers if query in c['name'].lower() or query in c['phone']]
+        filtered = [self.customers[customer_id]
+                    for customer_id, name, phone in self.customers.rows('id', 'name', 'phone')
+                    if query in name.lower() or query in phone]
         self.update_table(filtered)
 
     def update_table(self, customers):
@@ -129,7 +143,7 @@ class ManageCustomersDialog(QDialog):
     def add_customer(self):
         dlg = CustomerDialog(self)
         if dlg.exec():
-            self.load_customers()
+            self.refresh_customers()
             # If added, maybe select it automatically?
             # For now just reload
 
@@ -140,12 +154,12 @@ class ManageCustomersDialog(QDialog):
             return
         
         customer_id = int(self.table.item(row, 0).text())
-        customer = next((c for c in self.customers if c['id'] == customer_id), None)
+        customer = self.customers.get(customer_id)
         
         if customer:
             dlg = CustomerDialog(self, customer)
             if dlg.exec():
-                self.load_customers()
+                self.refresh_customers()
 
     def delete_customer(self):
         row = self.table.currentRow()
@@ -160,12 +174,16 @@ class ManageCustomersDialog(QDialog):
         
         if confirm == QMessageBox.StandardButton.Yes:
             customer_id = int(self.table.item(row, 0).text())
-            CustomerModel.delete_customer(customer_id)
-            self.load_customers()
+            if CustomerModel.delete_customer(customer_id):
+                self.refresh_customers()
+            else:
+                show_error(self, "Error", "Could not delete customer. They may have existing bills.")
 
     def select_and_close(self):
         row = self.table.currentRow()
         if row >= 0:
             customer_id = int(self.table.item(row, 0).text())
-            self.selected_customer = next((c for c in self.customers if c['id'] == customer_id), None)
+            customer = self.customers.get(customer_id)
+            # A copy, the store row may change or go while the bill is open
+            self.selected_customer = customer.to_dict() if customer else None
             self.accept()
@@ -1,20 +1,31 @@
+import math
 import sys
 from datetime import datetime
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, 
-    QTableWidgetItem, QLineEdit, QLabel, QPushButton, QComboBox, 
-    QDialog, QFormLayout, QCompleter, QHeaderView, QSplitter, 
+    QTableWidgetItem, QTableView, QLineEdit, QLabel, QPushButton, QComboBox, 
+    QDialog, QFormLayout, QHeaderView, QSplitter, 
     QListWidget, QGridLayout, QFrame, QMessageBox, QApplication
 )
-from PyQt6.QtCore import Qt, QStringListModel, QTimer
+from PyQt6.QtCore import Qt, QTimer
 from PyQt6.QtGui import QAction, QKeySequence, QFont
 
+from app.db import unit_of_work
 from app.models import ProductModel, CustomerModel, BillModel, SettingsModel
-from app.utils.helpers import generate_bill_number, convert_unit
+from app.catalog import ProductIndex, shared_products, shared_customers
+from app.search import FuzzyIndex
+from app.ui_completer import RankedCompleter, search_keys
+from app.ui_cart import CartModel
+from app.bill_writer import BillWriter
+from app.pricing import ROUNDING_STEPS
+from app.utils.helpers import (
+    generate_bill_number, convert_unit, to_paise, format_currency
+)
 from app.printer import PrinterManager
+from app.print_spooler import PrintSpooler
 from app.ui_settings import SettingsDialog
 from app.ui_reports import ReportsDialog
-from app.ui_error_handler import show_error, show_info
+from app.ui_error_handler import show_error, show_info, show_warning
 from app.ui_products import ManageProductsDialog
 from app.ui_preview import BillPreviewDialog
 
@@ -79,7 +90,7 @@ class DebtCustomersDialog(QDialog):
         debt_data = BillModel.get_debt_by_customer()
         
         total_debt = sum(d['total_debt'] for d in debt_data)
-        self.summary_label.setText(f"Total Outstanding: ₹{total_debt:.2f} from {len(debt_data)} customer(s)")
+        self.summary_label.setText(f"Total Outstanding: {format_currency(total_debt)} from {len(debt_data)} customer(s)")
         
         for row, data in enumerate(debt_data):
             self.table.insertRow(row)
@@ -87,7 +98,7 @@ class DebtCustomersDialog(QDialog):
             self.table.setItem(row, 1, QTableWidgetItem(data['customer_phone'] or '-'))
             self.table.setItem(row, 2, QTableWidgetItem(str(data['bill_count'])))
             
-            debt_item = QTableWidgetItem(f"₹{data['total_debt']:.2f}")
+            debt_item = QTableWidgetItem(format_currency(data['total_debt']))
             debt_item.setForeground(Qt.GlobalColor.red)
             self.table.setItem(row, 3, debt_item)
             
@@ -158,7 +169,7 @@ class CustomerDebtBillsDialog(QDialog):
         bills = BillModel.get_customer_debt_bills(self.customer_id)
         
         total = sum(b['grand_total'] for b in bills)
-        self.total_label.setText(f"Total Pending: ₹{total:.2f}")
+        self.total_label.setText(f"Total Pending: {format_currency(total)}")
         
         for row, bill in enumerate(bills):
             self.table.insertRow(row)
@@ -168,7 +179,7 @@ class CustomerDebtBillsDialog(QDialog):
             self.table.setItem(row, 0, bill_item)
             
             self.table.setItem(row, 1, QTableWidgetItem(bill['date_time']))
-            self.table.setItem(row, 2, QTableWidgetItem(f"₹{bill['grand_total']:.2f}"))
+            self.table.setItem(row, 2, QTableWidgetItem(format_currency(bill['grand_total'])))
             
             status_item = QTableWidgetItem("UNPAID")
             status_item.setForeground(Qt.GlobalColor.red)
@@ -195,14 +206,15 @@ class CustomerDebtBillsDialog(QDialog):
                                     "Mark ALL bills as paid for this customer?",
                                     QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         if reply == QMessageBox.StandardButton.Yes:
-            bills = BillModel.get_customer_debt_bills(self.customer_id)
-            for bill in bills:
-                BillModel.mark_bill_as_paid(bill['id'])
+            with unit_of_work():
+                bills = BillModel.get_customer_debt_bills(self.customer_id)
+                for bill in bills:
+                    BillModel.mark_bill_as_paid(bill['id'])
             self.load_bills()
 
 
 class PaymentDialog(QDialog):
-    def __init__(self, parent=None, total=0.0):
+    def __init__(self, parent=None, total=0):
         super().__init__(parent)
         self.main_window = parent
         self.setWindowTitle("Payment")
@@ -213,7 +225,7 @@ class PaymentDialog(QDialog):
     def init_ui(self):
         layout = QVBoxLayout()
         
-        lbl_total = QLabel(f"Total to Pay: ₹{self.total:.2f}")
+        lbl_total = QLabel(f"Total to Pay: {format_currency(self.total)}")
         lbl_total.setStyleSheet("font-size: 18px; font-weight: bold;")
         layout.addWidget(lbl_total)
 
@@ -242,7 +254,7 @@ class PaymentDialog(QDialog):
                         # Update MainWindow with new customer
                         self.main_window.current_customer = {'id': dlg.customer_id, 'name': dlg.customer_name, 'phone': dlg.customer_phone}
                         self.main_window.lbl_cust.setText(f"{dlg.customer_name}")
-                        self.main_window.load_customers()
+                        self.main_window.refresh_customers()
                         self.accept()
                     else:
                         return # User cancelled customer creation
@@ -259,12 +271,70 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Thangam Stores Billing")
         self.resize(1200, 800)
         self.printer_manager = PrinterManager()
-        self.cart = []
+        self.print_spooler = PrintSpooler(self.printer_manager, self)
+        self.print_spooler.jobChanged.connect(self.on_print_job_changed)
+        self.cart = CartModel(self, merge_lines=SettingsModel.get_setting('cart_merge_lines', 'true').lower() == 'true')
+        self.cart.totalsChanged.connect(self.update_totals)
+        self.totals = self.cart.totals()
         self.current_customer = None
+        self.bill_writer = BillWriter(self)
+        self.bill_writer.billSaved.connect(self.on_bill_saved)
+        self.bill_writer.billFailed.connect(self.on_bill_failed)
         self.init_ui()
+        self.apply_pricing_settings()
         self.load_products()
         self.load_customers()
         self.load_recent_bills()
+        self.bill_writer.start()
+        self.print_spooler.start()
+
+    def closeEvent(self, event):
+        # Bills and receipts still queued stay stored and are handled on the next start
+        self.bill_writer.stop(timeout=5)
+        self.print_spooler.stop(timeout=5)
+        self.printer_manager.disconnect()
+        super().closeEvent(event)
+
+    def on_print_job_changed(self, job_id, state):
+        waiting, failed, retry_in = self.print_spooler.status()
+        if failed:
+            self.statusBar().showMessage(f"🖨 {failed} receipt(s) could not be printed, {waiting} waiting")
+        elif waiting and retry_in:
+            self.statusBar().showMessage(f"🖨 Printer not responding, {waiting} receipt(s) waiting. "
+                                         f"Retrying in {retry_in:.0f}s")
+        elif waiting:
+            self.statusBar().showMessage(f"🖨 Printing, {waiting} receipt(s) in queue")
+        else:
+            self.statusBar().clearMessage()
+
+    def on_bill_saved(self, bill_number):
+        self.load_recent_bills()
+        self.count_sale(bill_number)
+
+    def count_sale(self, bill_number):
+        """Ranks what was just sold higher in the completers. A bill made now weighs 1
+        in get_popularity, so adding 1 per line keeps the scores in step without
+        recomputing them."""
+        bill = BillModel.get_bill_by_number(bill_number, with_items=True)
+        if bill is None:
+            return
+        sold = set()
+        for item in bill['items']:
+            product_id = item['product_id']
+            self.product_popularity[product_id] = self.product_popularity.get(product_id, 0) + 1
+            sold.add(product_id)
+        self.prod_completer.model().update_items(
+            self.product_completion(self.catalog[product_id]) for product_id in sold if product_id in self.catalog
+        )
+        customer_id = bill['customer_id']
+        if customer_id is not None:
+            self.customer_popularity[customer_id] = self.customer_popularity.get(customer_id, 0) + 1
+            if customer_id in self.customers:
+                self.index_customers([customer_id])
+
+    def on_bill_failed(self, bill_number, error):
+        show_error(self, "Bill Not Saved",
+                   f"Bill {bill_number} could not be saved and was set aside for review: {error}")
 
     def init_ui(self):
         # ... (menu code)
@@ -278,6 +348,10 @@ class MainWindow(QMainWindow):
         reports_action = QAction("Reports", self)
         reports_action.triggered.connect(self.open_reports)
         file_menu.addAction(reports_action)
+
+        retry_print_action = QAction("Retry Waiting Prints", self)
+        retry_print_action.triggered.connect(self.print_spooler.retry_failed)
+        file_menu.addAction(retry_print_action)
         
         exit_action = QAction("Exit", self)
         exit_action.triggered.connect(self.close)
@@ -301,9 +375,7 @@ class MainWindow(QMainWindow):
         
         self.cust_search = QLineEdit()
         self.cust_search.setPlaceholderText("🔍 Search Customer (Name/Phone)...")
-        self.cust_completer = QCompleter()
-        self.cust_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.cust_completer.setFilterMode(Qt.MatchFlag.MatchContains)
+        self.cust_completer = RankedCompleter(self)
         self.cust_completer.activated.connect(self.on_customer_select)
         self.cust_search.setCompleter(self.cust_completer)
         self.cust_search.returnPressed.connect(self.search_customer)
@@ -326,8 +398,7 @@ class MainWindow(QMainWindow):
         self.prod_search = QLineEdit()
         self.prod_search.setPlaceholderText("📦 Scan Barcode or Search Product...")
         self.prod_search.setMinimumHeight(40)
-        self.prod_completer = QCompleter()
-        self.prod_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.prod_completer = RankedCompleter(self)
         self.prod_completer.activated.connect(self.on_product_select)
         self.prod_search.setCompleter(self.prod_completer)
         self.prod_search.returnPressed.connect(self.add_product_to_cart_manual)
@@ -347,13 +418,11 @@ class MainWindow(QMainWindow):
         billing_layout.addWidget(prod_group)
 
         # Cart Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Product", "Qty", "Unit", "Price", "Total"])
+        self.table = QTableView()
+        self.table.setModel(self.cart)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.verticalHeader().setVisible(False)
         self.table.setAlternatingRowColors(True)
-        self.table.cellChanged.connect(self.on_cart_item_changed)
         billing_layout.addWidget(self.table)
 
         # Totals
@@ -368,22 +437,33 @@ class MainWindow(QMainWindow):
         self.lbl_tax.setAlignment(Qt.AlignmentFlag.AlignRight)
         
         self.discount_input = QLineEdit("0")
-        self.discount_input.setPlaceholderText("%")
-        self.discount_input.setFixedWidth(50)
+        self.discount_input.setFixedWidth(70)
         self.discount_input.setAlignment(Qt.AlignmentFlag.AlignRight)
-        self.discount_input.textChanged.connect(self.update_cart_table)
+        self.discount_input.textChanged.connect(self.update_totals)
+        # Percent of the subtotal or a flat amount in rupees
+        self.discount_type = QComboBox()
+        self.discount_type.addItems(["%", "₹"])
+        self.discount_type.currentTextChanged.connect(self.update_totals)
+        discount_layout = QHBoxLayout()
+        discount_layout.addWidget(self.discount_input)
+        discount_layout.addWidget(self.discount_type)
+        discount_layout.addStretch()
         
         self.lbl_discount_amt = QLabel("0.00")
         self.lbl_discount_amt.setAlignment(Qt.AlignmentFlag.AlignRight)
         
+        self.lbl_round_off = QLabel("0.00")
+        self.lbl_round_off.setAlignment(Qt.AlignmentFlag.AlignRight)
+        
         self.lbl_grand_total = QLabel("₹0.00")
         self.lbl_grand_total.setAlignment(Qt.AlignmentFlag.AlignRight)
         self.lbl_grand_total.setObjectName("lblGrandTotal")
         
         totals_layout.addRow("Subtotal:", self.lbl_subtotal)
-        totals_layout.addRow("Tax:", self.lbl_tax)
-        totals_layout.addRow("Discount (%):", self.discount_input)
+        totals_layout.addRow("Discount:", discount_layout)
         totals_layout.addRow("Discount Amt:", self.lbl_discount_amt)
+        totals_layout.addRow("Tax:", self.lbl_tax)
+        totals_layout.addRow("Round Off:", self.lbl_round_off)
         totals_layout.addRow("Grand Total:", self.lbl_grand_total)
         billing_layout.addWidget(totals_frame)
 
@@ -469,34 +549,74 @@ class MainWindow(QMainWindow):
         QAction("Print", self, shortcut=QKeySequence("F12"), triggered=self.process_bill)
 
     def load_products(self):
-        self.products = ProductModel.get_all_products()
-        names = [f"{p['name']} ({p['code']})" for p in self.products]
-        model = QStringListModel(names)
-        self.prod_completer.setModel(model)
+        # Shared with the product dialog; its edits reach this window through the listeners
+        self.catalog = shared_products()
+        self.product_index = ProductIndex(self.catalog)
+        self.fuzzy_index = FuzzyIndex(self.catalog.values(), catalog=self.catalog)
+        # Best sellers first, recent sales count more than old ones
+        self.product_popularity = ProductModel.get_popularity()
+        self.prod_completer.model().set_items(self.product_completion(p) for p in self.catalog.values())
+        self.catalog.subscribe(self.unindex_products, self.index_products)
+
+    def product_completion(self, p):
+        return (p['id'], f"{p['name']} ({p['code']})", search_keys(p['name'], p['code']),
+                self.product_popularity.get(p['id']))
+
+    def unindex_products(self, product_ids):
+        for product_id in product_ids:
+            self.product_index.remove(product_id)
+            self.fuzzy_index.remove(product_id)
+        self.prod_completer.model().remove_items(product_ids)
+
+    def index_products(self, product_ids):
+        products = [self.catalog[product_id] for product_id in product_ids]
+        for p in products:
+            self.product_index.update(p)
+            self.fuzzy_index.update(p)
+        self.prod_completer.model().update_items(self.product_completion(p) for p in products)
+
+    def refresh_products(self):
+        """Pick up the products changed since the last load or refresh"""
+        self.catalog.refresh()
 
     def load_customers(self):
-        self.customers = CustomerModel.get_all_customers()
-        names = [f"{c['name']} ({c['phone']})" for c in self.customers]
-        model = QStringListModel(names)
-        self.cust_completer.setModel(model)
+        self.customers = shared_customers()
+        self.customer_popularity = CustomerModel.get_popularity()
+        self.cust_completer.model().set_items(self.customer_completion(c) for c in self.customers.values())
+        self.customers.subscribe(self.cust_completer.model().remove_items, self.index_customers)
+
+    def customer_completion(self, c):
+        return (c['id'], f"{c['name']} ({c['phone']})", search_keys(c['name'], c['phone']),
+                self.customer_popularity.get(c['id']))
+
+    def index_customers(self, customer_ids):
+        self.cust_completer.model().update_items(
+            self.customer_completion(self.customers[customer_id]) for customer_id in customer_ids
+        )
+
+    def refresh_customers(self):
+        """Pick up the customers changed since the last load or refresh"""
+        self.customers.refresh()
 
     def load_recent_bills(self):
         self.recent_list.clear()
         bills = BillModel.get_recent_bills()
         for b in bills:
-            self.recent_list.addItem(f"{b['bill_number']} - ₹{b['grand_total']:.2f}")
+            self.recent_list.addItem(f"{b['bill_number']} - {format_currency(b['grand_total'])}")
 
     def search_customer(self):
         query = self.cust_search.text()
         # Try to find in loaded customers first
-        for c in self.customers:
-            if query.lower() in c['name'].lower() or query in c['phone']:
+        for customer_id, name, phone in self.customers.rows('id', 'name', 'phone'):
+            if query.lower() in name.lower() or query in phone:
+                # A copy, the store row may change or go while the bill is open
+                c = self.customers[customer_id].to_dict()
                 self.current_customer = c
                 self.lbl_cust.setText(f"{c['name']} ({c['phone']})")
                 self.cust_search.clear()
                 return
 
-        customers = CustomerModel.search_customer(query)
+        customers = CustomerModel.search_customer(query, limit=1)
         if customers:
             # Simple selection: take first
             c = customers[0]
@@ -510,8 +630,9 @@ class MainWindow(QMainWindow):
         # Extract phone from "Name (Phone)"
         if '(' in text and text.endswith(')'):
             phone = text.split('(')[-1][:-1]
-            for c in self.customers:
-                if c['phone'] == phone:
+            for customer_id, customer_phone in self.customers.rows('id', 'phone'):
+                if customer_phone == phone:
+                    c = self.customers[customer_id].to_dict()
                     self.current_customer = c
                     self.lbl_cust.setText(f"{c['name']} ({c['phone']})")
                     self.cust_search.clear()
@@ -523,146 +644,103 @@ class MainWindow(QMainWindow):
             if dlg.selected_customer:
                 self.current_customer = dlg.selected_customer
                 self.lbl_cust.setText(f"{self.current_customer['name']} ({self.current_customer['phone']})")
-            self.load_customers()
+            self.refresh_customers()
 
     def on_product_select(self, text):
         # Extract name from "Name (Code)"
         name = text.rsplit(' (', 1)[0]
-        for p in self.products:
-            if p['name'] == name:
-                self.add_to_cart(p)
-                self.prod_search.clear()
-                self.prod_search.setFocus()
-                break
+        p = self.product_index.by_name(name)
+        if p and self.add_to_cart(p):
+            self.prod_search.clear()
+            self.prod_search.setFocus()
 
     def add_product_to_cart_manual(self):
         text = self.prod_search.text().strip()
         if not text:
             return
             
-        # Try to find by code/barcode first (exact match)
-        found = False
-        for p in self.products:
-            if p['code'] == text or p['name'].lower() == text.lower():
-                self.add_to_cart(p)
+        # Exact code/barcode or name first, then partial match in name or code,
+        # then the closest name allowing for typos
+        p = self.product_index.find(text)
+        if not p:
+            matches = self.fuzzy_index.search(text, limit=1)
+            p = matches[0] if matches else None
+        if p:
+            if self.add_to_cart(p):
                 self.prod_search.clear()
                 self.qty_input.setText("1")
                 self.prod_search.setFocus()
-                found = True
-                break
-        
-        if not found:
-            # Try partial match in name or code
-            for p in self.products:
-                if text.lower() in p['name'].lower() or text.lower() in p['code'].lower():
-                    self.add_to_cart(p)
-                    self.prod_search.clear()
-                    self.qty_input.setText("1")
-                    self.prod_search.setFocus()
-                    found = True
-                    break
-        
-        if not found:
+        else:
             # Try completer logic if text matches format "Name (Code)"
             self.on_product_select(text)
 
     def add_to_cart(self, product):
+        """Adds the product with the quantity typed in the Qty box, 1 if it is
+        empty. Returns False, after a warning, if the quantity is not a
+        positive number."""
+        text = self.qty_input.text().strip()
         try:
-            qty = float(self.qty_input.text())
+            qty = float(text) if text else 1.0
         except ValueError:
-            qty = 1.0
-        
-        total = qty * product['price_per_unit']
-        
-        self.cart.append({
-            'product_id': product['id'],
-            'product_name': product['name'],
-            'quantity': qty,
-            'unit': product['base_unit'],
-            'price': product['price_per_unit'],
-            'total': total
-        })
-        self.update_cart_table()
-
-    def update_cart_table(self):
-        self.table.blockSignals(True)
-        self.table.setRowCount(len(self.cart))
-        subtotal = 0
-        for row, item in enumerate(self.cart):
-            # Product Name (Read-only)
-            name_item = QTableWidgetItem(item['product_name'])
-            name_item.setFlags(name_item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 0, name_item)
-            
-            # Qty (Editable)
-            self.table.setItem(row, 1, QTableWidgetItem(str(item['quantity'])))
-            
-            # Unit (Editable - ideally ComboBox but text for now)
-            self.table.setItem(row, 2, QTableWidgetItem(item['unit']))
-            
-            # Price (Editable)
-            self.table.setItem(row, 3, QTableWidgetItem(f"{item['price']:.2f}"))
-            
-            # Total (Read-only)
-            total_item = QTableWidgetItem(f"₹{item['total']:.2f}")
-            total_item.setFlags(total_item.flags() ^ Qt.ItemFlag.ItemIsEditable)
-            self.table.setItem(row, 4, total_item)
-            
-            subtotal += item['total']
-        
-        self.lbl_subtotal.setText(f"₹{subtotal:.2f}")
-        
-        # Calculate Discount
+            qty = None
+        if qty is None or not math.isfinite(qty) or qty <= 0:
+            show_warning(self, "Invalid Quantity", "Enter a quantity greater than zero.")
+            self.qty_input.selectAll()
+            self.qty_input.setFocus()
+            return False
+
+        row = self.cart.add_product(product, qty)
+        self.table.scrollTo(self.cart.index(row, 0))
+        return True
+
+    def apply_pricing_settings(self):
+        pricing = self.cart.pricing
         try:
-            disc_percent = float(self.discount_input.text())
+            pricing.tax_percent = float(SettingsModel.get_setting('tax_percent', '0'))
         except ValueError:
-            disc_percent = 0.0
-            
-        discount_amount = (subtotal * disc_percent) / 100
-        self.lbl_discount_amt.setText(f"₹{discount_amount:.2f}")
-        
-        grand_total = subtotal - discount_amount
-        self.lbl_grand_total.setText(f"₹{grand_total:.2f}")
-        self.table.blockSignals(False)
+            pricing.tax_percent = 0.0
+        pricing.round_to = ROUNDING_STEPS.get(SettingsModel.get_setting('grand_total_rounding', 'None'), 1)
+        self.update_totals()
 
-    def on_cart_item_changed(self, row, column):
+    def update_totals(self):
+        # Calculate Discount
         try:
-            item = self.cart[row]
-            if column == 1: # Qty
-                item['quantity'] = float(self.table.item(row, column).text())
-            elif column == 2: # Unit
-                item['unit'] = self.table.item(row, column).text()
-            elif column == 3: # Price
-                # Remove currency symbol if present
-                text = self.table.item(row, column).text().replace('₹', '')
-                item['price'] = float(text)
-            
-            # Recalculate total
-            item['total'] = item['quantity'] * item['price']
-            self.update_cart_table()
+            if self.discount_type.currentText() == '%':
+                self.cart.pricing.set_discount(percent=float(self.discount_input.text() or 0))
+            else:
+                self.cart.pricing.set_discount(flat=to_paise(self.discount_input.text() or 0))
         except ValueError:
-            pass # Ignore invalid input
+            self.cart.pricing.set_discount()
+
+        totals = self.cart.totals()
+        self.lbl_subtotal.setText(format_currency(totals['subtotal']))
+        self.lbl_discount_amt.setText(format_currency(totals['discount_amount']))
+        self.lbl_tax.setText(format_currency(totals['tax_amount']))
+        self.lbl_round_off.setText(format_currency(totals['round_off']))
+        self.lbl_grand_total.setText(format_currency(totals['grand_total']))
+        self.totals = totals
 
     def clear_cart(self):
-        self.cart = []
+        self.cart.clear()
         self.current_customer = None
         self.lbl_cust.setText("Walk-in Customer")
-        self.update_cart_table()
 
     def process_bill(self):
-        if not self.cart:
+        if not self.cart.rowCount():
             show_error(self, "Empty Cart", "Add items to cart first.")
             return
 
-        grand_total = float(self.lbl_grand_total.text().replace('₹', ''))
+        grand_total = self.totals['grand_total']
         dlg = PaymentDialog(self, grand_total)
         if dlg.exec():
             bill_data = {
                 'bill_number': generate_bill_number(),
                 'customer_id': self.current_customer['id'] if self.current_customer else None,
-                'subtotal': float(self.lbl_subtotal.text().replace('₹', '')),
+                'subtotal': self.totals['subtotal'],
                 'grand_total': grand_total,
-                'discount_amount': float(self.lbl_discount_amt.text().replace('₹', '')),
+                'discount_amount': self.totals['discount_amount'],
+                'tax_percent': self.totals['tax_percent'],
+                'tax_amount': self.totals['tax_amount'],
                 'payment_method': dlg.payment_method,
                 'customer_name': self.current_customer['name'] if self.current_customer else "Walk-in Customer",
                 'customer_phone': self.current_customer['phone'] if self.current_customer else "",
@@ -670,15 +748,14 @@ class MainWindow(QMainWindow):
             }
             
             try:
-                # Save to DB
-                BillModel.create_bill(bill_data, self.cart)
+                # Journaled here, committed to the DB by the writer thread
+                self.bill_writer.submit(bill_data, self.cart.lines())
                 
                 # Show Preview & Print
-                preview_dlg = BillPreviewDialog(self, bill_data, self.cart, self.printer_manager)
+                preview_dlg = BillPreviewDialog(self, bill_data, self.cart.lines(), self.print_spooler)
                 preview_dlg.exec()
 
                 self.clear_cart()
-                self.load_recent_bills()
                 # show_info(self, "Success", "Bill processed successfully!") # Preview dialog handles success msg if printed
             except Exception as e:
                 show_error(self, "Error", f"Failed to process bill: {e}")
@@ -691,6 +768,10 @@ class MainWindow(QMainWindow):
             from app.ui_styles import get_theme_style
             theme = SettingsModel.get_setting('theme', 'Light')
             QApplication.instance().setStyleSheet(get_theme_style(theme))
+            self.cart.merge_lines = SettingsModel.get_setting('cart_merge_lines', 'true').lower() == 'true'
+            self.apply_pricing_settings()
+            # The printer may have been reconfigured, try the waiting receipts on it
+            self.print_spooler.retry_now()
 
     def show_debt_customers(self):
         """Show dialog with customers who have pending debt"""
@@ -711,4 +792,4 @@ class MainWindow(QMainWindow):
 
     def open_product_dialog(self):
         ManageProductsDialog(self).exec()
-        self.load_products()
+        self.refresh_products()
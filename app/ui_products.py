@@ -1,10 +1,13 @@
 from PyQt6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem,
+    QDialog, QVBoxLayout, QHBoxLayout, QTableView, QAbstractItemView,
     QLineEdit, QPushButton, QHeaderView, QMessageBox, QFormLayout, QComboBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
 from app.models import ProductModel
+from app.catalog import shared_products
+from app.search import FuzzyIndex
 from app.ui_error_handler import show_error, show_info
+from app.utils.helpers import to_paise, format_amount
 
 class ProductDialog(QDialog):
     def __init__(self, parent=None, product=None):
@@ -21,7 +24,7 @@ class ProductDialog(QDialog):
         self.unit.addItems(["kg", "g", "litre", "ml", "pc"])
         if self.product: self.unit.setCurrentText(self.product['base_unit'])
         
-        self.price = QLineEdit(str(self.product['price_per_unit']) if self.product else "")
+        self.price = QLineEdit(format_amount(self.product['price_per_unit']) if self.product else "")
         self.category = QLineEdit(self.product['category'] if self.product else "General")
 
         layout.addRow("Name:", self.name)
@@ -37,7 +40,7 @@ class ProductDialog(QDialog):
 
     def save_product(self):
         try:
-            price = float(self.price.text())
+            price = to_paise(self.price.text())
             if self.product:
                 ProductModel.update_product(self.product['id'], self.name.text(), self.code.text(), 
                                           self.unit.currentText(), price, self.category.text())
@@ -48,6 +51,93 @@ class ProductDialog(QDialog):
         except ValueError:
             show_error(self, "Input Error", "Price must be a number.")
 
+class ProductTableModel(QAbstractTableModel):
+    """
+    Products for the manage dialog, read from a product ColumnStore. Cells are
+    formatted only when the view asks for them, so only the visible rows cost
+    anything. The search filter narrows the previous result when the new text
+    extends the old one, instead of rescanning every product on each keystroke.
+    """
+    HEADERS = ["ID", "Name", "Code", "Unit", "Price", "Category"]
+    FIELDS = ['id', 'name', 'code', 'base_unit', 'price_per_unit', 'category']
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._catalog = {}     # product id -> product, normally a ColumnStore
+        self._haystacks = {}   # id -> lower-cased "name\ncode" for the substring filter
+        self._rows = []        # ids shown, in table order
+        self._last_filter = ('', None)  # query -> ids containing it, None for all
+
+    def set_catalog(self, catalog):
+        self.beginResetModel()
+        self._catalog = catalog
+        self._haystacks = {}
+        for product_id in catalog:
+            self._store(product_id)
+        self._rows = list(self._haystacks)
+        self._last_filter = ('', None)
+        self.endResetModel()
+
+    def _store(self, product_id):
+        product = self._catalog[product_id]
+        self._haystacks[product_id] = f"{product['name'].lower()}\n{(product['code'] or '').lower()}"
+
+    def update_products(self, product_ids):
+        """Re-reads products after the catalog changed; call set_filter afterwards to show them"""
+        for product_id in product_ids:
+            self._store(product_id)
+        self._last_filter = ('', None)
+
+    def remove_products(self, product_ids):
+        for product_id in product_ids:
+            self._haystacks.pop(product_id, None)
+        self._last_filter = ('', None)
+
+    def product_at(self, row):
+        return self._catalog.get(self._rows[row]) if 0 <= row < len(self._rows) else None
+
+    def filter_ids(self, query):
+        """Ids whose name or code contains query (lower-case)"""
+        if not query:
+            return list(self._haystacks)
+        last_query, last_ids = self._last_filter
+        # Anything containing "suga" also contains "sug", so only the last hits need checking
+        candidates = last_ids if last_ids is not None and last_query in query else self._haystacks
+        haystacks = self._haystacks
+        ids = [pid for pid in candidates if query in haystacks[pid]]
+        self._last_filter = (query, ids)
+        return ids
+
+    def set_filter(self, query):
+        """Shows the products matching query, returns how many there are"""
+        self.set_rows(self.filter_ids(query))
+        return len(self._rows)
+
+    def set_rows(self, ids):
+        self.beginResetModel()
+        self._rows = [pid for pid in ids if pid in self._haystacks]
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.FIELDS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        field = self.FIELDS[index.column()]
+        value = self._catalog[self._rows[index.row()]][field]
+        if field == 'price_per_unit':
+            return format_amount(value)
+        return str(value) if field == 'id' else value
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
 class ManageProductsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -73,12 +163,14 @@ class ManageProductsDialog(QDialog):
         layout.addLayout(top_layout)
 
         # Product Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels(["ID", "Name", "Code", "Unit", "Price", "Category"])
+        self.model = ProductTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.table.hideColumn(0) # Hide ID column
         layout.addWidget(self.table)
 
@@ -99,55 +191,73 @@ class ManageProductsDialog(QDialog):
         self.setLayout(layout)
 
     def load_products(self):
-        self.products = ProductModel.get_all_products()
-        self.update_table(self.products)
+        # The store the main window bills from; catch up on changes made elsewhere first
+        self.catalog = shared_products()
+        self.catalog.refresh()
+        self.model.set_catalog(self.catalog)
+        self._fuzzy_index = None
+        self.catalog.subscribe(self.unindex_products, self.index_products)
+        self.finished.connect(lambda: self.catalog.unsubscribe(self.unindex_products, self.index_products))
+        self.search_products()
+
+    @property
+    def fuzzy_index(self):
+        # Built on first use, only searches that find nothing as typed need it
+        if self._fuzzy_index is None:
+            self._fuzzy_index = FuzzyIndex(self.catalog.values(), catalog=self.catalog)
+        return self._fuzzy_index
+
+    def unindex_products(self, product_ids):
+        self.model.remove_products(product_ids)
+        if self._fuzzy_index is not None:
+            for product_id in product_ids:
+                self._fuzzy_index.remove(product_id)
+
+    def index_products(self, product_ids):
+        self.model.update_products(product_ids)
+        if self._fuzzy_index is not None:
+            for product_id in product_ids:
+                self._fuzzy_index.update(self.catalog[product_id])
+        self.search_products()
+
+    def refresh_products(self):
+        """Apply only the products changed since the last load, keeping the search text"""
+        self.catalog.refresh()
 
     def search_products(self):
         query = self.search_bar.text().lower()
-        filtered = [p for p in self.products if query in p['name'].lower() or query in p['code'].lower()]
-        self.update_table(filtered)
-
-    def update_table(self, products):
-        self.table.setRowCount(len(products))
-        for row, p in enumerate(products):
-            self.table.setItem(row, 0, QTableWidgetItem(str(p['id'])))
-            self.table.setItem(row, 1, QTableWidgetItem(p['name']))
-            self.table.setItem(row, 2, QTableWidgetItem(p['code']))
-            self.table.setItem(row, 3, QTableWidgetItem(p['base_unit']))
-            self.table.setItem(row, 4, QTableWidgetItem(f"{p['price_per_unit']:.2f}"))
-            self.table.setItem(row, 5, QTableWidgetItem(p['category']))
+        if not self.model.set_filter(query) and query:
+            # Nothing contains the text as typed, look for names with typos
+            self.model.set_rows([p['id'] for p in self.fuzzy_index.search(query, limit=50)])
 
     def add_product(self):
         dlg = ProductDialog(self)
         if dlg.exec():
-            self.load_products()
+            self.refresh_products()
 
     def edit_product(self):
-        row = self.table.currentRow()
-        if row < 0:
+        product = self.model.product_at(self.table.currentIndex().row())
+        if not product:
             show_info(self, "Selection", "Please select a product to edit.")
             return
         
-        product_id = int(self.table.item(row, 0).text())
-        product = next((p for p in self.products if p['id'] == product_id), None)
-        
-        if product:
-            dlg = ProductDialog(self, product)
-            if dlg.exec():
-                self.load_products()
+        dlg = ProductDialog(self, product)
+        if dlg.exec():
+            self.refresh_products()
 
     def delete_product(self):
-        row = self.table.currentRow()
-        if row < 0:
+        product = self.model.product_at(self.table.currentIndex().row())
+        if not product:
             show_info(self, "Selection", "Please select a product to delete.")
             return
         
-        product_name = self.table.item(row, 1).text()
+        product_name = product['name']
         confirm = QMessageBox.question(self, "Confirm Delete", 
                                      f"Are you sure you want to delete '{product_name}'?",
                                      QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
         
         if confirm == QMessageBox.StandardButton.Yes:
-            product_id = int(self.table.item(row, 0).text())
-            ProductModel.delete_product(product_id)
-            self.load_products()
+            if ProductModel.delete_product(product['id']):
+                self.refresh_products()
+            else:
+                show_error(self, "Error", "Could not delete product. It may be used in existing bills.")
@@ -1,13 +1,75 @@
 from PyQt6.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, 
+    QDialog, QVBoxLayout, QHBoxLayout, QTableView, 
     QDateEdit, QPushButton, QLabel, QHeaderView
 )
-from PyQt6.QtCore import QDate, Qt
-from app.db import get_db
-from app.orm_models import Bill, Customer
+from PyQt6.QtCore import QDate, Qt, QAbstractTableModel, QModelIndex
+from app.models import BillModel
+from app.utils.helpers import day_range_timestamps, format_currency
 
 from app.ui_styles import TOTAL_LABEL_STYLE
 
+class ReportTableModel(QAbstractTableModel):
+    """
+    Bills of a report range, fetched a page at a time as the view scrolls
+    (canFetchMore/fetchMore), so a long range opens as fast as a short one.
+    """
+    HEADERS = ["Date", "Bill No", "Customer", "Payment", "Total"]
+    PAGE_SIZE = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._range = None
+        self._exhausted = True
+
+    def set_range(self, start_ts, end_ts):
+        self.beginResetModel()
+        self._rows = []
+        self._range = (start_ts, end_ts)
+        self._exhausted = False
+        self.endResetModel()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid() or self._exhausted:
+            return
+        last = self._rows[-1] if self._rows else None
+        after = (last['date_ts'], last['id']) if last else None
+        page = BillModel.get_report_page(*self._range, after=after, limit=self.PAGE_SIZE)
+        self._exhausted = len(page) < self.PAGE_SIZE
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(page) - 1)
+            self._rows.extend(page)
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        bill = self._rows[index.row()]
+        column = index.column()
+        if column == 0:
+            return bill['date_time']
+        if column == 1:
+            return bill['bill_number']
+        if column == 2:
+            return bill['customer_name'] or "Walk-in"
+        if column == 3:
+            return bill['payment_method']
+        return format_currency(bill['grand_total'])
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return super().headerData(section, orientation, role)
+
 class ReportsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -39,12 +101,13 @@ class ReportsDialog(QDialog):
         layout.addLayout(filter_layout)
 
         # Table
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["Date", "Bill No", "Customer", "Payment", "Total"])
+        self.model = ReportTableModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
         self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.table.setAlternatingRowColors(True)
         self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         layout.addWidget(self.table)
 
         # Summary
@@ -59,26 +122,9 @@ class ReportsDialog(QDialog):
         start = self.start_date.date().toString("yyyy-MM-dd")
         end = self.end_date.date().toString("yyyy-MM-dd")
         
-        # Add time to cover the full end day
-        start_ts = f"{start} 00:00:00"
-        end_ts = f"{end} 23:59:59"
-
-        session = get_db()
-        try:
-            bills_orm = session.query(Bill).filter(Bill.date_time.between(start_ts, end_ts)).all()
-            bills = [b.to_dict() for b in bills_orm]
-        finally:
-            session.close()
-
-        self.table.setRowCount(len(bills))
-        total_sales = 0
-
-        for row, bill in enumerate(bills):
-            self.table.setItem(row, 0, QTableWidgetItem(bill['date_time']))
-            self.table.setItem(row, 1, QTableWidgetItem(bill['bill_number']))
-            self.table.setItem(row, 2, QTableWidgetItem(bill['customer_name'] or "Walk-in"))
-            self.table.setItem(row, 3, QTableWidgetItem(bill['payment_method']))
-            self.table.setItem(row, 4, QTableWidgetItem(f"₹{bill['grand_total']:.2f}"))
-            total_sales += bill['grand_total']
-
-        self.lbl_total_sales.setText(f"Total Sales: ₹{total_sales:.2f}")
+        # Cover the full end day
+        start_ts, end_ts = day_range_timestamps(start, end)
+        # Rows load page by page as the table scrolls, the total needs every bill
+        self.model.set_range(start_ts, end_ts)
+        summary = BillModel.get_sales_summary(start_ts, end_ts)
+        self.lbl_total_sales.setText(f"Total Sales: {format_currency(summary['total_sales'])}")
@@ -6,6 +6,8 @@ from PyQt6.QtWidgets import (
 from PyQt6.QtCore import Qt
 from app.models import SettingsModel
 from app.printer import PrinterManager
+from app.pricing import ROUNDING_STEPS
+from app.db import STORAGE_PROFILES, DEFAULT_STORAGE_PROFILE, apply_storage_profile
 import serial.tools.list_ports
 
 class SettingsDialog(QDialog):
@@ -28,6 +30,13 @@ class SettingsDialog(QDialog):
         self.store_layout.addRow("Store Name:", self.store_name)
         self.store_layout.addRow("Address:", self.store_address)
         self.store_layout.addRow("Phone:", self.store_phone)
+        self.tax_percent = QLineEdit(SettingsModel.get_setting('tax_percent', '0'))
+        self.tax_percent.setPlaceholderText("e.g., 5")
+        self.store_layout.addRow("Tax (%):", self.tax_percent)
+        self.grand_total_rounding = QComboBox()
+        self.grand_total_rounding.addItems(list(ROUNDING_STEPS.keys()))
+        self.grand_total_rounding.setCurrentText(SettingsModel.get_setting('grand_total_rounding', 'None'))
+        self.store_layout.addRow("Round Total To:", self.grand_total_rounding)
         self.store_tab.setLayout(self.store_layout)
         self.tabs.addTab(self.store_tab, "Store Info")
 
@@ -115,7 +124,7 @@ class SettingsDialog(QDialog):
         self.network_group = QGroupBox("Network Printer")
         network_layout = QFormLayout()
         self.printer_ip = QLineEdit(SettingsModel.get_setting('printer_ip', '192.168.1.100'))
-        self.printer_ip.setPlaceholderText("e.g., 192.168.1.100")
+        self.printer_ip.setPlaceholderText("e.g., 192.168.1.100 or 192.168.1.100:9100")
         network_layout.addRow("IP Address:", self.printer_ip)
         self.network_group.setLayout(network_layout)
         self.printer_layout.addWidget(self.network_group)
@@ -148,6 +157,10 @@ class SettingsDialog(QDialog):
         
         paper_group.setLayout(paper_layout)
         self.printer_layout.addWidget(paper_group)
+
+        self.cash_drawer_kick = QCheckBox("Open the cash drawer after printing a receipt")
+        self.cash_drawer_kick.setChecked(SettingsModel.get_setting('cash_drawer_kick', 'false').lower() == 'true')
+        self.printer_layout.addWidget(self.cash_drawer_kick)
         
         # Initialize paper settings visibility
         self.on_paper_size_changed(self.paper_size.currentText())
@@ -190,6 +203,21 @@ class SettingsDialog(QDialog):
         self.appearance_tab.setLayout(self.appearance_layout)
         self.tabs.addTab(self.appearance_tab, "Appearance")
 
+        # Database Settings
+        self.database_tab = QWidget()
+        self.database_layout = QFormLayout()
+        self.storage_profile = QComboBox()
+        self.storage_profile.addItems(list(STORAGE_PROFILES.keys()))
+        self.storage_profile.setCurrentText(SettingsModel.get_setting('storage_profile', DEFAULT_STORAGE_PROFILE))
+        self.database_layout.addRow("Storage Profile:", self.storage_profile)
+        profile_help = QLabel("Safe: slowest, flushes every commit to disk.\n"
+                              "Balanced: WAL journal, reports never block billing.\n"
+                              "Fast: lowest latency, last bills may be lost on power cut.")
+        profile_help.setStyleSheet("color: #666;")
+        self.database_layout.addRow(profile_help)
+        self.database_tab.setLayout(self.database_layout)
+        self.tabs.addTab(self.database_tab, "Database")
+
         # Barcode Scanner Settings
         self.scanner_tab = QWidget()
         self.scanner_layout = QVBoxLayout()
@@ -272,6 +300,10 @@ class SettingsDialog(QDialog):
         self.scanner_auto_search.setChecked(SettingsModel.get_setting('scanner_auto_search', 'true').lower() == 'true')
         options_layout.addWidget(self.scanner_auto_search)
         
+        self.cart_merge_lines = QCheckBox("Add repeated scans of a product to its existing cart line")
+        self.cart_merge_lines.setChecked(SettingsModel.get_setting('cart_merge_lines', 'true').lower() == 'true')
+        options_layout.addWidget(self.cart_merge_lines)
+        
         options_group.setLayout(options_layout)
         self.scanner_layout.addWidget(options_group)
         
@@ -299,41 +331,51 @@ class SettingsDialog(QDialog):
         self.setLayout(layout)
 
     def save_settings(self):
-        SettingsModel.set_setting('store_name', self.store_name.text())
-        SettingsModel.set_setting('store_address', self.store_address.text())
-        SettingsModel.set_setting('store_phone', self.store_phone.text())
-        
-        SettingsModel.set_setting('printer_type', self.printer_type.currentText())
-        SettingsModel.set_setting('windows_printer_name', self.windows_printer_combo.currentText())
-        SettingsModel.set_setting('printer_usb_vid', self.printer_vid.text())
-        SettingsModel.set_setting('printer_usb_pid', self.printer_pid.text())
-        SettingsModel.set_setting('printer_serial_port', self.printer_port.currentText())
-        SettingsModel.set_setting('printer_ip', self.printer_ip.text())
-        
-        # Save Paper Size settings
-        SettingsModel.set_setting('paper_size', self.paper_size.currentText())
-        SettingsModel.set_setting('chars_per_line', str(self.chars_per_line.value()))
-        SettingsModel.set_setting('receipt_font_size', self.font_size.currentText())
-        SettingsModel.set_setting('line_spacing', self.line_spacing.currentText())
+        # Written in one transaction instead of one per key
+        SettingsModel.set_many({
+            'store_name': self.store_name.text(),
+            'store_address': self.store_address.text(),
+            'store_phone': self.store_phone.text(),
+            'tax_percent': self.tax_percent.text().strip() or '0',
+            'grand_total_rounding': self.grand_total_rounding.currentText(),
 
-        SettingsModel.set_setting('smtp_server', self.smtp_server.text())
-        SettingsModel.set_setting('smtp_port', self.smtp_port.text())
-        SettingsModel.set_setting('smtp_user', self.smtp_user.text())
-        SettingsModel.set_setting('smtp_pass', self.smtp_pass.text())
-        
-        SettingsModel.set_setting('theme', self.theme_combo.currentText())
+            'printer_type': self.printer_type.currentText(),
+            'windows_printer_name': self.windows_printer_combo.currentText(),
+            'printer_usb_vid': self.printer_vid.text(),
+            'printer_usb_pid': self.printer_pid.text(),
+            'printer_serial_port': self.printer_port.currentText(),
+            'printer_ip': self.printer_ip.text(),
+
+            # Save Paper Size settings
+            'paper_size': self.paper_size.currentText(),
+            'chars_per_line': str(self.chars_per_line.value()),
+            'receipt_font_size': self.font_size.currentText(),
+            'line_spacing': self.line_spacing.currentText(),
+            'cash_drawer_kick': str(self.cash_drawer_kick.isChecked()).lower(),
+
+            'smtp_server': self.smtp_server.text(),
+            'smtp_port': self.smtp_port.text(),
+            'smtp_user': self.smtp_user.text(),
+            'smtp_pass': self.smtp_pass.text(),
+
+            'theme': self.theme_combo.currentText(),
+
+            'storage_profile': self.storage_profile.currentText(),
 
-        # Save Barcode Scanner settings
-        SettingsModel.set_setting('scanner_type', self.scanner_type.currentText())
-        SettingsModel.set_setting('scanner_com_port', self.scanner_com_port.currentText())
-        SettingsModel.set_setting('scanner_baud_rate', self.scanner_baud_rate.currentText())
-        SettingsModel.set_setting('scanner_prefix', self.scanner_prefix.text())
-        SettingsModel.set_setting('scanner_suffix', self.scanner_suffix.currentText())
-        SettingsModel.set_setting('scanner_timeout', str(self.scanner_timeout.value()))
-        SettingsModel.set_setting('scanner_auto_focus', str(self.scanner_auto_focus.isChecked()).lower())
-        SettingsModel.set_setting('scanner_beep', str(self.scanner_beep.isChecked()).lower())
-        SettingsModel.set_setting('scanner_auto_search', str(self.scanner_auto_search.isChecked()).lower())
+            # Save Barcode Scanner settings
+            'scanner_type': self.scanner_type.currentText(),
+            'scanner_com_port': self.scanner_com_port.currentText(),
+            'scanner_baud_rate': self.scanner_baud_rate.currentText(),
+            'scanner_prefix': self.scanner_prefix.text(),
+            'scanner_suffix': self.scanner_suffix.currentText(),
+            'scanner_timeout': str(self.scanner_timeout.value()),
+            'scanner_auto_focus': str(self.scanner_auto_focus.isChecked()).lower(),
+            'scanner_beep': str(self.scanner_beep.isChecked()).lower(),
+            'scanner_auto_search': str(self.scanner_auto_search.isChecked()).lower(),
+            'cart_merge_lines': str(self.cart_merge_lines.isChecked()).lower(),
+        })
 
+        apply_storage_profile(self.storage_profile.currentText())
         self.accept()
 
     def on_scanner_type_changed(self, scanner_type):
@@ -1,13 +1,33 @@
 from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import calendar
+import os
 import random
 import string
 
+DATE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+SECONDS_PER_DAY = 86400
+
 def generate_bill_number():
     """Generates a unique bill number based on timestamp and random suffix."""
     timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     suffix = ''.join(random.choices(string.ascii_uppercase + string.digits, k=3))
     return f"BILL-{timestamp}-{suffix}"
 
+def to_timestamp(date_time):
+    """
+    Converts a 'YYYY-MM-DD HH:MM:SS' bill date to integer seconds.
+    The wall-clock time is treated as UTC, the same as SQLite's strftime('%s'),
+    so values computed here and in SQL backfills always agree.
+    """
+    return calendar.timegm(datetime.strptime(date_time, DATE_TIME_FORMAT).timetuple())
+
+def day_range_timestamps(start_date, end_date):
+    """Returns [start, end) timestamps covering two 'YYYY-MM-DD' dates inclusive."""
+    start_ts = to_timestamp(f"{start_date} 00:00:00")
+    end_ts = to_timestamp(f"{end_date} 00:00:00") + SECONDS_PER_DAY
+    return start_ts, end_ts
+
 def convert_unit(value, from_unit, to_unit):
     """
     Converts units.
@@ -28,5 +48,54 @@ def convert_unit(value, from_unit, to_unit):
         
     return value
 
-def format_currency(value):
-    return f"₹{value:.2f}"
+def to_paise(rupees):
+    """
+    Converts a rupee amount (str, int or float) to integer paise, rounding half up.
+    Floats go through str() so 1.005 becomes 101 paise, not 100.
+    """
+    try:
+        amount = Decimal(str(rupees).strip().replace('₹', '').replace(',', ''))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {rupees!r}")
+    if not amount.is_finite():
+        raise ValueError(f"Invalid amount: {rupees!r}")
+    return int((amount * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def _finite_decimal(value, what):
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid {what}: {value!r}")
+    if not number.is_finite():
+        raise ValueError(f"Invalid {what}: {value!r}")
+    return number
+
+def line_total(quantity, price):
+    """Total in paise for a quantity of a unit price in paise, rounded half up.
+    Raises ValueError for a quantity that is not a finite number."""
+    return int((_finite_decimal(quantity, 'quantity') * price).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def percent_of(amount, percent):
+    """percent% of a paise amount, rounded half up to whole paise.
+    Raises ValueError for a percent that is not a finite number."""
+    return int((Decimal(amount) * _finite_decimal(percent, 'percent') / 100).quantize(
+        Decimal('1'), rounding=ROUND_HALF_UP))
+
+def format_amount(paise):
+    """Formats paise as rupees with two decimals, e.g. 12345 -> '123.45'."""
+    sign = '-' if paise < 0 else ''
+    rupees, rest = divmod(abs(int(paise)), 100)
+    return f"{sign}{rupees}.{rest:02d}"
+
+def format_currency(paise):
+    return f"₹{format_amount(paise)}"
+
+def fsync_dir(path):
+    """Makes renames and new files in a directory durable. A no-op on Windows,
+    which has no directory handles to fsync."""
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
@@ -0,0 +1,138 @@
+"""Bills per second of BillModel.create_bill at 10, 100 and 500 lines.
+
+    python benchmarks/create_bill.py [--seconds 3] [--profile Balanced]
+
+Commits bills one after another into a fresh database in a temp directory,
+through the real BillModel.create_bill and with the connection pragmas of
+the chosen storage profile. For comparison, the same bills also go through
+the ORM path create_bill used before: one Bill, then a BillItem per line,
+flushed one INSERT at a time. Prints bills/s and the SQL statements per bill.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, text  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.db import session_scope  # noqa: E402
+from app.models import BillModel  # noqa: E402
+from app.orm_models import Bill, BillItem  # noqa: E402
+from app.utils.helpers import to_timestamp  # noqa: E402
+
+LINE_COUNTS = (10, 100, 500)
+PRODUCTS = 500
+
+
+def orm_create_bill(bill_data, items):
+    """create_bill as it was before the Core inserts"""
+    with session_scope() as session:
+        bill = Bill(
+            bill_number=bill_data['bill_number'],
+            customer_id=bill_data.get('customer_id'),
+            date_time=bill_data['date_time'],
+            date_ts=to_timestamp(bill_data['date_time']),
+            subtotal=bill_data['subtotal'],
+            tax_percent=bill_data.get('tax_percent', 0),
+            tax_amount=bill_data.get('tax_amount', 0),
+            discount_amount=bill_data.get('discount_amount', 0),
+            grand_total=bill_data['grand_total'],
+            payment_method=bill_data['payment_method']
+        )
+        session.add(bill)
+        session.flush()
+        for item in items:
+            session.add(BillItem(
+                bill_id=bill.id,
+                product_id=item['product_id'],
+                product_name=item['product_name'],
+                quantity=item['quantity'],
+                unit=item['unit'],
+                price=item['price'],
+                total=item['total']
+            ))
+        session.flush()
+        return bill.id
+
+
+def seed():
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO products (id, name, code, base_unit, price_per_unit, category) "
+            "VALUES (:id, :name, :code, 'kg', :price, 'Grocery')"
+        ), [{'id': i, 'name': f'Product {i}', 'code': f'P{i:06d}', 'price': 1000 + i}
+            for i in range(1, PRODUCTS + 1)])
+
+
+def new_bill(tag, n, lines):
+    items = [{'product_id': i % PRODUCTS + 1, 'product_name': f'Product {i % PRODUCTS + 1}',
+              'quantity': 1, 'unit': 'kg', 'price': 1000 + i % PRODUCTS + 1, 'total': 1000 + i % PRODUCTS + 1}
+             for i in range(lines)]
+    total = sum(item['total'] for item in items)
+    bill = {'bill_number': f'{tag}-{lines}-{n}', 'date_time': '2026-06-01 12:00:00',
+            'subtotal': total, 'grand_total': total, 'payment_method': 'Cash'}
+    return bill, items
+
+
+def bills_per_second(create, tag, lines, seconds):
+    """(bills/s, statements per bill) committing bills of `lines` lines for `seconds`"""
+    statements = [0]
+
+    def count(*args):
+        statements[0] += 1
+
+    bills = [new_bill(tag, n, lines) for n in range(3)]  # warm up
+    for bill, items in bills:
+        create(bill, items)
+    event.listen(db.engine, 'before_cursor_execute', count)
+    event.listen(db.engine, 'begin', count)
+    try:
+        n = 0
+        start = time.perf_counter()
+        until = start + seconds
+        while time.perf_counter() < until:
+            bill, items = new_bill(tag, n + 3, lines)
+            create(bill, items)
+            n += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+        event.remove(db.engine, 'begin', count)
+    return n / elapsed, statements[0] / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=3, help="commit time per line count and path")
+    parser.add_argument('--profile', default=db.DEFAULT_STORAGE_PROFILE, choices=sorted(db.STORAGE_PROFILES))
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='create_bill_')
+    try:
+        db.use_database(os.path.join(workdir, 'thangam.db'))
+        db.init_db()
+        db.apply_storage_profile(args.profile)  # after init_db, which applies the saved one
+        seed()
+
+        print(f"{args.profile} profile, {args.seconds:g}s per run")
+        header = (f"{'lines':>5}  {'orm bills/s':>11} {'stmts':>6}  {'create_bill bills/s':>19} {'stmts':>6}"
+                  f"  {'speedup':>7}")
+        print(header)
+        print('-' * len(header))
+        for lines in LINE_COUNTS:
+            before, before_statements = bills_per_second(orm_create_bill, 'ORM', lines, args.seconds)
+            after, after_statements = bills_per_second(BillModel.create_bill, 'CORE', lines, args.seconds)
+            print(f"{lines:>5}  {before:>11.0f} {before_statements:>6.0f}  {after:>19.0f} {after_statements:>6.0f}"
+                  f"  {after / before:>6.1f}x")
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
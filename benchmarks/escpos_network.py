@@ -0,0 +1,157 @@
+"""Receipts per second to a network printer: one write per receipt against
+one python-escpos call per command.
+
+    python benchmarks/escpos_network.py [--receipts 200] [--items 10]
+
+A local TCP server stands in for a port 9100 receipt printer (the FakePrinter
+of tests/test_printer_connection.py, counting bytes instead of keeping them).
+Both ways send the same receipt over one escpos Network connection; that
+they print the same is what tests/test_escpos_buffer.py checks:
+
+- per command: hw('INIT'), charcode(), then set()/text() for every line and
+  cut(), each its own socket write, as python-escpos is normally driven
+- one write: to_escpos() builds the whole receipt and _raw() sends it at once
+
+A receipt counts once the stand-in has received all of its bytes.
+"""
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from escpos.printer import Dummy, Network  # noqa: E402
+
+from app.receipt import LAYOUT_SETTINGS, ReceiptLayout, to_escpos  # noqa: E402
+
+BILL = {
+    'bill_number': 'BILL-20260101100000-XYZ', 'date_time': '2026-01-01 10:00:00',
+    'customer_name': 'Ravi', 'customer_phone': '9876543210', 'discount_amount': 1000,
+    'tax_percent': 5, 'payment_method': 'Cash',
+}
+
+
+class CountingDummy(Dummy):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def _raw(self, msg):
+        self.writes += 1
+        super()._raw(msg)
+
+
+class FakePrinter:
+    """Accepts connections like a network printer and counts the bytes that arrive"""
+
+    def __init__(self):
+        self.received = 0
+        self._arrived = threading.Condition()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        while True:
+            try:
+                data = client.recv(65536)
+            except OSError:
+                return
+            if not data:
+                return
+            with self._arrived:
+                self.received += len(data)
+                self._arrived.notify_all()
+
+    def wait_for(self, count, timeout=10):
+        with self._arrived:
+            return self._arrived.wait_for(lambda: self.received >= count, timeout)
+
+    def close(self):
+        self._server.close()
+
+
+def receipt(items):
+    layout = ReceiptLayout(dict(LAYOUT_SETTINGS, store_address='12 Main Road', store_phone='0441234567'))
+    bill_items = [{'product_name': f'Product {i + 1} Premium', 'quantity': 1.5, 'unit': 'kg',
+                   'price': 6000 + i, 'total': 9000 + i} for i in range(items)]
+    subtotal = sum(item['total'] for item in bill_items)
+    bill = dict(BILL, subtotal=subtotal, tax_amount=0, grand_total=subtotal - BILL['discount_amount'])
+    return layout, layout.render(bill, bill_items)
+
+
+def per_command(printer, lines, layout):
+    printer.hw('INIT')
+    printer.charcode('CP437')
+    for line in lines:
+        if line.bold:
+            printer.set(bold=True)
+            printer.text(layout.format_line(line) + '\n')
+            printer.set(bold=False)
+        else:
+            printer.text(layout.format_line(line) + '\n')
+    printer.cut()
+
+
+def one_write(printer, lines, layout):
+    printer._raw(to_escpos(lines, layout))
+
+
+def receipts_per_second(send, receipts, lines, layout):
+    """(receipts/s, writes per receipt)"""
+    # python-escpos skips settings the printer already has, so the bytes sent can
+    # differ after the first receipt; a Dummy driven the same way gives the totals
+    dummy = CountingDummy()
+    expected = []
+    for _ in range(receipts):
+        send(dummy, lines, layout)
+        expected.append(len(dummy.output))
+
+    fake = FakePrinter()
+    printer = Network('127.0.0.1', port=fake.port, timeout=5)
+    printer.open()
+    try:
+        start = time.perf_counter()
+        for total in expected:
+            send(printer, lines, layout)
+            if not fake.wait_for(total):
+                raise RuntimeError("the stand-in printer stopped receiving")
+        return receipts / (time.perf_counter() - start), dummy.writes / receipts
+    finally:
+        printer.close()
+        fake.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=200)
+    parser.add_argument('--items', type=int, default=10, help="items per receipt")
+    args = parser.parse_args()
+
+    layout, lines = receipt(args.items)
+    size = len(to_escpos(lines, layout))
+    print(f"{args.items} items, {len(lines)} lines, {size} bytes per receipt")
+    header = f"{'send':<12} {'writes':>6} {'receipts/s':>11} {'ms each':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, send in (('per command', per_command), ('one write', one_write)):
+        rate, writes = receipts_per_second(send, args.receipts, lines, layout)
+        print(f"{name:<12} {writes:>6.0f} {rate:>11.0f} {1000 / rate:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
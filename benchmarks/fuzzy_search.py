@@ -0,0 +1,112 @@
+"""Recall and latency of FuzzyIndex.search on typo'd queries.
+
+    python benchmarks/fuzzy_search.py [--products 50000] [--queries 500] [--seed 1]
+
+Builds a catalog of synthetic product names from a seeded vocabulary of
+made-up words, then searches for randomly picked products by their name with
+0, 1 and 2 injected typos (substitution, insertion, deletion or adjacent swap,
+each in a word long enough to be allowed one). Prints recall@1/5/10 (the
+product searched for is among the first k results) and p50/p95 latency.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.search import FuzzyIndex, allowed_edits  # noqa: E402
+
+SYLLABLES = ['ka', 'ri', 'ma', 'su', 'ga', 'pa', 'ne', 'ti', 'lo', 'va', 'ra', 'di', 'mo', 'sha',
+             'chi', 'ya', 'pu', 'ko', 'nu', 'thi', 'ba', 'le', 'ja', 'go']
+VOCABULARY = 3000
+RECALL_AT = (1, 5, 10)
+TYPOS = (0, 1, 2)
+
+
+def vocabulary(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+def catalog(count, rng):
+    words = vocabulary(rng, VOCABULARY)
+    names = set()
+    while len(names) < count:
+        names.add(' '.join(rng.choice(words).title() for _ in range(rng.randint(2, 4))))
+    return [{'id': i, 'name': name} for i, name in enumerate(sorted(names), 1)]
+
+
+def typo(word, rng):
+    i = rng.randrange(len(word))
+    kind = rng.choice(('substitute', 'insert', 'delete', 'swap'))
+    if kind == 'substitute':
+        return word[:i] + rng.choice(string.ascii_lowercase.replace(word[i], '')) + word[i + 1:]
+    if kind == 'insert':
+        return word[:i] + rng.choice(string.ascii_lowercase) + word[i:]
+    if kind == 'delete' or i == len(word) - 1:
+        return word[:i] + word[i + 1:]
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def with_typos(name, count, rng):
+    """name with count typos, none in a word allowed fewer typos than it gets.
+    Returns None when the name has no room for that many."""
+    words = name.lower().split()
+    room = [allowed_edits(w) for w in words]
+    for _ in range(count):
+        eligible = [i for i, r in enumerate(room) if r]
+        if not eligible:
+            return None
+        i = rng.choice(eligible)
+        words[i] = typo(words[i], rng)
+        room[i] -= 1
+    return ' '.join(words)
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--queries', type=int, default=500, help="queries per typo count")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    products = catalog(args.products, rng)
+    start = time.perf_counter()
+    index = FuzzyIndex(products)
+    print(f"{len(products)} products, index built in {time.perf_counter() - start:.2f}s")
+
+    header = (f"{'typos':>5}  " + '  '.join(f"{f'recall@{k}':>9}" for k in RECALL_AT)
+              + f"  {'p50 ms':>7}  {'p95 ms':>7}")
+    print(header)
+    print('-' * len(header))
+    for typos in TYPOS:
+        found = dict.fromkeys(RECALL_AT, 0)
+        latencies = []
+        while len(latencies) < args.queries:
+            target = rng.choice(products)
+            query = with_typos(target['name'], typos, rng)
+            if query is None:
+                continue
+            start = time.perf_counter()
+            results = index.search(query, limit=max(RECALL_AT))
+            latencies.append(time.perf_counter() - start)
+            ids = [p['id'] for p in results]
+            for k in RECALL_AT:
+                found[k] += target['id'] in ids[:k]
+        print(f"{typos:>5}  " + '  '.join(f"{found[k] / args.queries:>9.1%}" for k in RECALL_AT)
+              + f"  {percentile(latencies, 50) * 1000:>7.2f}  {percentile(latencies, 95) * 1000:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
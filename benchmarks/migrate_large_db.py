@@ -0,0 +1,132 @@
+"""Upgrade time and memory for a large shop database.
+
+    python benchmarks/migrate_large_db.py [--bills 1000000] [--lines 1]
+
+Builds a database with the schema from before versioned migrations (money as
+REAL rupees, no indexes, no date_ts), fills it with --bills bills of --lines
+lines each, then runs init_db() on it as the app does at startup. Prints the
+time of every migration, the whole upgrade, the peak resident memory it
+added and the file size before and after.
+"""
+import argparse
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tables as created before migrations existed
+BASELINE_SCHEMA = """
+CREATE TABLE customers (
+    id INTEGER NOT NULL, name VARCHAR NOT NULL, phone VARCHAR, address VARCHAR,
+    PRIMARY KEY (id), UNIQUE (phone));
+CREATE TABLE products (
+    id INTEGER NOT NULL, name VARCHAR NOT NULL, code VARCHAR, base_unit VARCHAR NOT NULL,
+    price_per_unit FLOAT NOT NULL, category VARCHAR, PRIMARY KEY (id));
+CREATE TABLE bills (
+    id INTEGER NOT NULL, bill_number VARCHAR NOT NULL, customer_id INTEGER,
+    date_time VARCHAR NOT NULL, subtotal FLOAT NOT NULL, tax_percent FLOAT, tax_amount FLOAT,
+    discount_amount FLOAT, grand_total FLOAT NOT NULL, payment_method VARCHAR, status VARCHAR,
+    PRIMARY KEY (id), UNIQUE (bill_number), FOREIGN KEY(customer_id) REFERENCES customers (id));
+CREATE TABLE bill_items (
+    id INTEGER NOT NULL, bill_id INTEGER NOT NULL, product_id INTEGER NOT NULL,
+    product_name VARCHAR NOT NULL, quantity FLOAT NOT NULL, unit VARCHAR NOT NULL,
+    price FLOAT NOT NULL, total FLOAT NOT NULL, PRIMARY KEY (id),
+    FOREIGN KEY(bill_id) REFERENCES bills (id), FOREIGN KEY(product_id) REFERENCES products (id));
+CREATE TABLE settings (key VARCHAR NOT NULL, value VARCHAR, PRIMARY KEY (key));
+"""
+PRODUCTS = 2000
+CUSTOMERS = 5000
+START = 1704067200  # 2024-01-01
+
+
+def seed_baseline(path, bills, lines=1, seed=1):
+    """Writes a pre-migration database with float rupee amounts. Returns the
+    expected grand_total in paise of every bill, by id."""
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + BASELINE_SCHEMA)
+    prices = [round(rng.uniform(1, 500), 2) for _ in range(PRODUCTS)]
+    conn.executemany("INSERT INTO products VALUES (?, ?, ?, 'kg', ?, 'General')",
+                     ((i + 1, f"Product {i + 1}", f"P{i + 1:06d}", prices[i]) for i in range(PRODUCTS)))
+    conn.executemany("INSERT INTO customers VALUES (?, ?, ?, '')",
+                     ((i + 1, f"Customer {i + 1}", f"9{i:09d}") for i in range(CUSTOMERS)))
+    expected = {}
+
+    def bill_rows():
+        for bill_id in range(1, bills + 1):
+            total = 0.0
+            for _ in range(lines):
+                total += prices[rng.randrange(PRODUCTS)] * rng.choice((1, 2, 0.5, 1.25))
+            total = round(total, 2)
+            expected[bill_id] = round(total * 100)
+            customer = rng.randrange(1, CUSTOMERS + 1) if bill_id % 3 == 0 else None
+            method = 'Debt' if customer and bill_id % 2 else 'Cash'
+            stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(START + bill_id * 30))
+            yield (bill_id, f"BILL-{bill_id:08d}", customer, stamp, total, 0.0, 0.0, 0.0, total,
+                   method, 'UNPAID' if method == 'Debt' else 'PAID')
+
+    conn.executemany("INSERT INTO bills VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", bill_rows())
+    rng_items = random.Random(seed + 1)
+    conn.executemany(
+        "INSERT INTO bill_items (bill_id, product_id, product_name, quantity, unit, price, total) "
+        "VALUES (?, ?, ?, 1.0, 'kg', ?, ?)",
+        ((bill_id, p + 1, f"Product {p + 1}", prices[p], prices[p])
+         for bill_id in range(1, bills + 1) for p in (rng_items.randrange(PRODUCTS) for _ in range(lines))))
+    conn.commit()
+    conn.close()
+    return expected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bills', type=int, default=1_000_000)
+    parser.add_argument('--lines', type=int, default=1, help="lines per bill")
+    args = parser.parse_args()
+
+    import app.db as db
+    from app import migrations
+
+    timings = []
+
+    def timed(version, migrate):
+        def run(conn):
+            start = time.perf_counter()
+            migrate(conn)
+            timings.append((version, time.perf_counter() - start))
+        return run
+
+    migrations.MIGRATIONS[:] = [(v, d, timed(v, f)) for v, d, f in migrations.MIGRATIONS]
+
+    workdir = tempfile.mkdtemp(prefix='migrate_large_db_')
+    try:
+        path = os.path.join(workdir, 'thangam.db')
+        start = time.perf_counter()
+        seed_baseline(path, args.bills, args.lines)
+        print(f"seeded {args.bills} bills x {args.lines} line(s) in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(path) / 2**20:.0f} MiB")
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        db.use_database(path)
+        start = time.perf_counter()
+        db.init_db()
+        elapsed = time.perf_counter() - start
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        db.engine.dispose()
+
+        descriptions = {v: d for v, d, _ in migrations.MIGRATIONS}
+        for version, seconds in timings:
+            print(f"  migration {version}: {seconds:7.2f}s  {descriptions[version]}")
+        print(f"upgrade {elapsed:.1f}s, peak RSS +{(rss_after - rss_before) / 1024:.0f} MiB, "
+              f"file {os.path.getsize(path) / 2**20:.0f} MiB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
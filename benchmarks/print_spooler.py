@@ -0,0 +1,125 @@
+"""Enqueue-to-print latency of the PrintSpooler with a Dummy printer.
+
+    python benchmarks/print_spooler.py [--receipts 500] [--lines 10]
+
+Runs a real PrintSpooler, JobStore and PrinterManager on a temp directory,
+with printer_type 'Dummy' so receipts are rendered and sent but go nowhere.
+Every receipt has its own bill number, so none comes from the render cache.
+
+- one at a time: each receipt is enqueued once the previous one printed, as
+  at a counter
+- burst: all receipts enqueued back to back, as when a printer comes back
+  with a backlog
+
+Prints how long enqueue() kept the caller waiting and the time from
+enqueue() to the job's DONE signal.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import Qt  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.models import SettingsModel  # noqa: E402
+from app.print_spooler import DONE, JobStore, PrintSpooler  # noqa: E402
+from app.printer import PrinterManager  # noqa: E402
+
+
+def receipt(n, lines):
+    items = [{'product_id': i + 1, 'product_name': f'Product {i + 1}', 'quantity': 1.5, 'unit': 'kg',
+              'price': 6000 + i, 'total': 9000 + i} for i in range(lines)]
+    total = sum(item['total'] for item in items)
+    bill_data = {'bill_number': f'BILL-{n:06d}', 'date_time': '2026-06-01 12:00:00',
+                 'customer_name': 'Walk-in Customer', 'customer_phone': '', 'subtotal': total,
+                 'discount_amount': 0, 'tax_percent': 0, 'tax_amount': 0, 'grand_total': total,
+                 'payment_method': 'Cash'}
+    return bill_data, items
+
+
+class Timings:
+    """Enqueue and DONE times per job id, filled from the spooler thread"""
+
+    def __init__(self):
+        self.enqueued = {}
+        self.done = {}
+        self.printed = threading.Condition()
+
+    def on_job_changed(self, job_id, state):
+        if state == DONE:
+            with self.printed:
+                self.done[job_id] = time.perf_counter()
+                self.printed.notify_all()
+
+    def wait_for(self, count):
+        with self.printed:
+            self.printed.wait_for(lambda: len(self.done) >= count, timeout=60)
+
+    def latencies(self):
+        return [(self.done[job_id] - start) * 1000 for job_id, start in self.enqueued.items()]
+
+
+def run(spooler, receipts, lines, burst, first):
+    timings = Timings()
+    spooler.jobChanged.connect(timings.on_job_changed, Qt.ConnectionType.DirectConnection)
+    calls = []
+    for n in range(first, first + receipts):
+        bill_data, items = receipt(n, lines)
+        start = time.perf_counter()
+        job_id = spooler.enqueue(bill_data, items)
+        calls.append((time.perf_counter() - start) * 1000)
+        timings.enqueued[job_id] = start
+        if not burst:
+            timings.wait_for(len(timings.enqueued))
+    timings.wait_for(receipts)
+    spooler.jobChanged.disconnect(timings.on_job_changed)
+    return calls, timings.latencies()
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--receipts', type=int, default=500)
+    parser.add_argument('--lines', type=int, default=10, help="lines per receipt")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # a log line per print would bury the table
+    workdir = tempfile.mkdtemp(prefix='print_spooler_')
+    try:
+        db.use_database(os.path.join(workdir, 'thangam.db'))
+        db.init_db()
+        SettingsModel.set_setting('printer_type', 'Dummy')
+        spooler = PrintSpooler(PrinterManager(), store=JobStore(os.path.join(workdir, 'print_queue.log'), None))
+        spooler.start()
+
+        header = (f"{'mode':<14} {'receipts':>8}  {'enqueue p50':>11} {'p95 ms':>7}  "
+                  f"{'to print p50':>12} {'p95 ms':>7} {'max ms':>7}")
+        print(f"{args.lines} lines per receipt")
+        print(header)
+        print('-' * len(header))
+        first = 0
+        for mode, burst in (('one at a time', False), ('burst', True)):
+            calls, latencies = run(spooler, args.receipts, args.lines, burst, first)
+            first += args.receipts
+            print(f"{mode:<14} {args.receipts:>8}  {percentile(calls, 50):>11.3f} {percentile(calls, 95):>7.3f}  "
+                  f"{percentile(latencies, 50):>12.2f} {percentile(latencies, 95):>7.2f} {max(latencies):>7.2f}")
+        spooler.stop(timeout=10)
+        spooler.store.close()
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Keystroke latency of the Manage Products search box.
+
+    python benchmarks/product_dialog_search.py [--products 50000]
+
+Opens ManageProductsDialog offscreen over a catalog of --products products and
+types into its search bar one key at a time, the way a cashier does. Each
+keystroke is timed from the key press until search_products has filtered the
+table and the view has repainted. Inputs are a product name, a barcode, a
+name with a typo (nothing contains it, so the fuzzy index answers; its first
+use builds the index) and backspacing a query away again.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import Qt  # noqa: E402
+from PyQt6.QtTest import QTest  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.ui_products import ManageProductsDialog  # noqa: E402
+
+WORDS = ['rice', 'dal', 'oil', 'salt', 'sugar', 'tea', 'coffee', 'soap', 'atta', 'ghee', 'masala',
+         'biscuit', 'milk', 'curd', 'paneer', 'jeera', 'mustard', 'chilli', 'turmeric', 'pepper']
+BRANDS = ['Aachi', 'Sakthi', 'Tata', 'Aashirvaad', 'Gold Winner', 'Everest', 'Britannia', 'Amul',
+          'Nandini', 'Ponni', 'Udhaiyam', 'Idhayam']
+
+
+def seed(count, rng):
+    """Inserts count products, returns one of their names and one barcode to type"""
+    rows = [{'id': i, 'name': f"{rng.choice(BRANDS)} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+             'code': f"89{rng.randrange(10**10):010d}", 'price': rng.randrange(100, 100000)}
+            for i in range(1, count + 1)]
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO products (id, name, code, base_unit, price_per_unit, category) "
+            "VALUES (:id, :name, :code, 'kg', :price, 'Grocery')"
+        ), rows)
+    sample = rng.choice(rows)
+    return sample['name'], sample['code']
+
+
+def swap_typo(name):
+    """name with two neighbouring letters of its longest word swapped, so no name contains it"""
+    words = name.lower().split()
+    word = max(words, key=len)
+    i = next(i for i in range(1, len(word) - 1) if word[i] != word[i + 1])
+    words[words.index(word)] = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return ' '.join(words)
+
+
+def keystroke(dialog, key):
+    """key: a character or a Qt.Key"""
+    start = time.perf_counter()
+    QTest.keyClick(dialog.search_bar, key)
+    QApplication.processEvents()  # let the table lay out and paint the new rows
+    return (time.perf_counter() - start) * 1000
+
+
+def type_text(dialog, typed):
+    return [keystroke(dialog, char) for char in typed]
+
+
+def backspace(dialog):
+    return [keystroke(dialog, Qt.Key.Key_Backspace) for _ in dialog.search_bar.text()]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=50_000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    qt_app = QApplication.instance() or QApplication([])  # noqa: F841 - the dialog needs one
+    workdir = tempfile.mkdtemp(prefix='product_dialog_search_')
+    try:
+        db.use_database(os.path.join(workdir, 'thangam.db'))
+        db.init_db()
+        name, code = seed(args.products, random.Random(args.seed))
+        typo = swap_typo(name)
+
+        start = time.perf_counter()
+        dialog = ManageProductsDialog()
+        dialog.show()
+        QApplication.processEvents()
+        print(f"{args.products} products, dialog open in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        header = f"{'input':<34} {'keys':>4} {'first ms':>9} {'p50 ms':>7} {'p95 ms':>7} {'max ms':>7} {'rows':>6}"
+        print(header)
+        print('-' * len(header))
+        runs = [
+            (f"name '{name}'", lambda: type_text(dialog, name)),
+            ("clear it", lambda: backspace(dialog)),
+            (f"barcode {code}", lambda: type_text(dialog, code)),
+            ("clear it", lambda: backspace(dialog)),
+            (f"typo '{typo}'", lambda: type_text(dialog, typo)),
+            ("clear it", lambda: backspace(dialog)),
+        ]
+        for label, run in runs:
+            times = run()
+            print(f"{label[:34]:<34} {len(times):>4} {times[0]:>9.2f} {percentile(times, 50):>7.2f} "
+                  f"{percentile(times, 95):>7.2f} {max(times):>7.2f} {dialog.model.rowCount():>6}")
+        dialog.close()
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Scans per second of ProductIndex.find against the linear scan it replaced.
+
+    python benchmarks/product_index.py [--products 30000] [--queries 2000]
+
+The old MainWindow.add_product_to_cart_manual walked the list of product dicts
+twice per scan: once for an exact code or name, then for a substring of name
+or code. Both are timed on the same synthetic catalog for each kind of input:
+barcode scans, typed full names, name prefixes, text from the middle of a
+name, and text that matches nothing.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.catalog import ProductIndex  # noqa: E402
+from app.records import ProductRecord  # noqa: E402
+
+WORDS = ['rice', 'dal', 'oil', 'salt', 'sugar', 'tea', 'coffee', 'soap', 'atta', 'ghee', 'masala',
+         'biscuit', 'milk', 'curd', 'paneer', 'jeera', 'mustard', 'chilli', 'turmeric', 'pepper']
+BRANDS = ['Aachi', 'Sakthi', 'Tata', 'Aashirvaad', 'Gold Winner', 'Everest', 'Britannia', 'Amul',
+          'Nandini', 'Ponni', 'Udhaiyam', 'Idhayam']
+CATEGORIES = ['Grocery', 'Dairy', 'Spices', 'Household', 'Snacks']
+
+
+def catalog(count, seed=1):
+    rng = random.Random(seed)
+    products = []
+    for i in range(1, count + 1):
+        name = f"{rng.choice(BRANDS)} {rng.choice(WORDS).title()} {rng.choice(WORDS).title()} {i}"
+        products.append(ProductRecord(i, name, f"89{rng.randrange(10**10):010d}{i % 10}",
+                                      rng.choice(['kg', 'g', 'pcs', 'litre']),
+                                      rng.randrange(100, 100000), rng.choice(CATEGORIES)))
+    return products
+
+
+def linear_find(products, text):
+    # MainWindow.add_product_to_cart_manual before ProductIndex
+    for p in products:
+        if p['code'] == text or p['name'].lower() == text.lower():
+            return p
+    for p in products:
+        if text.lower() in p['name'].lower() or text.lower() in p['code'].lower():
+            return p
+    return None
+
+
+def queries(products, kind, count, seed=2):
+    rng = random.Random(seed)
+    picks = [rng.choice(products) for _ in range(count)]
+    if kind == 'barcode':
+        return [p['code'] for p in picks]
+    if kind == 'full name':
+        return [p['name'].upper() for p in picks]
+    if kind == 'prefix':
+        return [p['name'][:rng.randint(4, 10)].lower() for p in picks]
+    if kind == 'middle of name':
+        return [p['name'].split(' ', 1)[1][:8] for p in picks]
+    return [f"nothing {n}" for n in range(count)]
+
+
+def scans_per_second(find, texts):
+    start = time.perf_counter()
+    for text in texts:
+        find(text)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--products', type=int, default=30000)
+    parser.add_argument('--queries', type=int, default=2000, help="scans timed per kind of input")
+    args = parser.parse_args()
+
+    records = catalog(args.products)
+    products = [record.to_dict() for record in records]  # what the old window held
+    start = time.perf_counter()
+    index = ProductIndex(records)
+    print(f"{args.products} products, index built in {(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"{'input':<16}{'linear scans/s':>16}{'index scans/s':>15}{'speedup':>9}")
+    for kind in ('barcode', 'full name', 'prefix', 'middle of name', 'no match'):
+        texts = queries(records, kind, args.queries)
+        for text in texts[:50]:
+            found, expected = index.find(text), linear_find(products, text)
+            if kind in ('barcode', 'full name', 'no match'):
+                assert (found and found['id']) == (expected and expected['id']), text
+        # The linear scan is slow enough that a tenth of the queries gives a stable rate
+        linear = scans_per_second(lambda t: linear_find(products, t), texts[:max(args.queries // 10, 1)])
+        indexed = scans_per_second(index.find, texts)
+        print(f"{kind:<16}{linear:>16,.0f}{indexed:>15,.0f}{indexed / linear:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Time and memory of listing reads: ORM objects + to_dict against records.
+
+    python benchmarks/record_reads.py [--rows 100000] [--runs 3]
+
+Fills a database with --rows products and --rows bills (every third bill has a
+customer), then lists all of them both ways:
+
+- orm + to_dict: session.query(Model).all() and a to_dict() copy of each
+  object, as the DAO reads did before app/records.py
+- records: ProductModel.get_all_products() and BillModel.get_bills_in_range(),
+  which select only the record columns and build named tuples from the rows
+
+Prints the best time of --runs runs, then, in a separate traced run, the
+memory the returned list keeps and the peak while building it.
+"""
+import argparse
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.db import session_scope  # noqa: E402
+from app.models import BillModel, ProductModel  # noqa: E402
+from app.orm_models import Bill, Product  # noqa: E402
+
+CUSTOMERS = 5000
+START = 1704067200  # 2024-01-01
+END = 2**31
+
+
+def seed(rows):
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO products (id, name, code, base_unit, price_per_unit, category) "
+            "VALUES (:id, :name, :code, 'kg', :price, 'Grocery')"
+        ), [{'id': i, 'name': f'Product {i}', 'code': f'P{i:06d}', 'price': 1000 + i} for i in range(1, rows + 1)])
+        conn.execute(text("INSERT INTO customers (id, name, phone, address) VALUES (:id, :name, :phone, '')"),
+                     [{'id': i, 'name': f'Customer {i}', 'phone': f'9{i:09d}'} for i in range(1, CUSTOMERS + 1)])
+        conn.execute(text(
+            "INSERT INTO bills (id, bill_number, customer_id, date_time, date_ts, subtotal, tax_percent, "
+            "tax_amount, discount_amount, grand_total, payment_method, status) "
+            "VALUES (:id, :number, :customer, :stamp, :ts, :total, 0, 0, 0, :total, 'Cash', 'PAID')"
+        ), [{'id': i, 'number': f'BILL-{i:08d}', 'customer': i % CUSTOMERS + 1 if i % 3 == 0 else None,
+             'stamp': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(START + i * 30)), 'ts': START + i * 30,
+             'total': 1000 + i} for i in range(1, rows + 1)])
+
+
+def orm_products():
+    with session_scope() as session:
+        return [p.to_dict() for p in session.query(Product).all()]
+
+
+def orm_bills():
+    # to_dict reads bill.customer, a lazy load per customer not yet in the session
+    with session_scope() as session:
+        return [b.to_dict() for b in session.query(Bill).order_by(Bill.date_ts, Bill.id).all()]
+
+
+def best_time(read, runs):
+    best = None
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        result = read()
+        elapsed = time.perf_counter() - start
+        del result
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def traced(read):
+    """(bytes kept by the result, peak bytes while reading)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = read()
+        gc.collect()
+        kept, peak = tracemalloc.get_traced_memory()
+        del result
+        return kept - before, peak - before
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--runs', type=int, default=3, help="timed runs per read, the best is shown")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='record_reads_')
+    try:
+        db.use_database(os.path.join(workdir, 'thangam.db'))
+        db.init_db()
+        seed(args.rows)
+
+        reads = [
+            ('products', 'orm + to_dict', orm_products),
+            ('products', 'records', ProductModel.get_all_products),
+            ('bills', 'orm + to_dict', orm_bills),
+            ('bills', 'records', lambda: BillModel.get_bills_in_range(0, END)),
+        ]
+        header = f"{'listing':<9} {'read path':<14} {'rows':>7} {'ms':>8} {'kept MiB':>9} {'peak MiB':>9}"
+        print(header)
+        print('-' * len(header))
+        for listing, path, read in reads:
+            rows = len(read())
+            seconds = best_time(read, args.runs)
+            kept, peak = traced(read)
+            print(f"{listing:<9} {path:<14} {rows:>7} {seconds * 1000:>8.0f} "
+                  f"{kept / 2**20:>9.1f} {peak / 2**20:>9.1f}")
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Commit latency and reader/writer concurrency for each storage profile.
+
+    python benchmarks/storage_profiles.py [--bills 50000] [--commits 300] [--seconds 5]
+
+Every profile runs on a fresh copy of the same seeded database in a temp
+directory, through BillModel.create_bill and BillModel.get_bills_in_range, so
+the pragmas are the ones app.db applies to real connections. 'Before' is
+SQLite's own defaults, what every connection got before storage profiles.
+
+Two measurements per profile:
+- commit latency: bills with 10 lines committed one after another
+- concurrency: the same commits while another thread keeps loading the full
+  sales report; commit latency under load, commits that failed with "database
+  is locked", and how many reports the reader finished
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.models import BillModel, SettingsModel  # noqa: E402
+
+# SQLite's defaults: rollback journal, full sync, no busy wait
+db.STORAGE_PROFILES['Before'] = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'cache_size': -2000,
+    'mmap_size': 0,
+    'temp_store': 'DEFAULT',
+    'busy_timeout': 0,
+    'foreign_keys': 'OFF',
+}
+PROFILES = ['Before', 'Safe', 'Balanced', 'Fast']
+LINES_PER_BILL = 10
+DAY = 86400
+START_TS = 1767225600  # 2026-01-01
+
+
+def seed(path, bills):
+    db.use_database(path)
+    db.apply_storage_profile('Balanced')
+    db.init_db()
+    with db.engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO products (id, name, code, base_unit, price_per_unit, category) "
+            "VALUES (1, 'Rice', 'R1', 'kg', 6000, 'Grocery')"
+        ))
+        conn.execute(text(
+            "INSERT INTO bills (id, bill_number, date_time, date_ts, subtotal, tax_percent, tax_amount, "
+            "discount_amount, grand_total, payment_method, status) "
+            "VALUES (:id, :n, :dt, :ts, 60000, 0, 0, 0, 60000, 'Cash', 'PAID')"
+        ), [{'id': i, 'n': f'SEED-{i}', 'ts': START_TS + i * 60,
+             'dt': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(START_TS + i * 60))}
+            for i in range(1, bills + 1)])
+        conn.execute(text(
+            "INSERT INTO bill_items (bill_id, product_id, product_name, quantity, unit, price, total) "
+            "VALUES (:b, 1, 'Rice', 1, 'kg', 6000, 6000)"
+        ), [{'b': i} for i in range(1, bills + 1) for _ in range(LINES_PER_BILL)])
+    db.engine.dispose()
+
+
+def new_bill(tag, n):
+    bill = {
+        'bill_number': f'{tag}-{n}-{time.perf_counter_ns()}',
+        'date_time': '2026-06-01 12:00:00',
+        'subtotal': 60000, 'grand_total': 60000, 'payment_method': 'Cash',
+    }
+    items = [{'product_id': 1, 'product_name': 'Rice', 'quantity': 1, 'unit': 'kg',
+              'price': 6000, 'total': 6000}] * LINES_PER_BILL
+    return bill, items
+
+
+def timed_commits(tag, count=None, until=None):
+    latencies, errors = [], 0
+    n = 0
+    while (count is not None and n < count) or (until is not None and time.monotonic() < until):
+        bill, items = new_bill(tag, n)
+        start = time.perf_counter()
+        try:
+            BillModel.create_bill(bill, items)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            if 'locked' not in str(e):
+                raise
+            errors += 1
+        n += 1
+    return latencies, errors
+
+
+def percentile(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run_profile(name, seeded, workdir, commits, seconds):
+    path = os.path.join(workdir, f'{name}.db')
+    shutil.copy(seeded, path)
+    db.use_database(path)
+    db.apply_storage_profile(name)
+    SettingsModel.invalidate_cache()
+
+    latencies, _ = timed_commits(name, count=commits)
+
+    stop = threading.Event()
+    reports = [0]
+
+    def reader():
+        while not stop.is_set():
+            try:
+                BillModel.get_bills_in_range(START_TS, START_TS + 365 * DAY)
+                reports[0] += 1
+            except Exception as e:
+                if 'locked' not in str(e):
+                    raise
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    loaded, errors = timed_commits(name, until=time.monotonic() + seconds)
+    stop.set()
+    thread.join()
+    db.engine.dispose()
+    return {
+        'p50': statistics.median(latencies), 'p99': percentile(latencies, 0.99),
+        'load_p50': percentile(loaded, 0.5), 'load_p99': percentile(loaded, 0.99),
+        'load_max': max(loaded, default=float('nan')),
+        'commits': len(loaded), 'locked': errors, 'reports': reports[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bills', type=int, default=50000, help="bills in the seeded database")
+    parser.add_argument('--commits', type=int, default=300, help="commits timed without a reader")
+    parser.add_argument('--seconds', type=float, default=5, help="length of the concurrent run")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='storage_profiles_')
+    try:
+        seeded = os.path.join(workdir, 'seed.db')
+        seed(seeded, args.bills)
+        print(f"{args.bills} bills x {LINES_PER_BILL} lines, {args.seconds:g}s concurrent run, times in ms")
+        print(f"{'profile':<10}{'commit p50':>11}{'p99':>8}{'| loaded p50':>13}{'p99':>8}{'max':>8}"
+              f"{'commits':>9}{'locked':>8}{'reports':>9}")
+        for name in PROFILES:
+            r = run_profile(name, seeded, workdir, args.commits, args.seconds)
+            print(f"{name:<10}{r['p50']:>11.2f}{r['p99']:>8.2f}{'|':>3}{r['load_p50']:>10.2f}"
+                  f"{r['load_p99']:>8.2f}{r['load_max']:>8.1f}{r['commits']:>9}{r['locked']:>8}{r['reports']:>9}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Transactions per UI action, with and without unit_of_work.
+
+    python benchmarks/unit_of_work.py [--debt-bills 50] [--runs 20]
+
+Counts BEGINs with an engine 'begin' listener while each action runs its DAO
+calls on a fresh database in a temp directory, once call by call as before
+unit_of_work and once inside 'with unit_of_work():'. The settings cache is
+dropped before every run, so reads that hit the database are counted too.
+
+- mark all paid: a customer's debt bills listed, then each one marked paid
+- settings save: every setting of the settings dialog written one key at a time
+- preview + print: the bill preview dialog opened and the receipt printed to a
+  Dummy printer
+"""
+import argparse
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from escpos.printer import Dummy  # noqa: E402
+from PyQt6.QtWidgets import QApplication  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+import app.db as db  # noqa: E402
+from app.db import unit_of_work  # noqa: E402
+from app.models import BillModel, CustomerModel, ProductModel, SettingsModel  # noqa: E402
+from app.printer import PrinterConnection, PrinterManager  # noqa: E402
+from app.ui_preview import BillPreviewDialog  # noqa: E402
+
+# The keys SettingsDialog.save_settings writes
+SETTINGS = {
+    'store_name': 'Thangam Stores', 'store_address': '12 Main Road', 'store_phone': '0441234567',
+    'tax_percent': '5', 'grand_total_rounding': '1.00', 'printer_type': 'Dummy',
+    'windows_printer_name': '', 'printer_usb_vid': '', 'printer_usb_pid': '',
+    'printer_serial_port': 'COM1', 'printer_ip': '192.168.1.100', 'paper_size': '80mm (48 chars)',
+    'chars_per_line': '48', 'receipt_font_size': 'Normal', 'line_spacing': 'Normal',
+    'cash_drawer_kick': 'false', 'smtp_server': '', 'smtp_port': '', 'smtp_user': '', 'smtp_pass': '',
+    'theme': 'Light', 'storage_profile': 'Balanced', 'scanner_type': 'USB HID (Keyboard Mode)',
+    'scanner_com_port': 'COM3', 'scanner_baud_rate': '9600', 'scanner_prefix': '',
+    'scanner_suffix': 'Enter (\\r)', 'scanner_timeout': '50', 'scanner_auto_focus': 'true',
+    'scanner_beep': 'true', 'scanner_auto_search': 'true', 'cart_merge_lines': 'true',
+}
+
+
+class PrintNow:
+    """Stands in for the print spooler: prints the receipt straight away"""
+
+    def __init__(self):
+        self.printer_manager = PrinterManager()
+        self.printer_manager.connection = PrinterConnection(Dummy)
+
+    def enqueue(self, bill_data, items):
+        self.printer_manager.print_receipt(bill_data, items)
+
+
+def seed(debt_bills):
+    product_id = ProductModel.add_product('Rice', 'R1', 'kg', 6000)
+    customer_id = CustomerModel.add_customer('Ravi', '9876543210', 'Chennai')
+    items = [{'product_id': product_id, 'product_name': 'Rice', 'quantity': 1, 'unit': 'kg',
+              'price': 6000, 'total': 6000}] * 5
+    for n in range(debt_bills):
+        BillModel.create_bill({'bill_number': f'DEBT-{n}', 'customer_id': customer_id,
+                               'date_time': '2026-01-01 10:00:00', 'subtotal': 30000,
+                               'grand_total': 30000, 'payment_method': 'Debt'}, items)
+    BillModel.create_bill({'bill_number': 'PRINT-1', 'date_time': '2026-01-01 11:00:00',
+                           'subtotal': 30000, 'grand_total': 30000, 'payment_method': 'Cash'}, items)
+    return customer_id
+
+
+def mark_all_paid(customer_id):
+    for bill in BillModel.get_customer_debt_bills(customer_id):
+        BillModel.mark_bill_as_paid(bill['id'])
+
+
+def save_settings():
+    for key, value in SETTINGS.items():
+        SettingsModel.set_setting(key, value)
+
+
+def preview_and_print(spooler):
+    bill = BillModel.get_bill_by_number('PRINT-1', with_items=True)
+    bill_data = bill.to_dict()
+    bill_data['customer_name'] = 'Walk-in'
+    dialog = BillPreviewDialog(None, bill_data, [item.to_dict() for item in bill['items']], spooler)
+    dialog.print_bill()
+    dialog.deleteLater()
+
+
+def measure(action, grouped):
+    begins = [0]
+
+    def count(conn):
+        begins[0] += 1
+
+    SettingsModel.invalidate_cache()
+    event.listen(db.engine, 'begin', count)
+    start = time.perf_counter()
+    try:
+        if grouped:
+            with unit_of_work():
+                action()
+        else:
+            action()
+    finally:
+        event.remove(db.engine, 'begin', count)
+    return begins[0], (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--debt-bills', type=int, default=50, help="unpaid bills of the customer")
+    parser.add_argument('--runs', type=int, default=20, help="timed runs per action")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)  # a log line per print would bury the table
+    qt_app = QApplication.instance() or QApplication([])  # noqa: F841 - the dialogs need one
+    workdir = tempfile.mkdtemp(prefix='unit_of_work_')
+    try:
+        db.use_database(os.path.join(workdir, 'thangam.db'))
+        db.init_db()
+        customer_id = seed(args.debt_bills)
+        spooler = PrintNow()
+
+        def reset_debts():
+            # Back to unpaid, so every run of mark all paid has the same work
+            with db.engine.begin() as conn:
+                conn.exec_driver_sql("UPDATE bills SET status = 'UNPAID' WHERE payment_method = 'Debt'")
+
+        actions = [
+            ('mark all paid', lambda: mark_all_paid(customer_id), reset_debts),
+            ('settings save', save_settings, None),
+            ('preview + print', lambda: preview_and_print(spooler), None),
+        ]
+        print(f"{args.debt_bills} debt bills, median of {args.runs} runs, times in ms")
+        print(f"{'action':<18}{'transactions':>13}{'in a unit':>11}{'| ms':>8}{'in a unit':>11}")
+        for name, action, reset in actions:
+            results = {}
+            for grouped in (False, True):
+                counts, times = [], []
+                for _ in range(args.runs):
+                    if reset:
+                        reset()
+                    begins, elapsed = measure(action, grouped)
+                    counts.append(begins)
+                    times.append(elapsed)
+                results[grouped] = (max(counts), statistics.median(times))
+            print(f"{name:<18}{results[False][0]:>13}{results[True][0]:>11}{'|':>3}"
+                  f"{results[False][1]:>5.1f}{results[True][1]:>11.1f}")
+        db.engine.dispose()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import app.db as db  # noqa: E402
+from app import catalog  # noqa: E402
+from app.models import SettingsModel  # noqa: E402
+
+
+@pytest.fixture
+def database(tmp_path):
+    """A fresh, fully migrated database for the test; yields its path"""
+    path = str(tmp_path / 'thangam.db')
+    db.use_database(path)
+    SettingsModel.invalidate_cache()
+    catalog._shared.clear()
+    db.init_db()
+    yield path
+    db.engine.dispose()
+    SettingsModel.invalidate_cache()
+    catalog._shared.clear()
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, text
+
+import app.db as db
+from app.models import BillModel
+
+START_TS = 1767225600  # 2026-01-01
+LINES = 3
+
+
+def seed(bills):
+    with db.engine.begin() as conn:
+        conn.execute(text("INSERT INTO customers (id, name, phone, address) VALUES (1, 'Ravi', '999', '')"))
+        conn.execute(text(
+            "INSERT INTO products (id, name, code, base_unit, price_per_unit, category) "
+            "VALUES (1, 'Rice', 'R1', 'kg', 6000, 'Grocery')"
+        ))
+        conn.execute(text(
+            "INSERT INTO bills (id, bill_number, customer_id, date_time, date_ts, subtotal, tax_percent, "
+            "tax_amount, discount_amount, grand_total, payment_method, status) "
+            "VALUES (:id, :n, :c, '2026-01-01 00:00:00', :ts, 18000, 0, 0, 0, 18000, :m, :s)"
+        ), [{'id': i, 'n': f'B-{i}', 'ts': START_TS + i, 'c': 1 if i % 2 else None,
+             'm': 'Debt' if i % 2 else 'Cash', 's': 'UNPAID' if i % 2 else 'PAID'}
+            for i in range(1, bills + 1)])
+        conn.execute(text(
+            "INSERT INTO bill_items (bill_id, product_id, product_name, quantity, unit, price, total) "
+            "VALUES (:b, 1, 'Rice', 1, 'kg', 6000, 6000)"
+        ), [{'b': i} for i in range(1, bills + 1) for _ in range(LINES)])
+
+
+@contextmanager
+def count_selects():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+
+def selects_for(call):
+    with count_selects() as statements:
+        result = call()
+    return len(statements), result
+
+
+@pytest.mark.parametrize('bills', [10, 450, 1200])
+def test_listings_without_items_take_one_query(database, bills):
+    seed(bills)
+    end = START_TS + bills + 1
+    count, rows = selects_for(lambda: BillModel.get_bills_in_range(START_TS, end))
+    assert (count, len(rows)) == (1, bills)
+    count, rows = selects_for(lambda: BillModel.get_debt_bills())
+    assert (count, len(rows)) == (1, (bills + 1) // 2)
+    assert all(row.customer_name == 'Ravi' for row in rows)
+
+
+@pytest.mark.parametrize('bills, item_queries', [(10, 1), (450, 1), (1200, 3)])
+def test_items_take_one_query_per_batch(database, bills, item_queries):
+    seed(bills)
+    count, rows = selects_for(lambda: BillModel.get_bills_in_range(START_TS, START_TS + bills + 1,
+                                                                   with_items=True))
+    assert count == 1 + item_queries
+    assert all(len(row['items']) == LINES for row in rows)
+
+
+def test_report_pages_take_one_query_each(database):
+    seed(1200)
+    after, pages, counts = None, 0, set()
+    while True:
+        count, page = selects_for(lambda: BillModel.get_report_page(START_TS, START_TS + 2000,
+                                                                    after=after, limit=100))
+        counts.add(count)
+        if not page:
+            break
+        pages += 1
+        after = (page[-1].date_ts, page[-1].id)
+    assert pages == 12
+    assert counts == {1}
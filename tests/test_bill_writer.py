@@ -0,0 +1,186 @@
+"""Crash consistency of the write-behind bill journal. The crash tests run a
+child process that is killed with os._exit at each step of saving a bill,
+then start a new writer on what it left behind."""
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+import app.bill_writer as bill_writer
+import app.db as db
+from app.bill_writer import BillJournal, BillWriter
+from app.models import BillModel, ProductModel
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, os, sys
+import app.db as db
+from app.bill_writer import BillJournal, BillWriter
+
+path, directory, stage, bill = sys.argv[1:]
+bill = json.loads(bill)
+db.use_database(path)
+journal = BillJournal(directory)
+writer = BillWriter(journal=journal)
+if stage == 'before_rename':
+    os.replace = lambda *args: os._exit(9)
+elif stage == 'after_commit':
+    journal.remove = lambda name: os._exit(9)
+if stage != 'after_journal':
+    writer.start()
+writer.submit(bill['bill_data'], bill['items'])
+if stage == 'after_journal':
+    os._exit(9)
+writer.wait_idle()
+os._exit(0)
+"""
+
+
+@pytest.fixture
+def product(database):
+    return ProductModel.add_product('Rice', 'R1', 'kg', 6000)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return BillJournal(str(tmp_path / 'pending_bills'))
+
+
+def bill(number, product_id, **changes):
+    bill_data = {'bill_number': number, 'date_time': '2026-01-01 10:00:00', 'subtotal': 12000,
+                 'grand_total': 12000, 'payment_method': 'Cash'}
+    bill_data.update(changes)
+    return bill_data, [{'product_id': product_id, 'product_name': 'Rice', 'quantity': 2, 'unit': 'kg',
+                        'price': 6000, 'total': 12000}]
+
+
+def saved_count(number):
+    with db.engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM bills WHERE bill_number = :n"), {'n': number}).scalar()
+
+
+def drain(writer, timeout=10):
+    # wait_idle() has no timeout, and a writer retrying forever is what some tests look for
+    done = threading.Event()
+    threading.Thread(target=lambda: (writer.wait_idle(), done.set()), daemon=True).start()
+    assert done.wait(timeout), "writer did not finish the queued bills"
+    writer.stop()
+
+
+def recover(journal):
+    writer = BillWriter(journal=BillJournal(journal.directory))
+    writer.start()
+    drain(writer)
+    return writer
+
+
+@pytest.mark.parametrize('stage, saved', [
+    ('before_rename', 0),  # submit() never returned, the cashier was not told it was saved
+    ('after_journal', 1),  # durable in the journal, not committed yet
+    ('after_commit', 1),   # committed, the journal entry not deleted yet
+    ('finished', 1),
+])
+def test_killed_writer_saves_each_bill_once(database, product, journal, stage, saved):
+    bill_data, items = bill('B-1', product)
+    child = subprocess.run(
+        [sys.executable, '-c', CHILD, database, journal.directory, stage,
+         json.dumps({'bill_data': bill_data, 'items': items})],
+        cwd=REPO, env={**os.environ, 'PYTHONPATH': REPO}, capture_output=True, text=True, timeout=60,
+    )
+    assert child.returncode == (0 if stage == 'finished' else 9), child.stderr
+
+    recover(journal)
+    assert saved_count('B-1') == saved
+    assert os.listdir(journal.directory) == ['failed']
+    assert os.listdir(journal.failed_directory) == []
+
+
+def test_failed_bill_does_not_block_later_bills(database, product, journal):
+    writer = BillWriter(journal=journal)
+    writer.start()
+    writer.submit(*bill('B-1', product))
+    writer.submit(*bill('B-2', product + 1))  # unknown product, foreign key error
+    writer.submit(*bill('B-3', product, grand_total=None))  # NOT NULL error
+    writer.submit(*bill('B-4', product))
+    drain(writer)
+
+    assert [saved_count(n) for n in ('B-1', 'B-2', 'B-3', 'B-4')] == [1, 0, 0, 1]
+    assert journal.pending() == []
+    failed = sorted(os.listdir(journal.failed_directory))
+    assert len(failed) == 2
+    assert [json.load(open(os.path.join(journal.failed_directory, name)))['bill_data']['bill_number']
+            for name in failed] == ['B-2', 'B-3']
+
+
+def test_unexpected_error_fails_instead_of_retrying(database, product, journal):
+    bill_data, items = bill('B-1', product)
+    del bill_data['grand_total']  # create_bill raises KeyError
+    writer = BillWriter(journal=journal)
+    writer.start()
+    writer.submit(bill_data, items)
+    writer.submit(*bill('B-2', product))
+    drain(writer)
+
+    assert saved_count('B-2') == 1
+    assert len(os.listdir(journal.failed_directory)) == 1
+
+
+def test_unreadable_entry_is_moved_aside(database, product, journal):
+    with open(os.path.join(journal.directory, f"{1:020d}.json"), 'w') as f:
+        f.write('{"bill_data": {"bill_number": ')
+    journal.append(*bill('B-1', product))
+    recover(journal)
+    assert saved_count('B-1') == 1
+    assert os.listdir(journal.failed_directory) == [f"{1:020d}.json"]
+
+
+def test_operational_errors_are_retried(database, product, journal, monkeypatch):
+    monkeypatch.setattr(bill_writer, 'RETRY_DELAYS', (0.01,))
+    real_create = BillModel.create_bill
+    calls = []
+
+    def flaky_create(bill_data, items):
+        calls.append(bill_data['bill_number'])
+        if len(calls) <= 2:
+            raise OperationalError('INSERT', {}, Exception('database is locked'))
+        return real_create(bill_data, items)
+
+    monkeypatch.setattr(BillModel, 'create_bill', staticmethod(flaky_create))
+    writer = BillWriter(journal=journal)
+    writer.start()
+    writer.submit(*bill('B-1', product))
+    drain(writer)
+
+    assert calls == ['B-1'] * 3
+    assert saved_count('B-1') == 1
+    assert journal.pending() == [] and os.listdir(journal.failed_directory) == []
+
+
+def test_bill_is_committed_with_full_sync(database, product, journal, monkeypatch):
+    # Balanced only syncs the WAL at checkpoints; the entry must not go before the bill is on disk
+    db.apply_storage_profile('Balanced')
+    real_create = BillModel.create_bill
+    levels = []
+
+    def recording_create(bill_data, items):
+        with db.session_scope() as session:
+            levels.append(session.connection().exec_driver_sql("PRAGMA synchronous").scalar())
+        return real_create(bill_data, items)
+
+    monkeypatch.setattr(BillModel, 'create_bill', staticmethod(recording_create))
+    writer = BillWriter(journal=journal)
+    writer.start()
+    writer.submit(*bill('B-1', product))
+    drain(writer)
+
+    assert levels == [2]  # FULL
+    assert saved_count('B-1') == 1 and journal.pending() == []
+    # The pooled connection is back at the profile's level
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
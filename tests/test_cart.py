@@ -0,0 +1,46 @@
+import pytest
+
+from app.ui_cart import CartModel
+
+RICE = {'id': 1, 'name': 'Rice', 'base_unit': 'kg', 'price_per_unit': 6000}
+SUGAR = {'id': 2, 'name': 'Sugar', 'base_unit': 'kg', 'price_per_unit': 4550}
+
+
+@pytest.fixture
+def cart():
+    cart = CartModel()
+    cart.add_product(RICE, 2)
+    cart.add_product(SUGAR, 0.5)
+    return cart
+
+
+def column(field):
+    return CartModel.FIELDS.index(field)
+
+
+def test_scans_merge_and_total(cart):
+    cart.add_product(RICE, 0.1)
+    assert cart.rowCount() == 2
+    assert cart.lines()[0]['quantity'] == 2.1
+    assert cart.lines()[0]['total'] == 12600
+    assert cart.totals()['subtotal'] == 12600 + 2275
+
+
+def test_edits_reprice_the_line(cart):
+    assert cart.setData(cart.index(0, column('quantity')), '3')
+    assert cart.setData(cart.index(1, column('price')), '₹50.00')
+    assert [line['total'] for line in cart.lines()] == [18000, 2500]
+    assert cart.totals()['subtotal'] == 20500
+
+
+@pytest.mark.parametrize('field, value', [
+    ('quantity', 'nan'), ('quantity', 'inf'), ('quantity', '-inf'), ('quantity', '0'),
+    ('quantity', '-2'), ('quantity', 'abc'), ('price', 'nan'), ('price', 'inf'),
+    ('price', '-1'), ('price', 'abc'), ('total', '1'),
+])
+def test_invalid_edits_change_nothing(cart, field, value):
+    before = [dict(line) for line in cart.lines()]
+    subtotal = cart.totals()['subtotal']
+    assert not cart.setData(cart.index(0, column(field)), value)
+    assert cart.lines() == before
+    assert cart.totals()['subtotal'] == subtotal
@@ -0,0 +1,114 @@
+"""The buffered receipt must be byte for byte what the same python-escpos calls
+would send one write at a time."""
+import pytest
+from escpos.printer import Dummy
+
+from app.escpos_buffer import EscPosBuffer
+from app.models import SettingsModel
+from app.printer import PrinterConnection, PrinterManager
+from app.receipt import LAYOUT_SETTINGS, ReceiptLayout, to_escpos
+
+BILL = {
+    'bill_number': 'BILL-20260101100000-XYZ', 'date_time': '2026-01-01 10:00:00',
+    'customer_name': 'Ravi', 'customer_phone': '9876543210', 'subtotal': 24045,
+    'discount_amount': 1000, 'tax_percent': 5, 'tax_amount': 1152, 'grand_total': 24200,
+    'payment_method': 'Cash',
+}
+ITEMS = [
+    {'product_name': 'Basmati Rice Premium Long Grain', 'quantity': 2.5, 'unit': 'kg', 'total': 22500},
+    {'product_name': 'Salt', 'quantity': 1, 'unit': 'pkt', 'total': 1545},
+]
+
+
+class CountingDummy(Dummy):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def _raw(self, msg):
+        self.writes += 1
+        super()._raw(msg)
+
+
+def per_command(lines, layout, kick_drawer=False):
+    # The receipt printed the way python-escpos is normally driven, one call per command
+    printer = CountingDummy()
+    printer.hw('INIT')
+    printer.charcode('CP437')
+    for line in lines:
+        if line.bold:
+            printer.set(bold=True)
+            printer.text(layout.format_line(line) + '\n')
+            printer.set(bold=False)
+        else:
+            printer.text(layout.format_line(line) + '\n')
+    printer.cut()
+    if kick_drawer:
+        printer.cashdraw(2)
+    return printer
+
+
+def buffered(data):
+    printer = CountingDummy()
+    printer._raw(data)
+    return printer
+
+
+@pytest.mark.parametrize('width', ['48', '42', '32'])
+@pytest.mark.parametrize('kick_drawer', [False, True])
+def test_receipt_matches_per_command_output(width, kick_drawer):
+    layout = ReceiptLayout(dict(LAYOUT_SETTINGS, chars_per_line=width, store_address='12 Main Road',
+                                store_phone='0441234567'))
+    lines = layout.render(BILL, ITEMS)
+    expected = per_command(lines, layout, kick_drawer)
+    actual = buffered(to_escpos(lines, layout, kick_drawer=kick_drawer))
+
+    assert actual.output == expected.output
+    assert actual.writes == 1
+    assert expected.writes > len(lines)
+
+
+def test_commands_match_python_escpos():
+    receipt = EscPosBuffer()
+    receipt.align('center')
+    receipt.bold()
+    receipt.line('Thangam Stores')
+    receipt.bold(False)
+    receipt.align('right')
+    receipt.text('Total')
+    receipt.feed(3)
+    receipt.cut(partial=True)
+    receipt.kick_drawer(5)
+
+    printer = Dummy()
+    printer.hw('INIT')
+    printer.charcode('CP437')
+    printer.set(align='center')
+    printer.set(bold=True)
+    printer.text('Thangam Stores\n')
+    printer.set(bold=False)
+    printer.set(align='right')
+    printer.text('Total')
+    printer.print_and_feed(3)
+    printer.cut(mode='PART')
+    printer.cashdraw(5)
+
+    assert receipt.getvalue() == printer.output
+
+
+def test_text_outside_cp437_prints_as_question_mark():
+    receipt = EscPosBuffer()
+    receipt.line('₹ 10')
+    assert receipt.getvalue().endswith(b'? 10\n')
+
+
+def test_print_receipt_is_one_write(database):
+    SettingsModel.set_many({'printer_type': 'Network', 'cash_drawer_kick': 'true'})
+    printer = CountingDummy()
+    manager = PrinterManager()
+    manager.connection = PrinterConnection(lambda: printer)
+    manager.print_receipt(BILL, ITEMS)
+    assert printer.writes == 1
+    assert printer.output.startswith(b'\x1b@\x1bt\x00')
+    assert b'Rs.242.00' in printer.output
+    assert printer.output.endswith(b'\x1dV\x00\x1bp\x0022')
@@ -0,0 +1,41 @@
+import sqlite3
+
+import app.db as db
+from app.migrations import MIGRATIONS
+from app.models import BillModel
+from benchmarks.migrate_large_db import seed_baseline
+
+
+def test_upgrade_from_float_schema(tmp_path):
+    path = str(tmp_path / 'thangam.db')
+    expected = seed_baseline(path, bills=300, lines=3)
+    db.use_database(path)
+    db.init_db()
+    db.engine.dispose()
+
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] == MIGRATIONS[-1][0]
+        totals = dict(conn.execute("SELECT id, grand_total FROM bills"))
+        assert totals == expected
+        assert all(type(v) is int for v in totals.values())
+        assert conn.execute("SELECT COUNT(*) FROM bills WHERE date_ts IS NULL").fetchone()[0] == 0
+        assert conn.execute("SELECT typeof(price), typeof(total) FROM bill_items LIMIT 1").fetchone() == \
+            ('integer', 'integer')
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'ix_bills_date_ts', 'ix_bill_items_bill_id', 'ix_products_code'} <= indexes
+    finally:
+        conn.close()
+
+
+def test_upgrade_runs_once(tmp_path):
+    path = str(tmp_path / 'thangam.db')
+    expected = seed_baseline(path, bills=20)
+    db.use_database(path)
+    db.init_db()
+    db.init_db()
+    try:
+        bill = BillModel.get_bill_by_number('BILL-00000001')
+        assert bill.grand_total == expected[1]
+    finally:
+        db.engine.dispose()
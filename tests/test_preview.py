@@ -0,0 +1,27 @@
+import pytest
+from PyQt6.QtWidgets import QApplication, QLayout
+
+from app.receipt import ReceiptLayout
+from app.ui_preview import BillPreviewDialog
+
+BILL = {
+    'bill_number': 'BILL-20260101100000-XYZ', 'date_time': '2026-01-01 10:00:00',
+    'customer_name': 'Ravi', 'customer_phone': '9876543210', 'subtotal': 22500,
+    'discount_amount': 0, 'tax_percent': 0, 'tax_amount': 0, 'grand_total': 22500,
+    'payment_method': 'Cash',
+}
+ITEMS = [{'product_name': 'Basmati Rice', 'quantity': 2.5, 'unit': 'kg', 'price': 9000, 'total': 22500}]
+
+
+@pytest.fixture
+def qapp():
+    return QApplication.instance() or QApplication([])
+
+
+def test_preview_keeps_the_widget_layout(database, qapp):
+    dialog = BillPreviewDialog(None, BILL, ITEMS, print_spooler=None)
+    # The rendered receipt's layout must not hide QWidget.layout()
+    assert isinstance(dialog.layout(), QLayout)
+    assert isinstance(dialog.receipt_layout, ReceiptLayout)
+    assert 'BILL-20260101100000-XYZ' in dialog.preview_area.toPlainText()
+    dialog.deleteLater()
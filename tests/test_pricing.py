@@ -0,0 +1,136 @@
+"""Seeded fuzz and property tests of the bill arithmetic against an exact
+Fraction reference, so every run checks the same cases."""
+from fractions import Fraction
+import math
+import random
+
+import pytest
+
+from app.pricing import ROUNDING_STEPS, PricingEngine, round_to_step
+from app.ui_cart import CartModel
+from app.utils.helpers import line_total, percent_of
+
+NON_FINITE = [float('nan'), float('inf'), float('-inf'), 'nan', 'inf', 'Infinity', 'sNaN']
+
+
+def half_up(x):
+    """Exact round half up (away from zero on ties) of a Fraction"""
+    return math.floor(x + Fraction(1, 2)) if x >= 0 else -math.floor(-x + Fraction(1, 2))
+
+
+def reference_totals(lines, discount_percent, discount_flat, tax_percent, step):
+    subtotal = sum(half_up(Fraction(str(q)) * p) for q, p in lines)
+    discount = min(half_up(subtotal * Fraction(str(discount_percent)) / 100) + discount_flat, subtotal)
+    taxable = subtotal - discount
+    tax = half_up(taxable * Fraction(str(tax_percent)) / 100)
+    grand = half_up(Fraction(taxable + tax, step)) * step
+    return {'subtotal': subtotal, 'discount_amount': discount, 'tax_amount': tax, 'grand_total': grand}
+
+
+def random_quantity(rng):
+    return rng.choice([rng.randint(1, 20), round(rng.uniform(0.001, 25), 3), round(rng.uniform(0.1, 5), 1)])
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_engine_matches_reference(seed):
+    rng = random.Random(seed)
+    step = rng.choice(list(ROUNDING_STEPS.values()))
+    tax = rng.choice([0, 5, 12, 18, 28, round(rng.uniform(0, 30), 2)])
+    engine = PricingEngine(tax_percent=tax, round_to=step)
+    lines = []
+    for _ in range(300):
+        op = rng.random()
+        if op < 0.5 or not lines:
+            lines.append((random_quantity(rng), rng.randint(1, 200000)))
+            assert engine.add_line(*lines[-1]) == half_up(Fraction(str(lines[-1][0])) * lines[-1][1])
+        elif op < 0.8:
+            i = rng.randrange(len(lines))
+            lines[i] = (random_quantity(rng), rng.randint(1, 200000))
+            engine.set_line(i, *lines[i])
+        else:
+            i = rng.randrange(len(lines))
+            del lines[i]
+            engine.remove_line(i)
+
+        percent = rng.choice([0, 0, 5, 10, round(rng.uniform(0, 100), 2), 150, -5])
+        flat = rng.choice([0, 0, 500, rng.randint(0, 10**6), -100])
+        engine.set_discount(percent=percent, flat=flat)
+        expected = reference_totals(lines, min(max(percent, 0), 100), max(flat, 0), tax, step)
+        totals = engine.totals()
+        assert {k: totals[k] for k in expected} == expected
+        assert all(type(totals[k]) is int for k in expected)
+        assert totals['grand_total'] == totals['subtotal'] - totals['discount_amount'] + \
+            totals['tax_amount'] + totals['round_off']
+        assert engine.line_count() == len(lines)
+
+
+@pytest.mark.parametrize('step', [1, 5, 10, 50, 100, 1000])
+def test_round_to_step_properties(step):
+    rng = random.Random(step)
+    amounts = [rng.randint(-10**9, 10**9) for _ in range(2000)]
+    amounts += [k * step + step // 2 for k in range(-5, 5)] + list(range(-step, step + 1))
+    for amount in amounts:
+        rounded = round_to_step(amount, step)
+        assert type(rounded) is int
+        assert rounded % step == 0
+        assert abs(rounded - amount) * 2 <= step
+        assert rounded == half_up(Fraction(amount, step)) * step
+        assert round_to_step(-amount, step) == -rounded
+        assert round_to_step(rounded, step) == rounded
+
+
+def test_round_to_step_ties_go_up():
+    assert round_to_step(25, 50) == 50
+    assert round_to_step(24, 50) == 0
+    assert round_to_step(150, 100) == 200
+    assert round_to_step(149, 100) == 100
+    assert round_to_step(-25, 50) == -50
+
+
+def test_float_quantities_are_exact():
+    # 0.1 + 0.2 style error must not reach the paise
+    assert line_total(0.1, 3) == 0
+    assert line_total(1.005, 100) == 101
+    assert line_total(2.675, 100) == 268
+    assert percent_of(1, 50) == 1
+    assert percent_of(999, 18) == 180
+
+
+@pytest.mark.parametrize('value', NON_FINITE + ['abc', ''])
+def test_non_finite_quantity_is_rejected(value):
+    engine = PricingEngine(tax_percent=18, round_to=100)
+    engine.add_line(2, 6000)
+    before = engine.totals()
+    with pytest.raises(ValueError):
+        engine.add_line(value, 6000)
+    with pytest.raises(ValueError):
+        engine.set_line(0, value, 6000)
+    assert engine.line_count() == 1
+    assert engine.totals() == before
+
+
+@pytest.mark.parametrize('value', NON_FINITE[:3])
+def test_non_finite_percents_are_rejected(value):
+    engine = PricingEngine(tax_percent=18)
+    engine.add_line(2, 6000)
+    engine.set_discount(percent=10)
+    before = engine.totals()
+    with pytest.raises(ValueError):
+        engine.set_discount(percent=value)
+    with pytest.raises(ValueError):
+        engine.tax_percent = value
+    with pytest.raises(ValueError):
+        PricingEngine(tax_percent=value)
+    assert engine.totals() == before
+
+
+@pytest.mark.parametrize('value', NON_FINITE[:3] + [0, -1])
+def test_cart_rejects_bad_quantity(value):
+    cart = CartModel()
+    cart.add_product({'id': 1, 'name': 'Rice', 'base_unit': 'kg', 'price_per_unit': 6000}, 1)
+    for product_id in (1, 2):
+        with pytest.raises(ValueError):
+            cart.add_product({'id': product_id, 'name': 'Rice', 'base_unit': 'kg', 'price_per_unit': 6000}, value)
+    assert cart.rowCount() == 1
+    assert cart.lines()[0]['quantity'] == 1
+    assert cart.totals()['subtotal'] == 6000
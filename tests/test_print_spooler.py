@@ -0,0 +1,222 @@
+import json
+import threading
+import time
+
+import pytest
+from PyQt6.QtCore import Qt
+
+from app import print_spooler
+from app.print_spooler import DONE, FAILED, PRINTING, QUEUED, JobStore, PrintSpooler, new_job
+from app.receipt import render_receipt, to_escpos
+from app.utils.exceptions import PrinterError
+
+# A queue entry as written before amounts were paise: float rupees everywhere
+FLOAT_ENTRY = {
+    'bill_data': {
+        'bill_number': 'BILL-20240101100000-ABC', 'customer_id': None,
+        'subtotal': 130.45, 'grand_total': 120.45, 'discount_amount': 10.0,
+        'payment_method': 'Cash', 'customer_name': 'Walk-in Customer', 'customer_phone': '',
+        'date_time': '2024-01-01 10:00:00',
+    },
+    'items': [
+        {'product_id': 1, 'product_name': 'Rice', 'quantity': 2.0, 'unit': 'kg', 'price': 60.0, 'total': 120.0},
+        {'product_id': 2, 'product_name': 'Salt', 'quantity': 1.0, 'unit': 'pkt', 'price': 10.45, 'total': 10.45},
+    ],
+}
+# A bare entry written after the switch to paise
+PAISE_ENTRY = {
+    'bill_data': dict(FLOAT_ENTRY['bill_data'], bill_number='BILL-2', subtotal=13045,
+                      grand_total=12045, discount_amount=1000, tax_amount=0),
+    'items': [dict(FLOAT_ENTRY['items'][0], price=6000, total=12000),
+              dict(FLOAT_ENTRY['items'][1], price=1045, total=1045)],
+}
+
+
+def import_queue(tmp_path, entries):
+    legacy = tmp_path / 'print_queue.json'
+    legacy.write_text(json.dumps(entries))
+    store = JobStore(str(tmp_path / 'print_queue.log'), str(legacy))
+    assert not legacy.exists()
+    return store
+
+
+def test_float_queue_is_imported_as_paise(database, tmp_path):
+    store = import_queue(tmp_path, [FLOAT_ENTRY, PAISE_ENTRY])
+    jobs = list(store.jobs.values())
+    assert [job['state'] for job in jobs] == [QUEUED, QUEUED]
+    for job in jobs:
+        assert job['bill_data']['grand_total'] == 12045
+        assert job['bill_data']['subtotal'] == 13045
+        assert job['bill_data']['discount_amount'] == 1000
+        assert [(item['price'], item['total']) for item in job['items']] == [(6000, 12000), (1045, 1045)]
+
+    layout, lines = render_receipt(jobs[0]['bill_data'], jobs[0]['items'])
+    receipt = layout.to_text(lines)
+    assert 'Rs.120.45' in receipt and 'Rs.130.45' in receipt and '-Rs.10.00' in receipt
+    assert 'Rs.1.20' not in receipt
+    assert b'Rs.120.45' in to_escpos(lines, layout)
+    store.close()
+
+    # Reloaded from the journal, still paise
+    reloaded = JobStore(str(tmp_path / 'print_queue.log'), str(tmp_path / 'print_queue.json'))
+    assert [job['bill_data']['grand_total'] for job in reloaded.jobs.values()] == [12045, 12045]
+    reloaded.close()
+
+
+def test_jobs_from_the_json_store_are_kept_as_they_are(tmp_path):
+    job = {'id': 'a' * 32, 'bill_number': 'BILL-3', 'bill_data': PAISE_ENTRY['bill_data'],
+           'items': PAISE_ENTRY['items'], 'state': 'printing', 'attempts': 2, 'error': 'offline',
+           'created_at': 1.0}
+    store = import_queue(tmp_path, [job])
+    assert store.jobs == {job['id']: dict(job, state=QUEUED)}
+    store.close()
+
+
+def test_sync_while_compacting(tmp_path, monkeypatch):
+    # The spooler thread syncs without the spooler lock while cancel() can compact
+    monkeypatch.setattr(print_spooler, 'COMPACT_MIN', 20)
+    store = JobStore(str(tmp_path / 'print_queue.log'), None)
+    errors, stop = [], threading.Event()
+
+    def syncer():
+        while not stop.is_set():
+            try:
+                store.sync()
+            except Exception as e:
+                errors.append(e)
+                return
+
+    thread = threading.Thread(target=syncer)
+    thread.start()
+    try:
+        kept = []
+        for n in range(3000):
+            job = new_job({'bill_number': f'B-{n}'}, [])
+            store.add(job)
+            if n % 50 == 0:
+                kept.append(job['id'])
+            else:
+                store.remove(job['id'])
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == []
+    store.close()
+
+    reloaded = JobStore(str(tmp_path / 'print_queue.log'), None)
+    assert list(reloaded.jobs) == kept
+    reloaded.close()
+
+
+class FlakyPrinter:
+    """PrinterManager stand-in whose first `failures` prints raise PrinterError"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.attempts = []  # (bill number, time.monotonic()) of every print
+        self.printed = []
+        self.disconnects = 0
+
+    def print_receipt(self, bill_data, items):
+        self.attempts.append((bill_data['bill_number'], time.monotonic()))
+        if len(self.attempts) <= self.failures:
+            raise PrinterError("Printer is offline")
+        self.printed.append(bill_data['bill_number'])
+
+    def seconds_until_check(self):
+        return 3600
+
+    def disconnect(self):
+        self.disconnects += 1
+
+    def check_connection(self):
+        pass
+
+
+@pytest.fixture
+def spooler_for(tmp_path):
+    spoolers = []
+
+    def build(printer):
+        spooler = PrintSpooler(printer, store=JobStore(str(tmp_path / 'print_queue.log'), None))
+        states = []
+        # Direct, as there is no event loop to deliver signals from the spooler thread
+        spooler.jobChanged.connect(lambda job_id, state: states.append((job_id, state)),
+                                   Qt.ConnectionType.DirectConnection)
+        spoolers.append(spooler)
+        return spooler, states
+
+    yield build
+    for spooler in spoolers:
+        spooler.stop(timeout=5)
+        spooler.store.close()
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "spooler did not get there in time"
+        time.sleep(0.005)
+
+
+def test_recovering_printer_drains_the_queue_in_order(spooler_for, monkeypatch):
+    monkeypatch.setattr(print_spooler, 'RETRY_BASE', 0.1)
+    printer = FlakyPrinter(failures=2)
+    spooler, states = spooler_for(printer)
+    ids = [spooler.enqueue({'bill_number': f'B-{n}'}, []) for n in range(1, 4)]
+    spooler.start()
+    wait_until(lambda: len(printer.printed) == 3)
+
+    assert printer.printed == ['B-1', 'B-2', 'B-3']
+    assert [number for number, _ in printer.attempts] == ['B-1', 'B-1', 'B-1', 'B-2', 'B-3']
+    # Reconnected before each retry
+    assert printer.disconnects == 2
+    # Waited 0.1s then 0.2s after the failures, nothing once a print went through
+    times = [at for _, at in printer.attempts]
+    assert times[1] - times[0] >= 0.1 and times[2] - times[1] >= 0.2
+    assert times[4] - times[2] < 0.1
+
+    wait_until(lambda: spooler.status() == (0, 0, 0))
+    assert [state for job_id, state in states if job_id == ids[0]] == [
+        QUEUED, PRINTING, QUEUED, PRINTING, QUEUED, PRINTING, DONE]
+    for job_id in ids[1:]:
+        assert [state for i, state in states if i == job_id] == [QUEUED, PRINTING, DONE]
+    assert spooler.jobs() == []
+
+
+def test_backoff_doubles_up_to_the_limit(spooler_for, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(print_spooler.time, 'monotonic', lambda: now[0])
+    spooler, _ = spooler_for(FlakyPrinter(failures=7))
+    job = spooler.store.jobs[spooler.enqueue({'bill_number': 'B-1'}, [])]
+
+    waits = []
+    for _ in range(7):
+        spooler._print(job)
+        waits.append(spooler._retry_at - now[0])
+    assert waits == [2, 4, 8, 16, 32, 60, 60]
+    assert spooler.status() == (1, 0, 60)
+    assert job['attempts'] == 7 and job['state'] == QUEUED and job['error'] == "Printer is offline"
+
+    spooler._print(job)  # printer back
+    assert spooler._retry_at == 0 and spooler._failures == 0
+    assert spooler.jobs() == []
+
+
+def test_job_fails_after_max_attempts(spooler_for, monkeypatch):
+    monkeypatch.setattr(print_spooler, 'MAX_ATTEMPTS', 3)
+    spooler, states = spooler_for(FlakyPrinter(failures=100))
+    job_id = spooler.enqueue({'bill_number': 'B-1'}, [])
+    job = spooler.store.jobs[job_id]
+
+    for _ in range(3):
+        spooler._print(job)
+    assert [state for _, state in states] == [QUEUED, QUEUED, QUEUED, FAILED]
+    assert job['attempts'] == 3
+    assert spooler.status()[:2] == (0, 1)
+    # Set aside, not printed again until retry_failed()
+    assert spooler._next_job() is None
+
+    spooler.retry_failed()
+    assert job['state'] == QUEUED and job['attempts'] == 0
+    assert spooler._retry_at == 0
@@ -0,0 +1,208 @@
+"""PrinterConnection against a local TCP stand-in for a port 9100 receipt printer."""
+import socket
+import threading
+import time
+
+import pytest
+from escpos.printer import Dummy, Network
+
+from app import printer as printer_module
+from app.models import SettingsModel
+from app.printer import STATUS_REQUEST, PrinterConnection, PrinterManager
+from app.utils.exceptions import PrinterError
+
+STATUS_ONLINE = b'\x12'
+
+
+class FakePrinter:
+    """Accepts connections like a network printer, keeps what arrives apart
+    from status requests, and answers those while `answers` is set"""
+
+    def __init__(self, answers=True):
+        self.answers = answers
+        self.received = b''
+        self.accepted = 0
+        self._clients = []
+        self._lock = threading.Lock()
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(('127.0.0.1', 0))
+        self._server.listen()
+        self.port = self._server.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self._server.accept()
+            except OSError:
+                return
+            with self._lock:
+                self.accepted += 1
+                self._clients.append(client)
+            threading.Thread(target=self._serve, args=(client,), daemon=True).start()
+
+    def _serve(self, client):
+        while True:
+            try:
+                data = client.recv(4096)
+            except OSError:
+                return
+            if not data:
+                return
+            requests = data.count(STATUS_REQUEST)
+            with self._lock:
+                self.received += data.replace(STATUS_REQUEST, b'')
+            if requests and self.answers:
+                client.sendall(STATUS_ONLINE * requests)
+
+    def restart(self):
+        """Drops every open connection, as a printer switched off and on does"""
+        with self._lock:
+            clients, self._clients = self._clients, []
+        for client in clients:
+            client.shutdown(socket.SHUT_RDWR)
+            client.close()
+        time.sleep(0.05)  # let the FIN reach the other end
+
+    def wait_for(self, data, timeout=2):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.received == data:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self):
+        self.restart()
+        self._server.close()
+
+
+@pytest.fixture
+def fake_printer():
+    fake = FakePrinter()
+    yield fake
+    fake.close()
+
+
+@pytest.fixture(autouse=True)
+def short_timeouts(monkeypatch):
+    monkeypatch.setattr(printer_module, 'STATUS_TIMEOUT', 0.3)
+    monkeypatch.setattr(printer_module, 'VERIFY_AFTER', 0)  # check before every write after the first
+
+
+def connection_to(fake):
+    return PrinterConnection(lambda: Network('127.0.0.1', port=fake.port, timeout=5))
+
+
+def timed_send(connection, data):
+    start = time.monotonic()
+    connection.send(data)
+    return time.monotonic() - start
+
+
+def test_receipts_share_one_connection(fake_printer, monkeypatch):
+    monkeypatch.setattr(printer_module, 'VERIFY_AFTER', 60)
+    connection = connection_to(fake_printer)
+    for n in range(5):
+        connection.send(b'receipt %d\n' % n)
+    assert fake_printer.wait_for(b''.join(b'receipt %d\n' % n for n in range(5)))
+    assert fake_printer.accepted == 1
+    assert connection.stats['connects'] == 1
+    connection.close()
+
+
+def test_answering_printer_is_checked_before_a_write(fake_printer):
+    connection = connection_to(fake_printer)
+    connection.send(b'one\n')
+    connection.send(b'two\n')
+    assert connection.stats['checks'] == 1
+    assert connection.stats['online'] is True
+    assert fake_printer.wait_for(b'one\ntwo\n')
+    connection.close()
+
+
+def test_silent_printer_is_waited_for_once(fake_printer):
+    fake_printer.answers = False
+    connection = connection_to(fake_printer)
+    connection.send(b'a')
+    assert timed_send(connection, b'b') >= 0.3  # first check waits for a reply that never comes
+    assert timed_send(connection, b'c') < 0.15
+    connection.close()
+    connection.send(b'd')  # a new connection to the same printer
+    assert timed_send(connection, b'e') < 0.15
+    assert fake_printer.wait_for(b'abcde')
+    assert connection.stats['check_failures'] == 0
+
+
+@pytest.mark.parametrize('answers', [True, False])
+def test_restarted_printer_gets_the_next_receipt(fake_printer, answers):
+    fake_printer.answers = answers
+    connection = connection_to(fake_printer)
+    connection.send(b'first\n')
+    connection.send(b'second\n')  # the first check, learns whether the printer answers
+    assert fake_printer.wait_for(b'first\nsecond\n')
+
+    fake_printer.restart()
+    connection.send(b'third\n')
+    assert fake_printer.wait_for(b'first\nsecond\nthird\n')
+    assert fake_printer.accepted == 2
+    assert connection.stats['reconnects'] == 1
+    connection.close()
+
+
+def test_printer_that_stops_answering_is_reconnected(fake_printer):
+    connection = connection_to(fake_printer)
+    connection.send(b'a')
+    connection.send(b'b')
+    fake_printer.answers = False
+    connection.send(b'c')
+    assert fake_printer.wait_for(b'abc')
+    assert connection.stats['check_failures'] == 1
+    assert fake_printer.accepted == 2
+    connection.close()
+
+
+def test_unreachable_printer_raises_and_backs_off():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]  # nothing listens here once closed
+    connection = PrinterConnection(lambda: Network('127.0.0.1', port=port, timeout=1))
+    with pytest.raises(PrinterError):
+        connection.send(b'lost?')
+    assert connection.stats['connect_failures'] == 1
+    assert connection.seconds_until_check() > 0
+    assert connection.check() is False
+
+
+def build(settings):
+    SettingsModel.set_many(settings)
+    return PrinterManager.build_printer()
+
+
+def test_build_printer_from_settings(database, monkeypatch):
+    monkeypatch.setattr(printer_module, 'Usb', lambda vid, pid: ('USB', vid, pid))  # no USB library here
+    assert build({'printer_type': 'Windows Printer'}) is None
+    assert isinstance(build({'printer_type': 'Dummy'}), Dummy)
+    printer = build({'printer_type': 'Network', 'printer_ip': '10.0.0.5'})
+    assert (printer.host, printer.port) == ('10.0.0.5', 9100)
+    printer = build({'printer_type': 'Network', 'printer_ip': ' 10.0.0.5:9101 '})
+    assert (printer.host, printer.port) == ('10.0.0.5', 9101)
+    assert build({'printer_type': 'USB (Direct)', 'printer_usb_vid': '0x04b8', 'printer_usb_pid': '0x0202'}) == \
+        ('USB', 0x04b8, 0x0202)
+
+
+@pytest.mark.parametrize('settings', [
+    {'printer_type': 'USB (Direct)'},
+    {'printer_type': 'USB (Direct)', 'printer_usb_vid': '0x04b8', 'printer_usb_pid': ''},
+    {'printer_type': 'USB (Direct)', 'printer_usb_vid': 'epson', 'printer_usb_pid': '0x0202'},
+    {'printer_type': 'Network', 'printer_ip': '10.0.0.5:printer'},
+    {'printer_type': 'Bluetooth'},
+])
+def test_build_printer_refuses_incomplete_settings(database, settings):
+    with pytest.raises(PrinterError):
+        build(settings)
+    # A receipt is not silently dropped into a Dummy either
+    with pytest.raises(PrinterError):
+        PrinterManager().connection.send(b'receipt')
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+
+import app.db as db
+from app.models import ProductModel
+
+
+def add_products():
+    ProductModel.add_product("Basmati Rice", "RICE01", "kg", 12000, "Grains")
+    ProductModel.add_product("Toor Dal", "DAL01", "kg", 15000, "Pulses")
+
+
+def drop_search_index():
+    with db.engine.begin() as conn:
+        for trigger in ('products_fts_ai', 'products_fts_ad', 'products_fts_au'):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text("DROP TABLE IF EXISTS products_fts"))
+
+
+def test_search_uses_the_current_database_index(database, tmp_path):
+    add_products()
+    assert [p.name for p in ProductModel.search_products("smat")] == ["Basmati Rice"]
+
+    # A database without the trigram index must fall back to LIKE, not reuse
+    # the previous database's answer
+    db.use_database(str(tmp_path / 'without_fts.db'))
+    db.init_db()
+    drop_search_index()
+    add_products()
+    assert [p.name for p in ProductModel.search_products("smat")] == ["Basmati Rice"]
+    assert [p.name for p in ProductModel.search_products("dal")] == ["Toor Dal"]
@@ -0,0 +1,28 @@
+from app.models import BillModel, ProductModel
+from app.records import BillRecord, ProductRecord
+
+
+def test_record_answers_like_a_dict():
+    product = ProductRecord(1, 'Rice', 'R1', 'kg', 6000, 'Grocery')
+    assert product['name'] == product.name == 'Rice'
+    assert product.get('code') == 'R1'
+    assert product.get('missing', 'x') == 'x'
+    assert 'price_per_unit' in product and 'items' not in product
+    assert dict(product) == product.to_dict()
+    assert product.to_dict()['category'] == 'Grocery'
+
+
+def test_bill_items_field_is_not_shadowed(database):
+    product_id = ProductModel.add_product('Rice', 'R1', 'kg', 6000)
+    bill = {'bill_number': 'B-1', 'date_time': '2026-01-01 10:00:00', 'subtotal': 12000,
+            'grand_total': 12000, 'payment_method': 'Cash'}
+    lines = [{'product_id': product_id, 'product_name': 'Rice', 'quantity': 2, 'unit': 'kg',
+              'price': 6000, 'total': 12000}]
+    BillModel.create_bill(bill, lines)
+
+    record = BillModel.get_bill_by_number('B-1', with_items=True)
+    assert isinstance(record.items, list)
+    assert record.items == record['items'] == record.to_dict()['items']
+    assert [item.total for item in record.items] == [12000]
+    assert BillModel.get_bill_by_number('B-1').items is None
+    assert BillRecord._fields[-1] == 'items'
@@ -0,0 +1,109 @@
+import random
+
+from app.search import FuzzyIndex, edit_distance
+
+
+def osa_distance(a, b):
+    """Plain optimal string alignment distance, without the early exit"""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[-1][-1]
+
+
+def index_of(*names):
+    return FuzzyIndex({'id': i, 'name': name} for i, name in enumerate(names, 1))
+
+
+def names(results):
+    return [p['name'] for p in results]
+
+
+def test_edit_distance_counts_each_kind_of_edit():
+    assert edit_distance("sugar", "sugar", 2) == 0
+    assert edit_distance("sugar", "sugor", 2) == 1   # substitution
+    assert edit_distance("sugar", "suggar", 2) == 1  # insertion
+    assert edit_distance("sugar", "sgar", 2) == 1    # deletion
+    assert edit_distance("sugar", "suagr", 2) == 1   # adjacent swap
+    assert edit_distance("", "abc", 3) == 3
+
+
+def test_edit_distance_stops_past_the_limit():
+    assert edit_distance("sugar", "salt", 1) == 2
+    assert edit_distance("rice", "basmati", 2) == 3
+    assert edit_distance("a", "abcdef", 2) == 3
+
+
+def test_edit_distance_matches_reference():
+    rng = random.Random(7)
+    for _ in range(2000):
+        a = ''.join(rng.choice("abcd") for _ in range(rng.randrange(8)))
+        b = ''.join(rng.choice("abcd") for _ in range(rng.randrange(8)))
+        expected = osa_distance(a, b)
+        for limit in range(4):
+            assert edit_distance(a, b, limit) == min(expected, limit + 1), (a, b, limit)
+
+
+def test_search_tolerates_typos():
+    index = index_of("Sugar", "Basmati Rice", "Toor Dal", "Salt")
+    assert names(index.search("suger")) == ["Sugar"]
+    assert names(index.search("basmtai")) == ["Basmati Rice"]
+    # Short words lose most trigrams to one typo, the deletion index still finds them
+    assert names(index.search("rcie")) == ["Basmati Rice"]
+
+
+def test_search_accepts_a_typo_in_a_prefix():
+    index = index_of("Sugarcane Juice", "Salt")
+    assert names(index.search("suagr")) == ["Sugarcane Juice"]
+
+
+def test_short_query_words_must_match_exactly():
+    index = index_of("Dal", "Oil")
+    assert names(index.search("dal")) == ["Dal"]
+    assert names(index.search("da")) == ["Dal"]  # as a prefix
+    assert index.search("dl") == []
+    assert index.search("ol") == []
+
+
+def test_every_query_word_must_match():
+    index = index_of("Basmati Rice", "Ponni Rice", "Basmati Flakes")
+    assert names(index.search("basmati rice")) == ["Basmati Rice"]
+    assert sorted(names(index.search("rice"))) == ["Basmati Rice", "Ponni Rice"]
+    assert index.search("basmati salt") == []
+
+
+def test_search_ranks_closer_and_shorter_names_first():
+    index = index_of("Sugar Cubes", "Sugr", "Sugar")
+    assert names(index.search("sugar")) == ["Sugar", "Sugar Cubes", "Sugr"]
+    assert names(index.search("sugar", limit=1)) == ["Sugar"]
+
+
+def test_search_ignores_case_and_blank_queries():
+    index = index_of("Toor Dal")
+    assert names(index.search("  TOOR   dal ")) == ["Toor Dal"]
+    assert index.search("   ") == []
+
+
+def test_search_follows_updates_and_removals():
+    index = index_of("Sugar", "Salt")
+    index.update({'id': 1, 'name': "Jaggery"})
+    assert index.search("sugar") == []
+    assert names(index.search("jagery")) == ["Jaggery"]
+    index.remove(2)
+    assert index.search("salt") == []
+    assert len(index) == 1
+
+
+def test_search_reads_products_from_the_catalog():
+    catalog = {1: {'id': 1, 'name': "Sugar", 'price': 4500}}
+    index = FuzzyIndex(catalog.values(), catalog=catalog)
+    catalog[1] = dict(catalog[1], price=4800)
+    assert index.search("suger") == [catalog[1]]
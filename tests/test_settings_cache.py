@@ -0,0 +1,30 @@
+from contextlib import contextmanager
+
+from app import models
+from app.models import SettingsModel
+
+
+def test_cache_follows_writes(database):
+    assert SettingsModel.get_setting('store_name', 'Default') == 'Default'
+    SettingsModel.set_setting('store_name', 'Thangam')
+    assert SettingsModel.get_setting('store_name') == 'Thangam'
+    SettingsModel.set_many({'store_name': 'Thangam Stores', 'store_phone': '123'})
+    assert SettingsModel.get_many({'store_name': '', 'store_phone': ''}) == \
+        {'store_name': 'Thangam Stores', 'store_phone': '123'}
+
+
+def test_write_during_load_is_not_cached(database, monkeypatch):
+    SettingsModel.set_setting('store_name', 'Old')
+    real_scope = models.session_scope
+
+    @contextmanager
+    def racing_scope():
+        # Another thread commits a new value after this load has read the old one
+        with real_scope() as session:
+            yield session
+        monkeypatch.setattr(models, 'session_scope', real_scope)
+        SettingsModel.set_setting('store_name', 'New')
+
+    monkeypatch.setattr(models, 'session_scope', racing_scope)
+    assert SettingsModel.get_setting('store_name') == 'Old'
+    assert SettingsModel.get_setting('store_name') == 'New'